@@ -0,0 +1,44 @@
+"""Listing versions
+
+Revision ID: 3f6c2a8d7b51
+Revises: e7a93b51c0d4
+Create Date: 2026-10-18 15:02:11.904215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c2a8d7b51'
+down_revision: Union[str, None] = 'e7a93b51c0d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UPDATED_AT = sa.DateTime(timezone=True).with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+
+def upgrade() -> None:
+    op.add_column('tickets', sa.Column('updated_at', UPDATED_AT, nullable=True))
+    op.add_column('users', sa.Column('updated_at', UPDATED_AT, nullable=True))
+    op.execute('UPDATE tickets SET updated_at = created_at')
+    op.execute('UPDATE users SET updated_at = created_at')
+    op.create_index('ix_users_updated_at', 'users', ['updated_at'], unique=False)
+    # Create the composite indexes before dropping the old ones, MySQL needs one for each foreign key
+    op.create_index('ix_tickets_creator_id_updated_at', 'tickets', ['creator_id', 'updated_at'], unique=False)
+    op.create_index('ix_tickets_assignee_id_updated_at', 'tickets', ['assignee_id', 'updated_at'], unique=False)
+    op.drop_index('ix_tickets_creator_id', table_name='tickets')
+    op.drop_index('ix_tickets_assignee_id', table_name='tickets')
+
+
+def downgrade() -> None:
+    op.create_index('ix_tickets_creator_id', 'tickets', ['creator_id'], unique=False)
+    op.create_index('ix_tickets_assignee_id', 'tickets', ['assignee_id'], unique=False)
+    op.drop_index('ix_tickets_assignee_id_updated_at', table_name='tickets')
+    op.drop_index('ix_tickets_creator_id_updated_at', table_name='tickets')
+    op.drop_index('ix_users_updated_at', table_name='users')
+    op.drop_column('users', 'updated_at')
+    op.drop_column('tickets', 'updated_at')
@@ -0,0 +1,45 @@
+"""Ticket stats
+
+Revision ID: 5d2e8f41a7c3
+Revises: c3a1695bb145
+Create Date: 2026-10-18 10:04:51.602117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8f41a7c3'
+down_revision: Union[str, None] = 'c3a1695bb145'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ticket_stats',
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('first_message_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_sender_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['last_sender_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['ticket_id'], ['tickets.id'], ),
+    sa.PrimaryKeyConstraint('ticket_id')
+    )
+    op.create_table('ticket_unread',
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ticket_id'], ['tickets.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('ticket_id', 'user_id')
+    )
+    # Populate with: python -m app.core.ticket_stats backfill
+
+
+def downgrade() -> None:
+    op.drop_table('ticket_unread')
+    op.drop_table('ticket_stats')
@@ -0,0 +1,49 @@
+"""Message search
+
+Revision ID: 8b4f0c2d9e16
+Revises: 5d2e8f41a7c3
+Create Date: 2026-10-18 11:37:12.284913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4f0c2d9e16'
+down_revision: Union[str, None] = '5d2e8f41a7c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.create_index('ix_messages_content_fulltext', 'messages', ['content'], unique=False, mysql_prefix='FULLTEXT')
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='messages', content_rowid='id')")
+        op.execute("""CREATE TRIGGER messages_fts_ai AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END""")
+        op.execute("""CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END""")
+        op.execute("""CREATE TRIGGER messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END""")
+        # Index the existing history
+        op.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.drop_index('ix_messages_content_fulltext', table_name='messages')
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER messages_fts_au")
+        op.execute("DROP TRIGGER messages_fts_ad")
+        op.execute("DROP TRIGGER messages_fts_ai")
+        op.execute("DROP TABLE messages_fts")
@@ -0,0 +1,28 @@
+"""User directory
+
+Revision ID: a91d4e7c2f08
+Revises: 3f6c2a8d7b51
+Create Date: 2026-10-18 16:21:37.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91d4e7c2f08'
+down_revision: Union[str, None] = '3f6c2a8d7b51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_users_name', 'users', ['name'], unique=False)
+    op.create_index('ix_users_role_id', 'users', ['role', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_role_id', table_name='users')
+    op.drop_index('ix_users_name', table_name='users')
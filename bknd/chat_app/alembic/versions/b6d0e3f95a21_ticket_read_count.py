@@ -0,0 +1,33 @@
+"""Ticket read count
+
+Revision ID: b6d0e3f95a21
+Revises: f4a8c3e2b716
+Create Date: 2026-10-18 23:41:17.204531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d0e3f95a21'
+down_revision: Union[str, None] = 'f4a8c3e2b716'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ticket_stats', sa.Column('read_count', sa.Integer(), nullable=False, server_default='0'))
+    ticket_stats = sa.table('ticket_stats', sa.column('ticket_id', sa.Integer), sa.column('read_count', sa.Integer))
+    messages = sa.table('messages', sa.column('ticket_id', sa.Integer), sa.column('read', sa.Boolean))
+    op.execute(ticket_stats.update().values(read_count=(
+        sa.select(sa.func.count())
+        .where(messages.c.ticket_id == ticket_stats.c.ticket_id, messages.c.read == sa.true())
+        .scalar_subquery()
+    )))
+
+
+def downgrade() -> None:
+    op.drop_column('ticket_stats', 'read_count')
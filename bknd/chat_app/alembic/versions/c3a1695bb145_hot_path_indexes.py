@@ -0,0 +1,59 @@
+"""Hot path indexes
+
+Revision ID: c3a1695bb145
+Revises: 10eaeda7809b
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a1695bb145'
+down_revision: Union[str, None] = '10eaeda7809b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The friendship tables are not created by the initial migration, so only
+# index them where they already exist.
+FRIENDSHIP_INDEXES = {
+    'friend_requests': [
+        ('ix_friend_requests_sender_id_status', ['sender_id', 'status']),
+        ('ix_friend_requests_receiver_id_status', ['receiver_id', 'status']),
+    ],
+    'user_contacts': [
+        ('ix_user_contacts_user1_id_user2_id', ['user1_id', 'user2_id']),
+        ('ix_user_contacts_user2_id', ['user2_id']),
+    ],
+}
+
+
+def upgrade() -> None:
+    op.create_index('ix_messages_ticket_id_timestamp_id', 'messages', ['ticket_id', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_messages_sender_id_timestamp_id', 'messages', ['sender_id', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_messages_receiver_id_timestamp_id', 'messages', ['receiver_id', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_messages_receiver_id_read', 'messages', ['receiver_id', 'read'], unique=False)
+    op.create_index('ix_tickets_creator_id', 'tickets', ['creator_id'], unique=False)
+    op.create_index('ix_tickets_assignee_id', 'tickets', ['assignee_id'], unique=False)
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    for table, indexes in FRIENDSHIP_INDEXES.items():
+        if table in existing:
+            for name, columns in indexes:
+                op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    for table, indexes in FRIENDSHIP_INDEXES.items():
+        if table in existing:
+            for name, _ in indexes:
+                op.drop_index(name, table_name=table)
+    op.drop_index('ix_tickets_assignee_id', table_name='tickets')
+    op.drop_index('ix_tickets_creator_id', table_name='tickets')
+    op.drop_index('ix_messages_receiver_id_read', table_name='messages')
+    op.drop_index('ix_messages_receiver_id_timestamp_id', table_name='messages')
+    op.drop_index('ix_messages_sender_id_timestamp_id', table_name='messages')
+    op.drop_index('ix_messages_ticket_id_timestamp_id', table_name='messages')
@@ -0,0 +1,32 @@
+"""Ticket listing indexes
+
+Revision ID: c58e1b9a4d27
+Revises: a91d4e7c2f08
+Create Date: 2026-10-18 17:40:02.316448
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58e1b9a4d27'
+down_revision: Union[str, None] = 'a91d4e7c2f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tickets_creator_id_created_at', 'tickets', ['creator_id', 'created_at'], unique=False)
+    op.create_index('ix_tickets_assignee_id_created_at', 'tickets', ['assignee_id', 'created_at'], unique=False)
+    op.create_index('ix_tickets_creator_id_status_created_at', 'tickets', ['creator_id', 'status', 'created_at'], unique=False)
+    op.create_index('ix_tickets_assignee_id_status_created_at', 'tickets', ['assignee_id', 'status', 'created_at', 'creator_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tickets_assignee_id_status_created_at', table_name='tickets')
+    op.drop_index('ix_tickets_creator_id_status_created_at', table_name='tickets')
+    op.drop_index('ix_tickets_assignee_id_created_at', table_name='tickets')
+    op.drop_index('ix_tickets_creator_id_created_at', table_name='tickets')
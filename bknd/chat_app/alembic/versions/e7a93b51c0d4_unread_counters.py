@@ -0,0 +1,52 @@
+"""Unread counters
+
+Revision ID: e7a93b51c0d4
+Revises: 8b4f0c2d9e16
+Create Date: 2026-10-18 13:12:40.518376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a93b51c0d4'
+down_revision: Union[str, None] = '8b4f0c2d9e16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    direct_unread = op.create_table('direct_unread',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('peer_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['peer_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'peer_id')
+    )
+    op.create_index('ix_ticket_unread_user_id', 'ticket_unread', ['user_id'], unique=False)
+    # Seed the direct-message counters from existing history
+    messages = sa.table('messages',
+        sa.column('sender_id', sa.Integer),
+        sa.column('receiver_id', sa.Integer),
+        sa.column('ticket_id', sa.Integer),
+        sa.column('read', sa.Boolean),
+    )
+    op.execute(direct_unread.insert().from_select(
+        ['user_id', 'peer_id', 'unread_count'],
+        sa.select(messages.c.receiver_id, messages.c.sender_id, sa.func.count())
+        .where(
+            messages.c.ticket_id.is_(None),
+            messages.c.receiver_id.is_not(None),
+            sa.or_(messages.c.read == sa.false(), messages.c.read.is_(None)),
+        )
+        .group_by(messages.c.receiver_id, messages.c.sender_id),
+    ))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ticket_unread_user_id', table_name='ticket_unread')
+    op.drop_table('direct_unread')
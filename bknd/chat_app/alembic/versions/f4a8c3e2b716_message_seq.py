@@ -0,0 +1,38 @@
+"""Message seq
+
+Revision ID: f4a8c3e2b716
+Revises: d2b7f4c19e63
+Create Date: 2026-10-18 20:14:05.738120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a8c3e2b716'
+down_revision: Union[str, None] = 'd2b7f4c19e63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Number existing ticket messages in (timestamp, id) order within each ticket
+NUMBERED = (
+    "SELECT id, ROW_NUMBER() OVER (PARTITION BY ticket_id ORDER BY timestamp, id) AS seq "
+    "FROM messages WHERE ticket_id IS NOT NULL"
+)
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('seq', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name == 'mysql':
+        op.execute(f"UPDATE messages m JOIN ({NUMBERED}) n ON m.id = n.id SET m.seq = n.seq")
+    else:
+        op.execute(f"UPDATE messages SET seq = n.seq FROM ({NUMBERED}) AS n WHERE messages.id = n.id")
+    op.create_index('ix_messages_ticket_id_seq', 'messages', ['ticket_id', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_ticket_id_seq', table_name='messages')
+    op.drop_column('messages', 'seq')
@@ -0,0 +1,146 @@
+"""Avatar processing and content-addressed storage.
+
+An upload is hashed, then decoded, cropped to a square and re-encoded as one
+WebP file per ``AVATAR_SIZES`` entry under ``AVATAR_DIR/<h[:2]>/<h>-<size>.webp``.
+Re-uploading the same file reuses the stored variants. ``User.avatar`` holds
+``avatar:<h>`` for processed uploads; anything else is a legacy URL and is
+returned unchanged.
+
+Resizing runs in a process pool so neither the event loop nor the GIL is
+held while Pillow decodes multi-megapixel images.
+
+Run ``python -m app.core.avatars backfill`` to process avatars that still
+point at raw files under ``/uploads/avatars``.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+from app.core.config import settings
+
+KEY_PREFIX = "avatar:"
+URL_PREFIX = "/" + settings.AVATAR_DIR.strip("/")
+
+avatar_pool: Optional[ProcessPoolExecutor] = None
+
+class InvalidImage(Exception):
+    """Raised when an upload cannot be decoded as an image."""
+
+def is_avatar_key(avatar: Optional[str]) -> bool:
+    return bool(avatar) and avatar.startswith(KEY_PREFIX)
+
+def _variant_path(digest: str, size: int) -> str:
+    return os.path.join(settings.AVATAR_DIR, digest[:2], f"{digest}-{size}.webp")
+
+def avatar_urls(avatar: str) -> Dict[int, str]:
+    """URLs of every stored variant of a processed avatar, by size."""
+    digest = avatar[len(KEY_PREFIX):]
+    return {size: f"{URL_PREFIX}/{digest[:2]}/{digest}-{size}.webp" for size in sorted(settings.AVATAR_SIZES)}
+
+def avatar_url(avatar: Optional[str], size: int = None) -> Optional[str]:
+    """Resolve ``User.avatar`` to the smallest variant at least ``size`` px wide."""
+    if not is_avatar_key(avatar):
+        return avatar
+    urls = avatar_urls(avatar)
+    size = size or settings.AVATAR_DEFAULT_SIZE
+    fitting = [s for s in urls if s >= size]
+    return urls[fitting[0] if fitting else max(urls)]
+
+def render_variants(data: bytes, digest: str, sizes: Sequence[int], quality: int):
+    """Decode, square-crop and write every size variant; runs in a pool process."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        # Let the JPEG decoder downscale by up to 8x instead of decoding every pixel
+        image.draft("RGB", (max(sizes) * 2, max(sizes) * 2))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e))
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    side = min(image.size)
+    left, top = (image.width - side) // 2, (image.height - side) // 2
+    image = image.crop((left, top, left + side, top + side))
+    for size in sorted(sizes, reverse=True):
+        # Each variant is scaled from the previous, larger one
+        image = image.resize((size, size), Image.LANCZOS, reducing_gap=3.0) if image.width > size else image
+        path = _variant_path(digest, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        image.save(tmp, "WEBP", quality=quality, method=4)
+        os.replace(tmp, path)
+
+def start_avatar_pool():
+    """Start the resize workers; called at startup, and again after ``stop_avatar_pool``."""
+    global avatar_pool
+    if avatar_pool is None:
+        avatar_pool = ProcessPoolExecutor(max_workers=settings.AVATAR_WORKERS)
+
+def stop_avatar_pool(wait: bool = False):
+    global avatar_pool
+    if avatar_pool is not None:
+        avatar_pool.shutdown(wait=wait, cancel_futures=True)
+        avatar_pool = None
+
+async def store_avatar(data: bytes) -> str:
+    """Process an uploaded image and return the key to store in ``User.avatar``."""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    missing = [size for size in settings.AVATAR_SIZES if not os.path.exists(_variant_path(digest, size))]
+    if missing:
+        await asyncio.get_running_loop().run_in_executor(
+            avatar_pool, render_variants, data, digest, missing, settings.AVATAR_WEBP_QUALITY
+        )
+    return KEY_PREFIX + digest
+
+def _local_upload_path(avatar: Optional[str]) -> Optional[str]:
+    # Legacy avatars were stored as a URL path under the /uploads mount
+    if not avatar or is_avatar_key(avatar):
+        return None
+    path = avatar.split("://", 1)[-1]
+    index = path.find(URL_PREFIX + "/")
+    if index < 0:
+        return None
+    path = path[index + 1:]
+    return path if os.path.isfile(path) else None
+
+async def backfill() -> int:
+    from sqlalchemy import select
+    from app.core.database import AsyncSessionLocal, async_engine
+    from app.models.user import User
+    from app.models import ticket  # noqa: F401  (needed to configure the User.created_tickets relationship)
+
+    processed = 0
+    try:
+        async with AsyncSessionLocal() as db:
+            for user in (await db.execute(select(User).filter(User.avatar.is_not(None)))).scalars():
+                path = _local_upload_path(user.avatar)
+                if path is None:
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                try:
+                    user.avatar = await store_avatar(data)
+                except InvalidImage as e:
+                    print(f"user {user.id}: skipped {path}: {e}")
+                    continue
+                processed += 1
+                print(f"user {user.id}: {path} -> {user.avatar}")
+            await db.commit()
+    finally:
+        await async_engine.dispose()
+    return processed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process legacy avatar files into sized variants")
+    parser.add_argument("command", choices=["backfill"])
+    parser.parse_args()
+    start_avatar_pool()
+    try:
+        print(f"{asyncio.run(backfill())} avatars processed")
+    finally:
+        stop_avatar_pool(wait=True)
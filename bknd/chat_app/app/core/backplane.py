@@ -0,0 +1,188 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+from app.core.config import settings
+from app.core.log import get_logger
+
+log = get_logger(__name__)
+
+# Called with (channel, payload) for every message published on any worker
+DeliverHandler = Callable[[str, str], Awaitable[None]]
+# Returns the highest value already used for a sequence, e.g. from the database
+SequenceSeed = Callable[[], Awaitable[int]]
+
+class Backplane:
+    """Routes WebSocket broadcasts to every worker process.
+
+    Channels are plain strings such as ``ticket:12``, ``user:3`` or
+    ``signal:3``. Each worker registers one handler that delivers a payload to
+    the sockets it holds locally for that channel.
+    """
+
+    async def start(self, handler: DeliverHandler):
+        raise NotImplementedError
+
+    async def publish(self, channel: str, payload: str):
+        raise NotImplementedError
+
+    async def next_sequence(self, name: str, seed: SequenceSeed) -> int:
+        """Next value of a counter shared by all workers, continuing after ``seed()`` whenever the counter is new or was lost."""
+        raise NotImplementedError
+
+    async def current_sequence(self, name: str) -> Optional[int]:
+        """Last value handed out by ``next_sequence``, or None if this backplane does not know it."""
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+class InProcessBackplane(Backplane):
+    """Single-worker backplane: publishing delivers directly to local sockets."""
+
+    def __init__(self):
+        self._handler: Optional[DeliverHandler] = None
+        self._sequences: Dict[str, int] = {}
+
+    async def start(self, handler: DeliverHandler):
+        self._handler = handler
+
+    async def publish(self, channel: str, payload: str):
+        if self._handler is not None:
+            await self._handler(channel, payload)
+
+    async def next_sequence(self, name: str, seed: SequenceSeed) -> int:
+        if name not in self._sequences:
+            seeded = await seed()
+            # Another caller may have seeded and advanced it while we awaited
+            self._sequences.setdefault(name, seeded)
+        self._sequences[name] += 1
+        return self._sequences[name]
+
+    async def current_sequence(self, name: str) -> Optional[int]:
+        return self._sequences.get(name)
+
+# INCR a counter only if it exists; nil tells the caller to seed it first. A
+# counter can go missing after a Redis restart or eviction as well as on first use.
+INCR_EXISTING = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCR', KEYS[1])
+end
+return false
+"""
+
+class RedisBackplane(Backplane):
+    """Multi-worker backplane on Redis PUBLISH/PSUBSCRIBE.
+
+    Every worker, including the publisher, receives each message through its
+    subscription, so local delivery always goes through the same path. Pass
+    ``client`` to run against any redis.asyncio compatible client (e.g. a fake).
+    A lost subscription is re-established with exponential backoff; messages
+    published meanwhile are not redelivered (ticket rooms recover them through
+    reconnect replay).
+    """
+
+    def __init__(self, url: str = None, client=None, prefix: str = "chat:",
+                 reconnect_delay: float = 0.5, max_reconnect_delay: float = 30):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+        self._client = client
+        self._prefix = prefix
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._incr_existing = client.register_script(INCR_EXISTING)
+
+    async def start(self, handler: DeliverHandler):
+        self._stopping = False
+        await self._subscribe()
+        self._task = asyncio.create_task(self._listen(handler))
+
+    async def _subscribe(self):
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.psubscribe(f"{self._prefix}*")
+
+    async def _close_pubsub(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is None:
+            return
+        try:
+            await pubsub.punsubscribe()
+            await pubsub.aclose()
+        except Exception:
+            # Usually the connection that just failed; nothing left to release
+            pass
+
+    async def _listen(self, handler: DeliverHandler):
+        delay = self._reconnect_delay
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    log.info("backplane.resubscribed")
+                async for message in self._pubsub.listen():
+                    delay = self._reconnect_delay
+                    await self._dispatch(handler, message)
+                # listen() only returns once unsubscribed, which only stop() should do
+                raise ConnectionError("backplane subscription ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if self._stopping:
+                    return
+                log.exception("backplane.listen_failed", retry_in=delay)
+                await self._close_pubsub()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._max_reconnect_delay)
+
+    async def _dispatch(self, handler: DeliverHandler, message: dict):
+        if message["type"] != "pmessage":
+            return
+        channel = message["channel"]
+        payload = message["data"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        if isinstance(payload, bytes):
+            payload = payload.decode()
+        try:
+            await handler(channel[len(self._prefix):], payload)
+        except Exception:
+            log.exception("backplane.delivery_failed", channel=channel)
+
+    async def publish(self, channel: str, payload: str):
+        await self._client.publish(f"{self._prefix}{channel}", payload)
+
+    async def next_sequence(self, name: str, seed: SequenceSeed) -> int:
+        key = f"{self._prefix}seq:{name}"
+        value = await self._incr_existing(keys=[key])
+        while value is None:
+            # NX leaves a counter that another worker re-seeded (and advanced) meanwhile alone
+            await self._client.set(key, await seed(), nx=True)
+            value = await self._incr_existing(keys=[key])
+        return int(value)
+
+    async def current_sequence(self, name: str) -> Optional[int]:
+        value = await self._client.get(f"{self._prefix}seq:{name}")
+        return None if value is None else int(value)
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            # A read interrupted mid-reconnect can swallow the cancellation;
+            # closing the subscription ends the listener either way
+            await self._close_pubsub()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close_pubsub()
+
+def create_backplane(url: Optional[str]) -> Backplane:
+    if url:
+        return RedisBackplane(url)
+    return InProcessBackplane()
+
+backplane = create_backplane(settings.BACKPLANE_URL)
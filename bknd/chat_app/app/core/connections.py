@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Set, Union
+from fastapi import WebSocket
+from app.core import protocol
+from app.core.config import settings
+from app.core.log import get_logger
+
+log = get_logger(__name__)
+
+# Slow-consumer policies applied when a connection's outbound queue is full
+DISCONNECT = "disconnect"    # close the socket; the client reconnects and catches up
+DROP_OLDEST = "drop_oldest"  # keep the socket but shed its oldest queued frames
+
+class Connection:
+    """A WebSocket with a bounded outbound queue drained by its own writer task.
+
+    ``send`` never awaits the network, so one stalled client cannot hold up a
+    broadcast to everyone else in the room.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: int, queue_size: int = None, policy: str = None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.encoding = websocket.state.encoding
+        self.policy = policy or settings.WS_SLOW_CONSUMER_POLICY
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.WS_SEND_QUEUE_SIZE)
+        self.dropped = 0
+        self.closed = False
+        self._close_task: Optional[asyncio.Task] = None
+        self._writer = asyncio.create_task(self._write_loop())
+        websocket.state.connection = self
+
+    def send(self, data: Union[str, bytes, None]) -> bool:
+        """Queue already-encoded data for this socket; returns False if it was not queued."""
+        if data is None or self.closed:
+            return False
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            pass
+        self.dropped += 1
+        if self.policy == DROP_OLDEST:
+            self.queue.get_nowait()
+            self.queue.put_nowait(data)
+            return True
+        log.warning("ws.slow_consumer_evicted", user_id=self.user_id, queued=self.queue.qsize())
+        self.evict()
+        return False
+
+    def send_frame(self, frame: dict) -> bool:
+        return self.send(protocol.encode(frame, self.encoding))
+
+    def evict(self):
+        """Stop writing and close the socket with 1013 (try again later)."""
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.cancel()
+        self._close_task = asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def _write_loop(self):
+        while True:
+            data = await self.queue.get()
+            try:
+                await protocol.send(self.websocket, data)
+            except Exception as e:
+                log.info("ws.send_failed", user_id=self.user_id, error=str(e))
+                self.closed = True
+                return
+
+    async def close(self):
+        """Stop the writer task; called once the socket's handler exits."""
+        self.closed = True
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+
+class ConnectionRegistry:
+    """Index of this worker's live connections.
+
+    Keeps user -> connections and room -> connections sets plus per-room user
+    presence counts, so joins, leaves and membership checks are all O(1).
+    Rooms are named like the backplane channels they receive (``ticket:12``).
+    """
+
+    def __init__(self, churn_window: float = 60.0):
+        self._by_user: Dict[int, Set[Connection]] = {}
+        self._by_room: Dict[str, Set[Connection]] = {}
+        self._presence: Dict[str, Dict[int, int]] = {}
+        self.joins = 0
+        self.leaves = 0
+        self._churn_window = churn_window
+        self._churn_events: Deque[float] = deque()
+
+    def _trim_churn(self, now: float):
+        while self._churn_events and self._churn_events[0] < now - self._churn_window:
+            self._churn_events.popleft()
+
+    def _record_churn(self):
+        now = time.monotonic()
+        self._churn_events.append(now)
+        self._trim_churn(now)
+
+    def add_user(self, connection: Connection):
+        """Register a socket that receives frames addressed to its user."""
+        self._by_user.setdefault(connection.user_id, set()).add(connection)
+
+    def remove_user(self, connection: Connection):
+        connections = self._by_user.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._by_user[connection.user_id]
+
+    def join(self, room: str, connection: Connection):
+        members = self._by_room.setdefault(room, set())
+        if connection in members:
+            return
+        members.add(connection)
+        presence = self._presence.setdefault(room, {})
+        presence[connection.user_id] = presence.get(connection.user_id, 0) + 1
+        self.joins += 1
+        self._record_churn()
+
+    def leave(self, room: str, connection: Connection):
+        members = self._by_room.get(room)
+        if members is None or connection not in members:
+            return
+        members.discard(connection)
+        if not members:
+            del self._by_room[room]
+        presence = self._presence[room]
+        presence[connection.user_id] -= 1
+        if not presence[connection.user_id]:
+            del presence[connection.user_id]
+        if not presence:
+            del self._presence[room]
+        self.leaves += 1
+        self._record_churn()
+
+    def user_connections(self, user_id: int) -> Set[Connection]:
+        return self._by_user.get(user_id, set())
+
+    def room_connections(self, room: str) -> Set[Connection]:
+        return self._by_room.get(room, set())
+
+    def room_users(self, room: str) -> Set[int]:
+        return set(self._presence.get(room, ()))
+
+    def is_present(self, room: str, user_id: int) -> bool:
+        return user_id in self._presence.get(room, ())
+
+    def stats(self) -> dict:
+        self._trim_churn(time.monotonic())
+        return {
+            "user_connections": sum(len(c) for c in self._by_user.values()),
+            "users": len(self._by_user),
+            "room_connections": sum(len(c) for c in self._by_room.values()),
+            "rooms": len(self._by_room),
+            "joins_total": self.joins,
+            "leaves_total": self.leaves,
+            "churn_per_second": len(self._churn_events) / self._churn_window,
+        }
+
+registry = ConnectionRegistry()
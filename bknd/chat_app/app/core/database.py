@@ -1,7 +1,194 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+import itertools
+import logging
+import time
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, event, text, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.metrics import Histogram, metrics_registry
+from app.core.log import get_logger
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+log = get_logger(__name__)
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = Histogram()
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - start)
+
+# SQLAlchemy names pool loggers after the pool class, which would put this one under
+# the "app" logger; keep it as quiet as the stock pool unless asked for explicitly
+logging.getLogger(f"{__name__}.TimedAsyncQueuePool").setLevel(logging.WARNING)
+
+db_query_duration = metrics_registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("engine", "operation")
+)
+
+def instrument_engine(sync_engine, name: str):
+    """Time every statement run through an engine, labelled by its leading keyword."""
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_duration.labels(name, operation).observe(time.perf_counter() - context._query_start)
+
+def pool_options(url: str, async_: bool = True) -> dict:
+    """Engine keyword arguments for the configured pool; in-memory SQLite keeps its own pool."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+    if async_:
+        options["poolclass"] = TimedAsyncQueuePool
+    return options
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """Gauges for an async engine's pool plus its checkout-wait histogram."""
+    pool = engine.pool
+    if not isinstance(pool, TimedAsyncQueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "timeouts": pool.timeouts,
+        "checkout_wait_seconds": pool.checkout_wait.snapshot(),
+    }
+
+def pool_histogram(engine: AsyncEngine) -> Optional[Histogram]:
+    pool = engine.pool
+    return pool.checkout_wait if isinstance(pool, TimedAsyncQueuePool) else None
+
+# Sync engine is kept for tooling that is not async
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URL, pool_pre_ping=True, **pool_options(settings.SQLALCHEMY_DATABASE_URL, async_=False))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base() 
\ No newline at end of file
+instrument_engine(engine, "sync")
+
+# Async engine used by every router so DB I/O never blocks the event loop
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URL, pool_pre_ping=True, **pool_options(settings.SQLALCHEMY_ASYNC_DATABASE_URL)
+)
+instrument_engine(async_engine.sync_engine, "primary")
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+Base = declarative_base()
+
+class Replica:
+    """A read replica plus its last measured replication lag."""
+
+    def __init__(self, url: str):
+        self.engine: AsyncEngine = create_async_engine(url, pool_pre_ping=True, **pool_options(url))
+        instrument_engine(self.engine.sync_engine, "replica")
+        self.sessionmaker = async_sessionmaker(bind=self.engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _measure_lag(self) -> Optional[float]:
+        """Seconds behind the primary; None when replication is broken or unknown."""
+        async with self.engine.connect() as conn:
+            if conn.dialect.name != "mysql":
+                return 0.0
+            try:
+                row = (await conn.execute(text("SHOW REPLICA STATUS"))).mappings().first()
+                column = "Seconds_Behind_Source"
+            except Exception:
+                # MySQL before 8.0.22
+                row = (await conn.execute(text("SHOW SLAVE STATUS"))).mappings().first()
+                column = "Seconds_Behind_Master"
+            if row is None:
+                # Not replicating from anything, so it cannot fall behind
+                return 0.0
+            return row[column]
+
+    async def current_lag(self) -> Optional[float]:
+        async with self._lock:
+            if time.monotonic() - self.checked_at >= settings.REPLICA_LAG_CHECK_SECONDS:
+                try:
+                    self.lag = await self._measure_lag()
+                except Exception as e:
+                    log.warning("db.replica_lag_check_failed", url=self.engine.url.render_as_string(hide_password=True), error=str(e))
+                    self.lag = None
+                self.checked_at = time.monotonic()
+            return self.lag
+
+class ReadRouter:
+    """Picks the session for read-only endpoints.
+
+    Reads go to a replica unless none is configured, every replica is further
+    behind than ``REPLICA_MAX_LAG_SECONDS`` (or unreachable), or the reading
+    user committed a write on this worker within ``READ_YOUR_WRITES_SECONDS``.
+    """
+
+    def __init__(self, urls):
+        self.replicas = [Replica(url) for url in urls]
+        self._next = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self.recent_writers = TTLCache(maxsize=100000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+        self.counts = {"replica": 0, "primary": 0, "primary_recent_write": 0, "primary_replica_lag": 0}
+
+    def note_write(self, user_id: Optional[int]):
+        if user_id is not None and self.replicas:
+            self.recent_writers.set(user_id, True)
+
+    async def sessionmaker(self, user_id: Optional[int] = None):
+        if not self.replicas:
+            self.counts["primary"] += 1
+            return AsyncSessionLocal
+        if user_id is not None and self.recent_writers.get(user_id):
+            self.counts["primary_recent_write"] += 1
+            return AsyncSessionLocal
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next)]
+            lag = await replica.current_lag()
+            if lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS:
+                self.counts["replica"] += 1
+                return replica.sessionmaker
+        self.counts["primary_replica_lag"] += 1
+        return AsyncSessionLocal
+
+    def stats(self) -> dict:
+        return {**self.counts, "replica_lag_seconds": [r.lag for r in self.replicas]}
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+read_router = ReadRouter([url.strip() for url in (settings.SQLALCHEMY_ASYNC_REPLICA_URLS or "").split(",") if url.strip()])
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session):
+    session.info["committed"] = True
+
+async def get_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        yield db
+        if db.sync_session.info.get("committed"):
+            # Keep this user's following reads on the primary until replicas catch up
+            read_router.note_write(getattr(request.state, "user_id", None))
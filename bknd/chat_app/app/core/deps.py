@@ -0,0 +1,84 @@
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db, read_router
+from app.core.security import decode_access_token
+from app.models.user import User
+from app.models.ticket import Ticket
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+# Short-lived per-process caches of detached rows: user_id -> User, ticket_id -> Ticket
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+ticket_cache = TTLCache(maxsize=settings.TICKET_CACHE_SIZE, ttl=settings.TICKET_CACHE_TTL_SECONDS)
+# (directory version, query) -> (page of entries, next cursor)
+directory_cache = TTLCache(maxsize=settings.DIRECTORY_CACHE_SIZE, ttl=settings.DIRECTORY_CACHE_TTL_SECONDS)
+
+def invalidate_directory():
+    """Drop cached directory pages after a user was registered or edited."""
+    directory_cache.clear()
+
+def invalidate_user(user_id: int):
+    """Drop a cached identity after its role or profile changed."""
+    user_cache.pop(user_id)
+    invalidate_directory()
+
+def invalidate_ticket(ticket_id: int):
+    """Drop a cached ticket after it was reassigned, renamed or closed."""
+    ticket_cache.pop(ticket_id)
+
+async def load_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.get(User, user_id)
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
+
+async def load_ticket(db: AsyncSession, ticket_id: int) -> Optional[Ticket]:
+    ticket = ticket_cache.get(ticket_id)
+    if ticket is None:
+        ticket = await db.get(Ticket, ticket_id)
+        if ticket is not None:
+            ticket_cache.set(ticket_id, ticket)
+    return ticket
+
+# The token dependencies are async so they run on the event loop: decode_access_token
+# uses token_cache, which is not thread safe, and sync dependencies run in the threadpool
+async def get_current_user_id(request: Request, token: str = Depends(oauth2_scheme)) -> int:
+    payload = decode_access_token(token)
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # get_db uses this to keep the user's next reads on the primary after a write
+    request.state.user_id = int(payload["sub"])
+    return request.state.user_id
+
+async def get_optional_user_id(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[int]:
+    payload = decode_access_token(token) if token else None
+    if payload is None or payload.get("sub") is None:
+        return None
+    return int(payload["sub"])
+
+async def get_read_db(user_id: Optional[int] = Depends(get_optional_user_id)):
+    """Session for read-only endpoints; may be served by a replica (see ``ReadRouter``)."""
+    sessionmaker = await read_router.sessionmaker(user_id)
+    async with sessionmaker() as db:
+        yield db
+
+async def get_current_user(user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)) -> User:
+    user = await load_user(db, user_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
@@ -0,0 +1,51 @@
+"""Conditional GET support for listing endpoints.
+
+Each endpoint derives a version for its result set from a cheap aggregate
+(counts, max ids, max ``updated_at``) instead of the rows themselves. The
+version, the caller and the query string are hashed into a weak ETag; when the
+client's ``If-None-Match`` still matches, the endpoint answers 304 without
+running the listing query.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Optional
+from fastapi import Request, Response
+
+# Responses are per caller and must be revalidated before reuse
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+def http_date(value: datetime) -> str:
+    # Naive timestamps are local time, like the ``datetime.now()`` they were written with
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def conditional(request: Request, response: Response, *version: Any, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """Set ETag, Cache-Control and Last-Modified on ``response`` for this version of the result.
+
+    Returns a 304 response to send instead when the client already holds it.
+    """
+    etag = make_etag(request.url.path, request.url.query, getattr(request.state, "user_id", None), *version)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+def cache_headers(response: Response) -> dict:
+    """The headers set by ``conditional``, for endpoints that build their own response."""
+    return {key: value for key, value in response.headers.items() if key in ("etag", "cache-control", "last-modified")}
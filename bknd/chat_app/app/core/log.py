@@ -0,0 +1,123 @@
+"""Structured logging that stays off the event loop's critical path.
+
+Callers log an event name plus keyword fields::
+
+    log = get_logger(__name__)
+    log.info("ws.connected", user_id=1, ticket_id=2)
+
+Level checks and per-event sampling (``LOG_SAMPLE_RATES``) run before a
+record is created. Records go onto a bounded queue unformatted; a listener
+thread renders them as JSON lines on stderr, and records are dropped (and
+counted) rather than blocking when the queue is full.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+from app.core.config import settings
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the caller and never formats on its thread."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class EventLogger:
+    """Wraps a stdlib logger with event-plus-fields calls and per-event sampling."""
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+
+    def _log(self, level: int, event: str, fields: dict, exc_info=None):
+        if not self._logger.isEnabledFor(level):
+            return
+        rate = settings.LOG_SAMPLE_RATES.get(event, 1.0)
+        if rate < 1.0:
+            if random.random() >= rate:
+                return
+            fields["sample_rate"] = rate
+        self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields):
+        """Log at ERROR with the active exception's traceback."""
+        self._log(logging.ERROR, event, fields, exc_info=sys.exc_info())
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room behind a full backlog; the stock put_nowait raises queue.Full
+        self.queue.put(self._sentinel)
+
+def get_logger(name: str) -> EventLogger:
+    return EventLogger(name)
+
+queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def start_logging():
+    """Route the ``app`` loggers through the queue; called once at startup."""
+    global queue_handler, _listener
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter())
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(settings.LOG_LEVEL.upper())
+    app_logger.addHandler(queue_handler)
+    app_logger.propagate = False
+    _listener = DrainingQueueListener(log_queue, output)
+    _listener.start()
+
+def stop_logging():
+    """Flush queued records, stop the listener thread and detach the queue handler."""
+    global queue_handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if queue_handler is not None:
+        # start_logging may run again (e.g. another app lifespan) and would add a second handler
+        app_logger = logging.getLogger("app")
+        app_logger.removeHandler(queue_handler)
+        app_logger.propagate = True
+        queue_handler = None
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import insert
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, read_router
+from app.models.message import Message
+from app.core.ticket_stats import record_messages
+from app.core.unread import record_direct_messages, invalidate_unread
+from app.core.sync import record_message_changes
+from app.core.log import get_logger
+
+log = get_logger(__name__)
+
+class PendingMessage:
+    """A chat message that has been broadcast but may not be in the DB yet."""
+
+    def __init__(self, seq: int, sender_id: int, content: str, ticket_id: Optional[int], receiver_id: Optional[int]):
+        # The room sequence for ticket messages, a per-process counter for direct ones
+        self.seq = seq
+        self.sender_id = sender_id
+        self.content = content
+        self.ticket_id = ticket_id
+        self.receiver_id = receiver_id
+        self.timestamp = datetime.now()
+        # Resolves to True once the row is committed, False if the flush failed
+        self.durable: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def row(self) -> dict:
+        return {
+            "sender_id": self.sender_id,
+            "receiver_id": self.receiver_id,
+            "ticket_id": self.ticket_id,
+            "content": self.content,
+            "timestamp": self.timestamp,
+            "seq": self.seq if self.ticket_id is not None else None,
+        }
+
+class MessageWriter:
+    """Write-behind queue that groups chat messages into multi-row INSERTs.
+
+    A batch is flushed when it reaches ``batch_size`` rows or when the oldest
+    pending message has waited ``flush_interval`` seconds, whichever is first.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[PendingMessage] = []
+        self._seq = 0
+        self._has_pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def submit(self, sender_id: int, content: str, ticket_id: int = None, receiver_id: int = None, seq: int = None) -> PendingMessage:
+        if seq is None:
+            self._seq += 1
+            seq = self._seq
+        pending = PendingMessage(seq, sender_id, content, ticket_id, receiver_id)
+        self._pending.append(pending)
+        self._has_pending.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+        return pending
+
+    async def _write(self, batch: List[PendingMessage]):
+        """Insert ``batch`` in one transaction and resolve its futures once committed."""
+        rows = [p.row() for p in batch]
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(Message), rows)
+            affected = await record_messages(db, rows) | await record_direct_messages(db, rows)
+            await record_message_changes(db, rows)
+            await db.commit()
+        invalidate_unread(affected)
+        for p in batch:
+            read_router.note_write(p.sender_id)
+            p.durable.set_result(True)
+
+    async def flush(self):
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            self._has_pending.clear()
+            self._full.clear()
+            if not batch:
+                return
+            try:
+                await self._write(batch)
+                return
+            except Exception:
+                log.exception("writer.flush_failed", messages=len(batch))
+            if len(batch) == 1:
+                batch[0].durable.set_result(False)
+                return
+            # The whole batch was rolled back; retry one row per transaction so a bad row only loses itself
+            for p in batch:
+                try:
+                    await self._write([p])
+                except Exception:
+                    log.exception("writer.message_dropped", sender_id=p.sender_id, ticket_id=p.ticket_id, receiver_id=p.receiver_id)
+                    p.durable.set_result(False)
+
+    async def _run(self):
+        while not self._stopping:
+            await self._has_pending.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def start(self):
+        if self._task is None:
+            # asyncio primitives belong to the loop that first waits on them, and
+            # the writer may be restarted on a new one (e.g. a second app lifespan)
+            self._has_pending, self._full, self._lock = asyncio.Event(), asyncio.Event(), asyncio.Lock()
+            if self._pending:
+                self._has_pending.set()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and write out whatever is still queued."""
+        if self._task is not None:
+            # Wake the loop and let it finish the flush it may be in; cancelling
+            # would abandon a batch already taken off the queue
+            self._stopping = True
+            self._has_pending.set()
+            self._full.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+message_writer = MessageWriter(
+    batch_size=settings.MESSAGE_BATCH_SIZE,
+    flush_interval=settings.MESSAGE_FLUSH_INTERVAL_MS / 1000,
+)
@@ -0,0 +1,199 @@
+"""In-process metrics with a Prometheus text exporter.
+
+Recording is a dict lookup plus integer/float adds on the event loop: no
+locks, no label validation on the hot path. Each worker reports its own
+values; scrape every worker (or run one per container) and let Prometheus
+aggregate. Values owned by other modules (cache hit rates, pool gauges, ...)
+are read at scrape time through collectors registered with ``collector``.
+"""
+import bisect
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Sequence, Tuple
+
+# Upper bounds in seconds, from sub-millisecond waits to pool timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+class Histogram:
+    """Distribution of observed values over fixed bucket upper bounds (Prometheus style)."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket plus +Inf
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return [(upper bound, observations <= bound), ...] ending with +Inf."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self._counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "buckets": self.cumulative()}
+
+class RateMeter:
+    """Events per second over a sliding window, kept as one bucket per second."""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._buckets: deque = deque()
+
+    def _trim(self, now: int):
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+    def mark(self, n: int = 1):
+        now = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == now:
+            self._buckets[-1][1] += n
+        else:
+            self._buckets.append([now, n])
+            self._trim(now)
+
+    def rate(self) -> float:
+        self._trim(int(time.monotonic()))
+        return sum(n for _, n in self._buckets) / self.window
+
+class Family:
+    """A named metric with one child per combination of label values."""
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: Sequence[str], factory: Callable):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple, object] = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._factory()
+        return child
+
+    def children(self):
+        return self._children.items()
+
+Sample = Tuple[Dict[str, str], float]
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _number(value) -> str:
+    if value is None:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+def _render_sample(lines, name: str, kind: str, labels: Dict[str, str], value):
+    if kind == "histogram":
+        for bound, count in value.cumulative():
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(value.sum)}")
+        lines.append(f"{name}_count{_labels(labels)} {value.count}")
+    else:
+        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families = []
+        self._collectors = []
+
+    def _family(self, name, help, kind, labelnames, factory) -> Family:
+        family = Family(name, help, kind, labelnames, factory)
+        self._families.append(family)
+        return family
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Family:
+        return self._family(name, help, "counter", labelnames, Counter)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Family:
+        return self._family(name, help, "histogram", labelnames, lambda: Histogram(buckets))
+
+    def collector(self, func: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]):
+        """Register a scrape-time callback yielding (name, kind, help, samples).
+
+        ``kind`` is "gauge", "counter" or "histogram"; histogram samples carry
+        ``Histogram`` objects instead of numbers.
+        """
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in family.children():
+                labels = dict(zip(family.labelnames, values))
+                _render_sample(lines, family.name, family.kind, labels, child if family.kind == "histogram" else child.value)
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    _render_sample(lines, name, kind, labels, value)
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry()
+
+def cache_samples(name: str, caches: Dict[str, object]):
+    """Collector output for TTLCache instances keyed by a ``cache`` label."""
+    stats = {label: cache.stats() for label, cache in caches.items()}
+    for field, kind in (("size", "gauge"), ("hits", "counter"), ("misses", "counter")):
+        metric = f"{name}_{field}" if kind == "gauge" else f"{name}_{field}_total"
+        yield metric, kind, f"Cache {field}", [({"cache": label}, s[field]) for label, s in stats.items()]
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request by method, route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+        self.duration = metrics_registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route templates keep label cardinality bounded; static files and 404s share one label
+            route = scope.get("route")
+            path = getattr(route, "path", "other")
+            self.duration.labels(scope["method"], path, str(status)).observe(time.perf_counter() - start)
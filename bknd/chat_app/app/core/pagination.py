@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+def encode_cursor(*values: Any) -> str:
+    """Pack the sort key of a row into an opaque, URL-safe cursor."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> list:
+    """Unpack a cursor made by ``encode_cursor``, converting each value with its parser."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(parsers):
+            raise ValueError("cursor length mismatch")
+        return [parse(v) for parse, v in zip(parsers, values)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_condition(columns: Sequence, values: Sequence, descending: bool = False):
+    """Row-value comparison ``(c1, c2, ...) > (v1, v2, ...)`` spelled out so indexes are used.
+
+    With ``descending`` the comparison is ``<``, i.e. rows that sort before the cursor.
+    """
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        prefix = [c == v for c, v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*prefix, column < value if descending else column > value))
+    return or_(*clauses)
@@ -0,0 +1,150 @@
+"""Versioned WebSocket frame protocol.
+
+Frames are dicts of the form ``{"v": 1, "type": <type>, ...}``. Clients pick an
+encoding by offering a subprotocol at connect:
+
+- ``chat.v1.json``: frames as JSON text
+- ``chat.v1.msgpack``: frames as MessagePack binary (when msgpack is installed)
+
+Clients that offer neither get the legacy ``"<sender>:<content>|<time>|<name>"``
+text format, so existing apps keep working.
+"""
+import json
+from datetime import datetime
+from typing import Optional, Union
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional; JSON and legacy still work
+    msgpack = None
+
+PROTOCOL_VERSION = 1
+
+LEGACY = "legacy"
+JSON = "json"
+MSGPACK = "msgpack"
+
+SUBPROTOCOLS = {"chat.v1.json": JSON}
+if msgpack is not None:
+    SUBPROTOCOLS["chat.v1.msgpack"] = MSGPACK
+
+# Frame types clients may send; the server also emits "ack", "notify" and "resync"
+CLIENT_FRAME_TYPES = {"message", "typing", "read", "call"}
+
+# Client fields copied onto relayed typing, read-receipt and call frames
+RELAY_FIELDS = {
+    "typing": ("active",),
+    "read": ("seq", "message_id"),
+    "call": ("event",),
+}
+
+def make_frame(frame_type: str, **fields) -> dict:
+    return {"v": PROTOCOL_VERSION, "type": frame_type, **fields}
+
+def negotiate(websocket: WebSocket):
+    """Return (encoding, subprotocol to accept with) for a connecting socket."""
+    for offered in websocket.scope.get("subprotocols", []):
+        if offered in SUBPROTOCOLS:
+            return SUBPROTOCOLS[offered], offered
+    return LEGACY, None
+
+async def accept(websocket: WebSocket) -> str:
+    encoding, subprotocol = negotiate(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    websocket.state.encoding = encoding
+    return encoding
+
+def render_legacy(frame: dict) -> Optional[str]:
+    """Render a frame in the old pipe-delimited text format, or None if it has no legacy form."""
+    frame_type = frame.get("type")
+    if frame_type == "message":
+        if frame.get("ticket_id") is None:
+            # Old direct-chat clients show everything after "<sender>: " as the message
+            return f"{frame['sender_id']}: {frame['content']}"
+        timestamp = datetime.fromisoformat(frame["timestamp"]).strftime('%I:%M %p')
+        return f"{frame['sender_id']}:{frame['content']}|{timestamp}|{frame.get('sender_name') or ''}|{frame['seq']}"
+    if frame_type == "notify":
+        return f"NOTIFY:ticket:{frame['ticket_id']}:{frame['title']}:{frame['preview']}"
+    if frame_type == "ack":
+        return f"ACK:{frame['seq']}"
+    return None
+
+def encode(frame: dict, encoding: str) -> Optional[Union[str, bytes]]:
+    if encoding == JSON:
+        return json.dumps(frame, separators=(",", ":"))
+    if encoding == MSGPACK:
+        return msgpack.packb(frame)
+    return render_legacy(frame)
+
+class Broadcast:
+    """One outgoing frame, encoded at most once per encoding and shared by every recipient.
+
+    Built from the JSON payload carried over the backplane, so JSON clients get
+    that exact string without re-serializing.
+    """
+
+    def __init__(self, payload: str):
+        self._frame: Optional[dict] = None
+        self._encoded = {JSON: payload}
+
+    @classmethod
+    def from_frame(cls, frame: dict) -> "Broadcast":
+        broadcast = cls(json.dumps(frame, separators=(",", ":")))
+        broadcast._frame = frame
+        return broadcast
+
+    @property
+    def payload(self) -> str:
+        return self._encoded[JSON]
+
+    @property
+    def frame(self) -> dict:
+        if self._frame is None:
+            self._frame = json.loads(self._encoded[JSON])
+        return self._frame
+
+    def encoded(self, encoding: str) -> Optional[Union[str, bytes]]:
+        if encoding not in self._encoded:
+            self._encoded[encoding] = encode(self.frame, encoding)
+        return self._encoded[encoding]
+
+async def send(websocket: WebSocket, data: Union[str, bytes]):
+    if isinstance(data, bytes):
+        await websocket.send_bytes(data)
+    else:
+        await websocket.send_text(data)
+
+async def send_frame(websocket: WebSocket, frame: dict):
+    data = encode(frame, websocket.state.encoding)
+    if data is not None:
+        await send(websocket, data)
+
+async def receive_frame(websocket: WebSocket) -> Optional[dict]:
+    """Read one client frame; returns None for frames that should be ignored.
+
+    On legacy sockets JSON text with a known frame type is a frame and any other
+    text is a chat message; structured sockets must send frames in their
+    negotiated encoding.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    text, data = message.get("text"), message.get("bytes")
+    encoding = websocket.state.encoding
+    try:
+        if encoding == MSGPACK:
+            frame = msgpack.unpackb(data if data is not None else text.encode())
+        elif text is not None:
+            frame = json.loads(text)
+        else:
+            return None
+    except Exception:
+        if encoding == LEGACY and text is not None:
+            return make_frame("message", content=text)
+        return None
+    is_frame = isinstance(frame, dict) and frame.get("type") in CLIENT_FRAME_TYPES
+    if encoding == LEGACY and not is_frame:
+        # Plain text that happens to parse as JSON (e.g. "42" or '{"a":1}') is still a chat message
+        return make_frame("message", content=text)
+    return frame if is_frame else None
@@ -0,0 +1,128 @@
+"""Per-room message sequence numbers and replay of missed messages on reconnect.
+
+Every ticket message gets the next ``seq`` of its room from the backplane, so
+numbering is shared by all workers, and the value is stored on the row.
+A client reconnecting with ``last_seq`` is sent what it missed from this
+worker's ring buffer of recent broadcasts, or from an indexed
+``(ticket_id, seq)`` range read when the buffer no longer covers the gap.
+
+Seqs increase but can have holes (a message whose row failed to store keeps
+its number), so clients treat them as an ordering, not a count.
+"""
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+from sqlalchemy import select, func
+from app.core.backplane import backplane
+from app.core.config import settings
+from app.core.connections import Connection, registry
+from app.core.database import AsyncSessionLocal
+from app.core.deps import load_user
+from app.core.metrics import metrics_registry
+from app.core.protocol import Broadcast, make_frame
+from app.models.message import Message
+
+replays = metrics_registry.counter("ws_replays_total", "Reconnect replays by where the missed messages came from", ("source",))
+
+def message_frame(message: Message, sender_name: str) -> dict:
+    """The live broadcast frame for a stored ticket message."""
+    return make_frame(
+        "message",
+        seq=message.seq,
+        ticket_id=message.ticket_id,
+        sender_id=message.sender_id,
+        sender_name=sender_name,
+        content=message.content,
+        timestamp=message.timestamp.isoformat(),
+    )
+
+async def _max_stored_seq(ticket_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.scalar(select(func.max(Message.seq)).filter(Message.ticket_id == ticket_id))) or 0
+
+async def next_room_seq(ticket_id: int) -> int:
+    return await backplane.next_sequence(f"ticket:{ticket_id}", lambda: _max_stored_seq(ticket_id))
+
+class ReplayBuffer:
+    """The last ``size`` message broadcasts of up to ``rooms`` rooms, least recently active dropped first.
+
+    Every worker sees every room broadcast through the backplane, so each keeps
+    a complete recent window whether or not it holds sockets for the room.
+    """
+
+    def __init__(self, size: int, rooms: int):
+        self.size = size
+        self.rooms = rooms
+        self._rooms: "OrderedDict[str, Deque[Tuple[int, Broadcast]]]" = OrderedDict()
+
+    def record(self, room: str, seq: int, broadcast: Broadcast):
+        buffer = self._rooms.get(room)
+        if buffer is None:
+            buffer = self._rooms[room] = deque(maxlen=self.size)
+            while len(self._rooms) > self.rooms:
+                self._rooms.popitem(last=False)
+        else:
+            self._rooms.move_to_end(room)
+        buffer.append((seq, broadcast))
+
+    def after(self, room: str, seq: int) -> List[Tuple[int, Broadcast]]:
+        """Buffered broadcasts with a higher seq, in seq order."""
+        return sorted((entry for entry in self._rooms.get(room, ()) if entry[0] > seq), key=lambda e: e[0])
+
+    def gap(self, room: str, last_seq: int, head: Optional[int]) -> Optional[List[Broadcast]]:
+        """Everything after ``last_seq`` up to ``head``, or None if the buffer is missing any of it."""
+        if head is None:
+            return None
+        entries = self.after(room, last_seq)
+        expected = last_seq + 1
+        for seq, _ in entries:
+            if seq != expected:
+                return None
+            expected += 1
+        return [broadcast for _, broadcast in entries] if expected > head else None
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+replay_buffer = ReplayBuffer(settings.WS_REPLAY_BUFFER_SIZE, settings.WS_REPLAY_ROOMS)
+
+async def _stored_after(ticket_id: int, last_seq: int, limit: int) -> List[dict]:
+    async with AsyncSessionLocal() as db:
+        messages = (await db.execute(
+            select(Message)
+            .filter(Message.ticket_id == ticket_id, Message.seq > last_seq)
+            .order_by(Message.seq)
+            .limit(limit)
+        )).scalars().all()
+        frames = []
+        for message in messages:
+            sender = await load_user(db, message.sender_id)
+            frames.append(message_frame(message, sender.name if sender else ""))
+        return frames
+
+async def replay_and_join(connection: Connection, ticket_id: int, last_seq: int):
+    """Queue the messages the client missed after ``last_seq``, then join the room.
+
+    Nothing is awaited between the final buffer read and the join, so a message
+    broadcast meanwhile is either replayed or delivered live, never both or neither.
+    """
+    room = f"ticket:{ticket_id}"
+    head = await backplane.current_sequence(room)
+    broadcasts = replay_buffer.gap(room, last_seq, head)
+    if broadcasts is not None:
+        replays.labels("buffer").inc()
+    else:
+        frames = await _stored_after(ticket_id, last_seq, settings.WS_REPLAY_MAX_MESSAGES + 1)
+        if len(frames) > settings.WS_REPLAY_MAX_MESSAGES:
+            # Too far behind to replay; the client reloads the history over HTTP
+            replays.labels("resync").inc()
+            connection.send_frame(make_frame("resync", ticket_id=ticket_id))
+            registry.join(room, connection)
+            return
+        replays.labels("db").inc()
+        broadcasts = [Broadcast.from_frame(frame) for frame in frames]
+        # Messages broadcast while reading, or not flushed yet, are only in the buffer
+        stored_up_to = frames[-1]["seq"] if frames else last_seq
+        broadcasts += [broadcast for _, broadcast in replay_buffer.after(room, stored_up_to)]
+    for broadcast in broadcasts:
+        connection.send(broadcast.encoded(connection.encoding))
+    registry.join(room, connection)
@@ -0,0 +1,39 @@
+"""Full-text search over ``messages.content``.
+
+The index is maintained by the database as rows are written: an InnoDB
+FULLTEXT index on MySQL, an FTS5 table kept in sync by triggers on SQLite.
+Other dialects fall back to a substring scan. Every backend yields a
+relevance score where higher is better, so hits page by (score, id) keyset.
+"""
+import re
+from sqlalchemy import false, literal, literal_column, table, column
+from sqlalchemy.dialects import mysql
+from app.models.message import Message
+
+messages_fts = table("messages_fts", column("rowid"))
+_fts_table = literal_column("messages_fts")
+
+def fts5_query(q: str) -> str:
+    # Quote each word so user input cannot inject FTS5 operators; terms are ANDed
+    return " ".join('"%s"' % word for word in re.findall(r"\w+", q))
+
+def search_messages(stmt, dialect: str, q: str):
+    """Restrict a ``select(Message)`` to rows matching ``q``.
+
+    Returns the statement and its score expression for ranking and paging.
+    """
+    if dialect == "mysql":
+        score = mysql.match(Message.content, against=q).in_natural_language_mode()
+        return stmt.filter(score > 0), score
+    if dialect == "sqlite":
+        terms = fts5_query(q)
+        if not terms:
+            # No words to look up (e.g. "!!!"), and FTS5 rejects an empty MATCH
+            return stmt.filter(false()), literal(0.0)
+        # bm25() is lower-is-better, negate it to match the other backends
+        score = -literal_column("bm25(messages_fts)")
+        stmt = stmt.join(messages_fts, messages_fts.c.rowid == Message.id).filter(
+            _fts_table.op("MATCH")(terms)
+        )
+        return stmt, score
+    return stmt.filter(Message.content.ilike(f"%{q}%")), literal(0.0)
@@ -2,19 +2,64 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.metrics import metrics_registry
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so a small dedicated thread pool gives real parallelism
+# without competing with the threadpool that serves sync endpoints.
+password_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_hash_inflight = 0
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool and its queue are full."""
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
+# Verified claims keyed by token digest, each entry living until the token's exp
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+password_hash_duration = metrics_registry.histogram(
+    "password_hash_duration_seconds", "bcrypt time per hash or verify, excluding queueing", ("operation",)
+)
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+async def _run_password_hash(operation, func, *args):
+    global _password_hash_inflight
+    if _password_hash_inflight >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_DEPTH:
+        raise PasswordHasherBusy()
+    _password_hash_inflight += 1
+    try:
+        # Timed on the worker thread, recorded back on the event loop
+        result, elapsed = await asyncio.get_running_loop().run_in_executor(password_hash_pool, _timed, func, *args)
+        password_hash_duration.labels(operation).observe(elapsed)
+        return result
+    finally:
+        _password_hash_inflight -= 1
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_password_hash("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_password_hash("hash", get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -23,8 +68,15 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 def decode_access_token(token: str):
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
-        return None 
\ No newline at end of file
+        return None
+    exp = payload.get("exp")
+    if exp is not None and exp > time.time():
+        token_cache.set(key, payload, ttl=exp - time.time())
+    return payload 
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""Incremental sync for clients that keep a local copy (``GET /api/sync``).
+
+Writes that change something a client may hold append ``change_log`` rows,
+one per affected user, in the writer's own transaction: the ticket itself,
+new messages in a ticket or direct conversation, or read state. A sync token
+is an opaque (log position, time) pair; a sync returns the changed tickets,
+the messages posted to the changed conversations since the token's time, and
+the unread summary, plus a token to pass next time.
+
+Log ids are handed out at INSERT but become visible at COMMIT, so a lower id
+can appear after a higher one was read. Tokens therefore never move past rows
+younger than ``SYNC_SETTLE_SECONDS``; those rows are sent again next time and
+clients apply everything idempotently by id.
+
+Run ``python -m app.core.sync prune`` to drop rows older than
+``SYNC_RETENTION_DAYS``; older tokens then get 410 and must resync from the
+listing endpoints.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import select, insert, delete, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.unread import get_unread
+from app.models.change_log import ChangeLog
+from app.models.message import Message
+from app.models.ticket import Ticket
+from app.models import user  # noqa: F401  (needed to configure the Ticket.creator/assignee relationships)
+from app.schemas.message import MessageRead, UnreadSummary
+from app.schemas.sync import SyncResponse
+from app.schemas.ticket import TicketRead
+
+# Change kinds; entity_id is the ticket id, or the peer's user id for direct messages
+TICKET = "ticket"
+TICKET_MESSAGES = "ticket_messages"
+DIRECT_MESSAGES = "direct_messages"
+READ = "read"
+
+async def log_changes(db: AsyncSession, changes: Iterable[Tuple[int, str, Optional[int]]]):
+    """Append (user_id, kind, entity_id) changes, once each, in the caller's transaction."""
+    now = datetime.now()
+    rows = [
+        {"user_id": user_id, "kind": kind, "entity_id": entity_id, "created_at": now}
+        for user_id, kind, entity_id in sorted(set(changes), key=str) if user_id is not None
+    ]
+    if rows:
+        await db.execute(insert(ChangeLog), rows)
+
+async def record_ticket_change(db: AsyncSession, ticket: Ticket, *also_notify: Optional[int]):
+    """Log a created or edited ticket for its participants (and e.g. a previous assignee)."""
+    await log_changes(db, [(u, TICKET, ticket.id) for u in {ticket.creator_id, ticket.assignee_id, *also_notify}])
+
+async def record_message_changes(db: AsyncSession, rows: List[dict]):
+    """Log newly inserted messages (dicts with sender_id, receiver_id, ticket_id) per conversation.
+
+    A batch yields one row per participant and conversation, however many messages it holds.
+    """
+    ticket_ids = {row["ticket_id"] for row in rows if row.get("ticket_id") is not None}
+    participants = {}
+    if ticket_ids:
+        result = await db.execute(
+            select(Ticket.id, Ticket.creator_id, Ticket.assignee_id).filter(Ticket.id.in_(ticket_ids))
+        )
+        participants = {r.id: {r.creator_id, r.assignee_id} for r in result}
+    changes = set()
+    for row in rows:
+        if row.get("ticket_id") is not None:
+            changes.update((u, TICKET_MESSAGES, row["ticket_id"]) for u in participants.get(row["ticket_id"], ()))
+        elif row.get("receiver_id") is not None:
+            changes.add((row["sender_id"], DIRECT_MESSAGES, row["receiver_id"]))
+            changes.add((row["receiver_id"], DIRECT_MESSAGES, row["sender_id"]))
+    await log_changes(db, changes)
+
+async def record_read_changes(db: AsyncSession, user_ids: Iterable[int]):
+    """Log that these users' unread counts went down."""
+    await log_changes(db, [(u, READ, None) for u in user_ids])
+
+def encode_token(change_id: int, as_of: datetime) -> str:
+    return encode_cursor(change_id, as_of)
+
+def decode_token(token: str) -> Tuple[int, datetime]:
+    change_id, as_of = decode_cursor(token, int, datetime.fromisoformat)
+    return change_id, as_of
+
+async def _settled_head(db: AsyncSession, settled: datetime) -> int:
+    """The newest log position no lower id can still commit behind, across all users.
+
+    Quiet users are moved up to it, so their tokens stay newer than what
+    ``prune`` removes even when they have no changes of their own.
+    """
+    stmt = select(ChangeLog.id).filter(ChangeLog.created_at <= settled).order_by(ChangeLog.id.desc()).limit(1)
+    return (await db.scalar(stmt)) or 0
+
+async def _conversation_messages(db: AsyncSession, user_id: int, kind: str, entity_id: int, since: datetime):
+    if kind == TICKET_MESSAGES:
+        stmt = select(Message).filter(Message.ticket_id == entity_id)
+    else:
+        stmt = select(Message).filter(
+            Message.ticket_id.is_(None),
+            or_(and_(Message.sender_id == user_id, Message.receiver_id == entity_id),
+                and_(Message.sender_id == entity_id, Message.receiver_id == user_id)),
+        )
+    # Newest first so a long absence returns the latest messages; the client pages history for the rest
+    stmt = stmt.filter(Message.timestamp > since).order_by(Message.timestamp.desc(), Message.id.desc())
+    messages = (await db.execute(stmt.limit(settings.SYNC_MAX_MESSAGES + 1))).scalars().all()
+    truncated = len(messages) > settings.SYNC_MAX_MESSAGES
+    return messages[:settings.SYNC_MAX_MESSAGES][::-1], truncated
+
+async def sync_changes(db: AsyncSession, user_id: int, token: Optional[str]) -> SyncResponse:
+    now = datetime.now()
+    settled = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    if token is None:
+        # Bootstrap: take the token first, then load the listings; nothing is missed in between
+        return SyncResponse(token=encode_token(await _settled_head(db, settled), now))
+    change_id, as_of = decode_token(token)
+    oldest = await db.scalar(select(func.min(ChangeLog.id)))
+    if oldest is not None and change_id + 1 < oldest:
+        raise HTTPException(status_code=410, detail="Sync token expired, reload and start over")
+    entries = (await db.execute(
+        select(ChangeLog)
+        .filter(ChangeLog.user_id == user_id, ChangeLog.id > change_id)
+        .order_by(ChangeLog.id)
+        .limit(settings.SYNC_MAX_CHANGES + 1)
+    )).scalars().all()
+    has_more = len(entries) > settings.SYNC_MAX_CHANGES
+    entries = entries[:settings.SYNC_MAX_CHANGES]
+
+    next_change_id = change_id
+    for entry in entries:
+        if entry.created_at > settled:
+            break
+        next_change_id = entry.id
+    if not entries:
+        next_change_id = max(change_id, await _settled_head(db, settled))
+    # With more to come, later conversations still need messages from the old time
+    next_as_of = as_of if has_more else now
+
+    response = SyncResponse(token=encode_token(next_change_id, next_as_of), has_more=has_more)
+    if not entries:
+        return response
+    ticket_ids = sorted({e.entity_id for e in entries if e.kind == TICKET})
+    if ticket_ids:
+        tickets = (await db.execute(select(Ticket).filter(Ticket.id.in_(ticket_ids)))).scalars().all()
+        visible = [t for t in tickets if user_id in (t.creator_id, t.assignee_id)]
+        response.tickets = [TicketRead.model_validate(t) for t in visible]
+        response.removed_tickets = sorted(set(ticket_ids) - {t.id for t in visible})
+    # Message timestamps may be stored to the whole second, so widen the window to the second before
+    since = (as_of - timedelta(seconds=settings.SYNC_SETTLE_SECONDS + 1)).replace(microsecond=0)
+    conversations = sorted({(e.kind, e.entity_id) for e in entries if e.kind in (TICKET_MESSAGES, DIRECT_MESSAGES)})
+    for kind, entity_id in conversations:
+        messages, truncated = await _conversation_messages(db, user_id, kind, entity_id, since)
+        response.messages.extend(MessageRead.model_validate(m) for m in messages)
+        if truncated:
+            response.truncated.append(f"{'ticket' if kind == TICKET_MESSAGES else 'user'}:{entity_id}")
+    tickets_unread, users_unread = await get_unread(db, user_id)
+    response.unread = UnreadSummary(
+        total=sum(tickets_unread.values()) + sum(users_unread.values()), tickets=tickets_unread, users=users_unread
+    )
+    return response
+
+async def prune(db: AsyncSession, days: int) -> int:
+    result = await db.execute(delete(ChangeLog).filter(ChangeLog.created_at < datetime.now() - timedelta(days=days)))
+    await db.commit()
+    return result.rowcount
+
+async def main(days: int):
+    from app.core.database import AsyncSessionLocal, async_engine
+    try:
+        async with AsyncSessionLocal() as db:
+            print(f"Pruned {await prune(db, days)} change_log rows")
+    finally:
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the change_log table behind /api/sync")
+    parser.add_argument("command", choices=["prune"])
+    parser.add_argument("--days", type=int, default=settings.SYNC_RETENTION_DAYS)
+    args = parser.parse_args()
+    asyncio.run(main(args.days))
@@ -0,0 +1,215 @@
+"""Incremental per-ticket message statistics.
+
+``ticket_stats`` and ``ticket_unread`` are updated in the same transaction as
+the message INSERTs, so the dashboard summary can be answered from one row.
+Run ``python -m app.core.ticket_stats backfill`` to populate them for existing
+data and ``python -m app.core.ticket_stats check`` to verify them.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Set
+from sqlalchemy import select, update, insert, delete, func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.message import Message
+from app.models.ticket import Ticket, TicketStats, TicketUnread
+from app.models import user  # noqa: F401  (needed to configure the Ticket.creator/assignee relationships)
+
+async def _update_or_insert(db: AsyncSession, update_stmt, insert_stmt):
+    # Portable upsert: most calls hit an existing row, so try the UPDATE first
+    if (await db.execute(update_stmt)).rowcount:
+        return
+    try:
+        async with db.begin_nested():
+            await db.execute(insert_stmt)
+    except IntegrityError:
+        # Another writer created the row in the meantime
+        await db.execute(update_stmt)
+
+async def _participants(db: AsyncSession, ticket_ids: Iterable[int]) -> Dict[int, set]:
+    result = await db.execute(
+        select(Ticket.id, Ticket.creator_id, Ticket.assignee_id).filter(Ticket.id.in_(list(ticket_ids)))
+    )
+    return {row.id: {row.creator_id, row.assignee_id} - {None} for row in result}
+
+async def _add_unread(db: AsyncSession, ticket_id: int, user_id: int, delta: int):
+    if delta > 0:
+        new_count = TicketUnread.unread_count + delta
+    else:
+        new_count = case((TicketUnread.unread_count > -delta, TicketUnread.unread_count + delta), else_=0)
+    await _update_or_insert(
+        db,
+        update(TicketUnread)
+        .filter(TicketUnread.ticket_id == ticket_id, TicketUnread.user_id == user_id)
+        .values(unread_count=new_count),
+        insert(TicketUnread).values(ticket_id=ticket_id, user_id=user_id, unread_count=max(delta, 0)),
+    )
+
+async def record_messages(db: AsyncSession, rows: List[dict]) -> Set[int]:
+    """Fold newly inserted messages (dicts with ticket_id, sender_id, timestamp) into the stats.
+
+    Runs inside the caller's transaction; rows without a ticket_id are ignored.
+    Returns the users whose unread counts went up.
+    """
+    by_ticket: Dict[int, List[dict]] = {}
+    for row in rows:
+        if row.get("ticket_id") is not None:
+            by_ticket.setdefault(row["ticket_id"], []).append(row)
+    if not by_ticket:
+        return set()
+    affected = set()
+    participants = await _participants(db, by_ticket)
+    for ticket_id, ticket_rows in by_ticket.items():
+        first = min(r["timestamp"] for r in ticket_rows)
+        newest = max(ticket_rows, key=lambda r: r["timestamp"])
+        is_newer = TicketStats.last_message_at.is_(None) | (TicketStats.last_message_at <= newest["timestamp"])
+        await _update_or_insert(
+            db,
+            # last_sender_id goes before last_message_at: MySQL evaluates SET left to right
+            update(TicketStats).filter(TicketStats.ticket_id == ticket_id).ordered_values(
+                (TicketStats.message_count, TicketStats.message_count + len(ticket_rows)),
+                (TicketStats.first_message_at, func.coalesce(TicketStats.first_message_at, first)),
+                (TicketStats.last_sender_id, case((is_newer, newest["sender_id"]), else_=TicketStats.last_sender_id)),
+                (TicketStats.last_message_at, case((is_newer, newest["timestamp"]), else_=TicketStats.last_message_at)),
+            ),
+            insert(TicketStats).values(
+                ticket_id=ticket_id,
+                message_count=len(ticket_rows),
+                first_message_at=first,
+                last_message_at=newest["timestamp"],
+                last_sender_id=newest["sender_id"],
+            ),
+        )
+        for participant in participants.get(ticket_id, ()):
+            unread = sum(1 for r in ticket_rows if r["sender_id"] != participant)
+            if unread:
+                await _add_unread(db, ticket_id, participant, unread)
+                affected.add(participant)
+    return affected
+
+async def record_read(db: AsyncSession, ticket_id: int, read_by_sender: Dict[int, int]) -> Set[int]:
+    """Account for ticket messages flipped to read, given as {sender_id: count}.
+
+    Returns the users whose unread counts went down.
+    """
+    affected = set()
+    participants = (await _participants(db, [ticket_id])).get(ticket_id, ())
+    for participant in participants:
+        read = sum(n for sender_id, n in read_by_sender.items() if sender_id != participant)
+        if read:
+            await _add_unread(db, ticket_id, participant, -read)
+            affected.add(participant)
+    total = sum(read_by_sender.values())
+    if total:
+        await _update_or_insert(
+            db,
+            update(TicketStats).filter(TicketStats.ticket_id == ticket_id).values(read_count=TicketStats.read_count + total),
+            insert(TicketStats).values(ticket_id=ticket_id, message_count=0, read_count=total),
+        )
+    return affected
+
+async def get_ticket_stats(db: AsyncSession, ticket_id: int):
+    return await db.get(TicketStats, ticket_id)
+
+async def compute_ticket_stats(db: AsyncSession, ticket_id: int):
+    """Recompute the stats for one ticket from ``messages``; returns (stats dict, {user_id: unread})."""
+    row = (await db.execute(
+        select(func.count(Message.id), func.min(Message.timestamp), func.max(Message.timestamp))
+        .filter(Message.ticket_id == ticket_id)
+    )).one()
+    last = (await db.execute(
+        select(Message.sender_id).filter(Message.ticket_id == ticket_id)
+        .order_by(Message.timestamp.desc(), Message.id.desc()).limit(1)
+    )).scalar()
+    read_count = (await db.execute(
+        select(func.count(Message.id)).filter(Message.ticket_id == ticket_id, Message.read == True)  # noqa: E712
+    )).scalar()
+    stats = {
+        "message_count": row[0],
+        "first_message_at": row[1],
+        "last_message_at": row[2],
+        "last_sender_id": last,
+        "read_count": read_count,
+    }
+    unread = {}
+    for participant in (await _participants(db, [ticket_id])).get(ticket_id, ()):
+        unread[participant] = (await db.execute(
+            select(func.count(Message.id)).filter(
+                Message.ticket_id == ticket_id,
+                Message.sender_id != participant,
+                # NULL read predates the column default and counts as unread
+                func.coalesce(Message.read, False) == False,  # noqa: E712
+            )
+        )).scalar()
+    return stats, unread
+
+async def refresh_ticket_stats(db: AsyncSession, ticket_id: int):
+    """Overwrite the stored stats for a ticket with freshly computed values."""
+    stats, unread = await compute_ticket_stats(db, ticket_id)
+    await _update_or_insert(
+        db,
+        update(TicketStats).filter(TicketStats.ticket_id == ticket_id).values(**stats),
+        insert(TicketStats).values(ticket_id=ticket_id, **stats),
+    )
+    await db.execute(delete(TicketUnread).filter(TicketUnread.ticket_id == ticket_id))
+    if unread:
+        await db.execute(insert(TicketUnread), [
+            {"ticket_id": ticket_id, "user_id": user_id, "unread_count": count} for user_id, count in unread.items()
+        ])
+
+def _normalize(value):
+    # MySQL drops sub-second precision and tz info, so compare at second granularity
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0, tzinfo=None)
+    return value
+
+async def check_ticket_stats(db: AsyncSession, fix: bool = False) -> int:
+    """Compare stored stats with ``messages`` for every ticket; returns the number of mismatches."""
+    mismatches = 0
+    ticket_ids = (await db.execute(select(Ticket.id).order_by(Ticket.id))).scalars().all()
+    for ticket_id in ticket_ids:
+        expected, expected_unread = await compute_ticket_stats(db, ticket_id)
+        stored = await db.get(TicketStats, ticket_id)
+        stored_unread = dict((await db.execute(
+            select(TicketUnread.user_id, TicketUnread.unread_count).filter(TicketUnread.ticket_id == ticket_id)
+        )).all())
+        if stored is None:
+            actual = {"message_count": 0, "first_message_at": None, "last_message_at": None, "last_sender_id": None, "read_count": 0}
+        else:
+            actual = {key: getattr(stored, key) for key in expected}
+        problems = [
+            f"{key}: stored={actual[key]} expected={expected[key]}"
+            for key in expected if _normalize(actual[key]) != _normalize(expected[key])
+        ]
+        # A missing row and a zero count mean the same thing
+        stored_unread = {k: v for k, v in stored_unread.items() if v}
+        expected_unread = {k: v for k, v in expected_unread.items() if v}
+        if stored_unread != expected_unread:
+            problems.append(f"unread: stored={stored_unread} expected={expected_unread}")
+        if problems:
+            mismatches += 1
+            print(f"ticket {ticket_id}: " + "; ".join(problems))
+            if fix:
+                await refresh_ticket_stats(db, ticket_id)
+        if fix:
+            await db.commit()
+    return mismatches
+
+async def main(command: str):
+    from app.core.database import AsyncSessionLocal, async_engine
+    async with AsyncSessionLocal() as db:
+        mismatches = await check_ticket_stats(db, fix=(command == "backfill"))
+    await async_engine.dispose()
+    if command == "backfill":
+        print(f"Backfill done, {mismatches} tickets updated")
+    else:
+        print(f"{mismatches} tickets out of sync")
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill or verify the ticket_stats tables")
+    parser.add_argument("command", choices=["backfill", "check"])
+    args = parser.parse_args()
+    mismatches = asyncio.run(main(args.command))
+    raise SystemExit(1 if mismatches and args.command == "check" else 0)
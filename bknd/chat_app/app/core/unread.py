@@ -0,0 +1,68 @@
+"""Unread counters per user and conversation.
+
+Ticket conversations are counted in ``ticket_unread`` (see ``ticket_stats``),
+direct conversations in ``direct_unread``. Both are updated in the same
+transaction as the messages they count, and each user's summary is cached
+here as two small ``{id: count}`` dicts so badge polls do not touch the DB.
+"""
+from typing import Dict, Iterable, List, Set
+from sqlalchemy import select, update, insert, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.ticket_stats import _update_or_insert
+from app.models.message import DirectUnread
+from app.models.ticket import TicketUnread
+
+# user_id -> (ticket_id -> unread, peer_id -> unread), zero counts left out
+unread_cache = TTLCache(maxsize=settings.UNREAD_CACHE_SIZE, ttl=settings.UNREAD_CACHE_TTL_SECONDS)
+
+def invalidate_unread(user_ids: Iterable[int]):
+    """Drop cached summaries; call after the transaction that changed them committed."""
+    for user_id in user_ids:
+        unread_cache.pop(user_id)
+
+async def _add_direct_unread(db: AsyncSession, user_id: int, peer_id: int, delta: int):
+    if delta > 0:
+        new_count = DirectUnread.unread_count + delta
+    else:
+        new_count = case((DirectUnread.unread_count > -delta, DirectUnread.unread_count + delta), else_=0)
+    await _update_or_insert(
+        db,
+        update(DirectUnread)
+        .filter(DirectUnread.user_id == user_id, DirectUnread.peer_id == peer_id)
+        .values(unread_count=new_count),
+        insert(DirectUnread).values(user_id=user_id, peer_id=peer_id, unread_count=max(delta, 0)),
+    )
+
+async def record_direct_messages(db: AsyncSession, rows: List[dict]) -> Set[int]:
+    """Count newly inserted direct messages as unread for their receivers; returns the receivers."""
+    counts: Dict[tuple, int] = {}
+    for row in rows:
+        if row.get("ticket_id") is None and row.get("receiver_id") is not None:
+            key = (row["receiver_id"], row["sender_id"])
+            counts[key] = counts.get(key, 0) + 1
+    for (user_id, peer_id), count in counts.items():
+        await _add_direct_unread(db, user_id, peer_id, count)
+    return {user_id for user_id, _ in counts}
+
+async def record_direct_read(db: AsyncSession, user_id: int, peer_id: int, count: int):
+    """Account for ``count`` messages from ``peer_id`` to ``user_id`` flipped to read."""
+    if count:
+        await _add_direct_unread(db, user_id, peer_id, -count)
+
+async def get_unread(db: AsyncSession, user_id: int):
+    """Return ({ticket_id: unread}, {peer_id: unread}) for a user."""
+    summary = unread_cache.get(user_id)
+    if summary is None:
+        tickets = dict((await db.execute(
+            select(TicketUnread.ticket_id, TicketUnread.unread_count)
+            .filter(TicketUnread.user_id == user_id, TicketUnread.unread_count > 0)
+        )).all())
+        users = dict((await db.execute(
+            select(DirectUnread.peer_id, DirectUnread.unread_count)
+            .filter(DirectUnread.user_id == user_id, DirectUnread.unread_count > 0)
+        )).all())
+        summary = (tickets, users)
+        unread_cache.set(user_id, summary)
+    return summary
@@ -1,14 +1,40 @@
-from fastapi import FastAPI, Request, Cookie
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, Request, Cookie, Depends
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, ticket, message, ws_chat, user
-from app.models.message import Message
-from app.core.database import SessionLocal
-from app.core.security import decode_access_token
+from app.routers import auth, ticket, message, ws_chat, user, sync
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import async_engine, read_router, get_db, pool_stats, pool_histogram
+from app.core.message_writer import message_writer
+from app.core.backplane import backplane
+from app.core.ticket_stats import get_ticket_stats
+from app.core.security import decode_access_token, token_cache
+from app.core.deps import user_cache, ticket_cache, directory_cache
+from app.core.unread import unread_cache
+from app.core.connections import registry
+from app.core.replay import replay_buffer
+from app.core.metrics import metrics_registry, cache_samples, RequestMetricsMiddleware
+from app.core import log
+from app.core.avatars import start_avatar_pool, stop_avatar_pool
 from fastapi.staticfiles import StaticFiles
 import os
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log.start_logging()
+    start_avatar_pool()
+    await message_writer.start()
+    await backplane.start(ws_chat.deliver)
+    yield
+    await backplane.stop()
+    # Flush queued chat messages before the engine goes away
+    await message_writer.stop()
+    await read_router.dispose()
+    await async_engine.dispose()
+    stop_avatar_pool()
+    log.stop_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,6 +45,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestMetricsMiddleware)
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 app.include_router(auth.router)
@@ -26,6 +54,7 @@ app.include_router(ticket.router)
 app.include_router(message.router)
 app.include_router(ws_chat.router)
 app.include_router(user.router)
+app.include_router(sync.router)
 
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -34,27 +63,70 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 def read_root(request: Request):
     return {"message": "Welcome to the backend API. No frontend available."}
 
-def summarize_chat(ticket_id: int, messages):
+def summarize_chat(ticket_id: int, stats):
     """Simple chat summarization - you can enhance this with AI/ML"""
-    if not messages:
+    if not stats or not stats.message_count:
         return "No messages in this chat."
     
-    message_count = len(messages)
-    first_message_time = messages[0].timestamp.strftime("%Y-%m-%d %H:%M")
-    last_message_time = messages[-1].timestamp.strftime("%Y-%m-%d %H:%M")
+    first_message_time = stats.first_message_at.strftime("%Y-%m-%d %H:%M")
+    last_message_time = stats.last_message_at.strftime("%Y-%m-%d %H:%M")
     
-    return f"Chat has {message_count} messages from {first_message_time} to {last_message_time}."
+    return f"Chat has {stats.message_count} messages from {first_message_time} to {last_message_time}."
 
 @app.post("/dashboard/chat/{ticket_id}/summarize", response_class=HTMLResponse)
-def dashboard_chat_summarize(ticket_id: int, request: Request, access_token: str = Cookie(None)):
+async def dashboard_chat_summarize(ticket_id: int, request: Request, access_token: str = Cookie(None), db: AsyncSession = Depends(get_db)):
     if not access_token:
         return HTMLResponse("<div>Please log in</div>", status_code=401)
-    db = SessionLocal()
     payload = decode_access_token(access_token)
     if not payload or "sub" not in payload:
         return HTMLResponse("<div>Invalid token</div>", status_code=401)
-    messages = db.query(Message).filter(Message.ticket_id == ticket_id).order_by(Message.timestamp).all()
-    summary = summarize_chat(ticket_id, messages)
-    db.close()
+    # Answered from the incrementally maintained ticket_stats row
+    summary = summarize_chat(ticket_id, await get_ticket_stats(db, ticket_id))
     html = f"<div class='mt-2 p-3 bg-blue-100 border-l-4 border-blue-400 text-blue-800 rounded'><b>Chat Summary:</b> {summary}</div>"
-    return HTMLResponse(html) 
\ No newline at end of file
+    return HTMLResponse(html)
+
+@metrics_registry.collector
+def collect_app_metrics():
+    yield from cache_samples("cache", {
+        "token": token_cache, "user": user_cache, "ticket": ticket_cache, "unread": unread_cache,
+        "directory": directory_cache,
+    })
+    connections = registry.stats()
+    yield "ws_open_connections", "gauge", "Open WebSocket connections on this worker", [
+        ({"kind": "user"}, connections["user_connections"]),
+        ({"kind": "room"}, connections["room_connections"]),
+    ]
+    yield "ws_rooms", "gauge", "Ticket rooms with at least one socket", [({}, connections["rooms"])]
+    yield "ws_room_joins_total", "counter", "Room joins", [({}, connections["joins_total"])]
+    yield "ws_room_leaves_total", "counter", "Room leaves", [({}, connections["leaves_total"])]
+    yield "ws_room_churn_per_second", "gauge", "Room joins plus leaves per second over the last minute", [
+        ({}, connections["churn_per_second"])
+    ]
+    yield "ws_replay_buffer_rooms", "gauge", "Ticket rooms with recent messages buffered for replay", [({}, len(replay_buffer))]
+    yield "log_records_dropped_total", "counter", "Log records dropped because the log queue was full", [
+        ({}, log.queue_handler.dropped if log.queue_handler else 0)
+    ]
+    yield "chat_messages_per_second", "gauge", "Chat messages received over the last minute", [({}, ws_chat.message_rate.rate())]
+    yield "db_reads_total", "counter", "Read-only sessions by routing decision", [
+        ({"target": key}, value) for key, value in read_router.stats().items() if key != "replica_lag_seconds"
+    ]
+    yield "db_replica_lag_seconds", "gauge", "Last measured replica lag", [
+        ({"replica": str(i)}, lag) for i, lag in enumerate(read_router.stats()["replica_lag_seconds"])
+    ]
+    engines = {"primary": async_engine, **{f"replica{i}": r.engine for i, r in enumerate(read_router.replicas)}}
+    pools = {name: pool_stats(engine) for name, engine in engines.items()}
+    pools = {name: stats for name, stats in pools.items() if stats}
+    for field in ("size", "in_use", "idle", "overflow"):
+        yield f"db_pool_{field}", "gauge", f"Connection pool {field}", [({"engine": name}, s[field]) for name, s in pools.items()]
+    yield "db_pool_timeouts_total", "counter", "Checkouts that hit pool_timeout", [
+        ({"engine": name}, s["timeouts"]) for name, s in pools.items()
+    ]
+    yield "db_pool_checkout_wait_seconds", "histogram", "Time waiting for a pooled connection", [
+        ({"engine": name}, pool_histogram(engines[name])) for name in pools
+    ]
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    # Runs on the event loop: the registries, caches and rate meters it reads are
+    # mutated there without locks, so a threadpool scrape could see them mid-update
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Index
+from app.core.database import Base
+
+class ChangeLog(Base):
+    """Append-only log of what changed for whom, read by ``GET /api/sync``.
+
+    One row per affected user; ``id`` is the position a sync token points at.
+    """
+    __tablename__ = "change_log"
+
+    # BIGINT on MySQL; SQLite only autoincrements an INTEGER primary key
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # A user's changes after their token, in log order
+        Index("ix_change_log_user_id_id", "user_id", "id"),
+    )
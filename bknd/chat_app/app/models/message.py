@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Index, DDL, event
 from sqlalchemy.sql import func
+from datetime import datetime
 from app.core.database import Base
 
 class Message(Base):
@@ -10,5 +11,50 @@ class Message(Base):
     receiver_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     ticket_id = Column(Integer, ForeignKey("tickets.id"), nullable=True)
     content = Column(Text, nullable=False)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    read = Column(Boolean, default=False) 
\ No newline at end of file
+    # Set client side, as the write-behind queue does, so SQLite stores every row in the
+    # format the (timestamp, id) history cursor is compared in
+    timestamp = Column(DateTime(timezone=True), default=datetime.now, server_default=func.now())
+    read = Column(Boolean, default=False)
+    # Position in the ticket room, increasing per ticket; NULL for direct messages. Not gap
+    # free: a row the write-behind queue fails to store leaves a hole, so clients must not
+    # wait for a missing seq
+    seq = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # Ticket history in (timestamp, id) keyset order
+        Index("ix_messages_ticket_id_timestamp_id", "ticket_id", "timestamp", "id"),
+        # Reconnect replay reads a seq range of one ticket
+        Index("ix_messages_ticket_id_seq", "ticket_id", "seq"),
+        # Direct-message history for either side of the conversation
+        Index("ix_messages_sender_id_timestamp_id", "sender_id", "timestamp", "id"),
+        Index("ix_messages_receiver_id_timestamp_id", "receiver_id", "timestamp", "id"),
+        Index("ix_messages_receiver_id_read", "receiver_id", "read"),
+        # Full-text search on MySQL; SQLite uses the messages_fts table below
+        Index("ix_messages_content_fulltext", "content", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
+class DirectUnread(Base):
+    """Unread direct messages per receiver and sender (the ticket equivalent is ticket_unread)."""
+    __tablename__ = "direct_unread"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    peer_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+
+# SQLite FTS5 index over messages.content, kept in sync by triggers
+MESSAGES_FTS_DDL = [
+    "CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='messages', content_rowid='id')",
+    """CREATE TRIGGER messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+for statement in MESSAGES_FTS_DDL:
+    event.listen(Message.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import mysql
 from app.core.database import Base
 import enum
 from datetime import datetime
@@ -27,8 +28,54 @@ class Ticket(Base):
     priority = Column(Enum(TicketPriority), default=TicketPriority.NORMAL, nullable=False)
     creator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set client side like message timestamps, so SQLite stores the same format the
+    # listing keyset compares against (CURRENT_TIMESTAMP drops the microseconds)
+    created_at = Column(DateTime(timezone=True), default=datetime.now, server_default=func.now())
     closed_at = Column(DateTime(timezone=True), nullable=True)
+    # Microsecond precision so two edits in the same second still change listing ETags
+    updated_at = Column(
+        DateTime(timezone=True).with_variant(mysql.DATETIME(fsp=6), "mysql"),
+        default=datetime.now, onupdate=datetime.now, nullable=True,
+    )
 
     creator = relationship("User", foreign_keys=[creator_id], back_populates="created_tickets")
-    assignee = relationship("User", foreign_keys=[assignee_id], back_populates="assigned_tickets") 
\ No newline at end of file
+    assignee = relationship("User", foreign_keys=[assignee_id], back_populates="assigned_tickets")
+
+    __table_args__ = (
+        # Cover the per-user listing version (count, max id, max updated_at)
+        Index("ix_tickets_creator_id_updated_at", "creator_id", "updated_at"),
+        Index("ix_tickets_assignee_id_updated_at", "assignee_id", "updated_at"),
+        # Listing pages in created_at order, with and without a status filter; the primary
+        # key is implicitly the last column, which completes the (created_at, id) keyset
+        Index("ix_tickets_creator_id_created_at", "creator_id", "created_at"),
+        Index("ix_tickets_assignee_id_created_at", "assignee_id", "created_at"),
+        Index("ix_tickets_creator_id_status_created_at", "creator_id", "status", "created_at"),
+        # creator_id makes the per-status counts covering on the assignee side too
+        Index("ix_tickets_assignee_id_status_created_at", "assignee_id", "status", "created_at", "creator_id"),
+    )
+
+class TicketStats(Base):
+    """Per-ticket message summary, maintained incrementally on every insert."""
+    __tablename__ = "ticket_stats"
+
+    ticket_id = Column(Integer, ForeignKey("tickets.id"), primary_key=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    first_message_at = Column(DateTime(timezone=True), nullable=True)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    last_sender_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Messages marked read; versions the history ETag when a read moves no unread
+    # counter (e.g. a participant reading their own message)
+    read_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+class TicketUnread(Base):
+    """Unread ticket messages per participant (messages from others with read = false)."""
+    __tablename__ = "ticket_unread"
+
+    ticket_id = Column(Integer, ForeignKey("tickets.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # A user's unread tickets, for the unread summary
+        Index("ix_ticket_unread_user_id", "user_id"),
+    )
\ No newline at end of file
@@ -1,19 +1,30 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Table, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Table, Index, Enum as SQLEnum
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import mysql
 from app.core.database import Base
 import enum
+from datetime import datetime
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
     role = Column(String(20), nullable=False)
     password_hash = Column(String(255), nullable=False)
     avatar = Column(String(255), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True).with_variant(mysql.DATETIME(fsp=6), "mysql"),
+        default=datetime.now, onupdate=datetime.now, nullable=True, index=True,
+    )
+
+    __table_args__ = (
+        # Directory filtered by role, paged in id order
+        Index("ix_users_role_id", "role", "id"),
+    )
     
     # Ticket relationships
     created_tickets = relationship("Ticket", foreign_keys="[Ticket.creator_id]", back_populates="creator")
@@ -37,6 +48,11 @@ class FriendRequest(Base):
     sender = relationship("User", foreign_keys=[sender_id])
     receiver = relationship("User", foreign_keys=[receiver_id])
 
+    __table_args__ = (
+        Index("ix_friend_requests_sender_id_status", "sender_id", "status"),
+        Index("ix_friend_requests_receiver_id_status", "receiver_id", "status"),
+    )
+
 class UserContact(Base):
     __tablename__ = "user_contacts"
 
@@ -47,4 +63,9 @@ class UserContact(Base):
 
     # Relationships
     user1 = relationship("User", foreign_keys=[user1_id])
-    user2 = relationship("User", foreign_keys=[user2_id]) 
\ No newline at end of file
+    user2 = relationship("User", foreign_keys=[user2_id])
+
+    __table_args__ = (
+        Index("ix_user_contacts_user1_id_user2_id", "user1_id", "user2_id"),
+        Index("ix_user_contacts_user2_id", "user2_id"),
+    ) 
\ No newline at end of file
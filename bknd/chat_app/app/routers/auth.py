@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
-from app.core.security import get_password_hash, create_access_token, verify_password
-from app.core.database import SessionLocal
+from app.core.security import get_password_hash_async, create_access_token, verify_password_async, PasswordHasherBusy
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.deps import invalidate_directory
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
@@ -17,27 +20,37 @@ class LoginRequest(BaseModel):
     email: str
     password: str
 
+def hasher_busy():
+    return HTTPException(
+        status_code=503,
+        detail="Too many concurrent authentication requests",
+        headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER)},
+    )
+
 @router.post("/register")
-def register(user_in: RegisterRequest):
-    db = SessionLocal()
-    existing = db.query(User).filter(User.email == user_in.email).first()
+async def register(user_in: RegisterRequest, db: AsyncSession = Depends(get_db)):
+    existing = (await db.execute(select(User).filter(User.email == user_in.email))).scalars().first()
     if existing:
-        db.close()
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = User(name=user_in.name, email=user_in.email, password_hash=get_password_hash(user_in.password), role=user_in.role)
+    try:
+        password_hash = await get_password_hash_async(user_in.password)
+    except PasswordHasherBusy:
+        raise hasher_busy()
+    user = User(name=user_in.name, email=user_in.email, password_hash=password_hash, role=user_in.role)
     db.add(user)
-    db.commit()
-    db.refresh(user)
-    db.close()
+    await db.commit()
+    await db.refresh(user)
+    invalidate_directory()
     return {"id": user.id, "email": user.email}
 
 @router.post("/login")
-def login(login_in: LoginRequest):
-    db = SessionLocal()
-    user = db.query(User).filter(User.email == login_in.email).first()
-    if not user or not verify_password(login_in.password, user.password_hash):
-        db.close()
+async def login(login_in: LoginRequest, db: AsyncSession = Depends(get_db)):
+    user = (await db.execute(select(User).filter(User.email == login_in.email))).scalars().first()
+    try:
+        valid = user is not None and await verify_password_async(login_in.password, user.password_hash)
+    except PasswordHasherBusy:
+        raise hasher_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token({"sub": str(user.id)})
-    db.close()
-    return {"access_token": token, "token_type": "bearer"} 
\ No newline at end of file
+    return {"access_token": token, "token_type": "bearer"}
@@ -1,52 +1,235 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.schemas.message import MessageCreate, MessageRead
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+from app.schemas.message import MessageCreate, MessageRead, MessageSearchHit, MarkRead, UnreadSummary
 from app.models.message import Message
+from app.models.ticket import Ticket, TicketStats, TicketUnread
 from app.models.user import User
-from app.core.database import SessionLocal
+from app.core.database import get_db
+from app.core.deps import get_current_user, get_read_db, load_ticket, load_user
+from app.core.http_cache import conditional, cache_headers
+from app.core.pagination import encode_cursor, decode_cursor, keyset_condition
+from app.core.search import search_messages
+from app.core.ticket_stats import record_messages, record_read
+from app.core.unread import record_direct_messages, record_direct_read, get_unread, invalidate_unread
+from app.core.sync import record_message_changes, record_read_changes
+from app.core.backplane import backplane
+from app.core.protocol import Broadcast
+from app.core.replay import next_room_seq, message_frame
 
 router = APIRouter(prefix="/api/messages", tags=["messages"])
 
+MAX_PAGE_SIZE = 500
+
+# NULL read predates the column default and counts as unread
+is_unread = or_(Message.read == False, Message.read.is_(None))  # noqa: E712
+
+def paginate_history(stmt, before: Optional[str], after: Optional[str], limit: Optional[int]):
+    """Apply (timestamp, id) keyset bounds to a message query.
+
+    Returns the statement and whether it reads newest first, which is the case
+    when paging backwards or when only a ``limit`` (the latest page) is given.
+    """
+    keys = (Message.timestamp, Message.id)
+    if after:
+        stmt = stmt.filter(keyset_condition(keys, decode_cursor(after, datetime.fromisoformat, int)))
+    if before:
+        stmt = stmt.filter(keyset_condition(keys, decode_cursor(before, datetime.fromisoformat, int), descending=True))
+    newest_first = bool(before) or (limit is not None and not after)
+    stmt = stmt.order_by(*(k.desc() for k in keys)) if newest_first else stmt.order_by(*keys)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt, newest_first
+
+async def stream_messages(stmt, bind):
+    # The request scoped session is gone by the time the body streams, so open our own
+    async with AsyncSession(bind) as db:
+        result = await db.stream(stmt.execution_options(yield_per=200))
+        async for message in result.scalars():
+            yield MessageRead.model_validate(message).model_dump_json() + "\n"
+
+async def message_history(db: AsyncSession, stmt, response: Response, before, after, limit, format):
+    stmt, newest_first = paginate_history(stmt, before, after, limit)
+    if format == "ndjson":
+        # Rows are written in query order, i.e. newest first when paging backwards
+        return StreamingResponse(stream_messages(stmt, db.bind), media_type="application/x-ndjson", headers=cache_headers(response))
+    messages = (await db.execute(stmt)).scalars().all()
+    if newest_first:
+        messages = messages[::-1]
+    if messages:
+        response.headers["X-Before-Cursor"] = encode_cursor(messages[0].timestamp, messages[0].id)
+        response.headers["X-After-Cursor"] = encode_cursor(messages[-1].timestamp, messages[-1].id)
+    return [MessageRead.model_validate(m) for m in messages]
+
 @router.post("/", response_model=MessageRead)
-def send_message(message_in: MessageCreate):
-    db = SessionLocal()
+async def send_message(message_in: MessageCreate, db: AsyncSession = Depends(get_db)):
     db_message = Message(
         sender_id=message_in.sender_id if hasattr(message_in, 'sender_id') else 1,  # Replace with actual user logic
         receiver_id=message_in.receiver_id,
         ticket_id=message_in.ticket_id,
         content=message_in.content
     )
+    if db_message.ticket_id is not None:
+        # Share the room numbering with WebSocket messages so reconnect replay includes this one
+        db_message.seq = await next_room_seq(db_message.ticket_id)
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
-    db.close()
+    await db.flush()
+    await db.refresh(db_message)
+    rows = [{
+        "ticket_id": db_message.ticket_id,
+        "sender_id": db_message.sender_id,
+        "receiver_id": db_message.receiver_id,
+        "timestamp": db_message.timestamp,
+    }]
+    affected = await record_messages(db, rows) | await record_direct_messages(db, rows)
+    await record_message_changes(db, rows)
+    await db.commit()
+    invalidate_unread(affected)
+    if db_message.ticket_id is not None:
+        # Delivered live like socket messages, so connected clients see no hole in the room's seqs
+        sender = await load_user(db, db_message.sender_id)
+        frame = message_frame(db_message, sender.name if sender else "")
+        await backplane.publish(f"ticket:{db_message.ticket_id}", Broadcast.from_frame(frame).payload)
     return MessageRead.model_validate(db_message)
 
+async def ticket_messages_version(db: AsyncSession, ticket_id: int):
+    """Message count, latest message time, read count and outstanding unread for a ticket.
+
+    Two primary key lookups on the counter tables; an insert changes the count,
+    a read the read count, and a reassign the unread counters.
+    """
+    stats = await db.get(TicketStats, ticket_id)
+    unread = await db.scalar(
+        select(func.coalesce(func.sum(TicketUnread.unread_count), 0)).filter(TicketUnread.ticket_id == ticket_id)
+    )
+    if stats is None:
+        return (0, None, 0, unread), None
+    return (stats.message_count, stats.last_message_at, stats.read_count, unread), stats.last_message_at
+
 @router.get("/ticket/{ticket_id}", response_model=List[MessageRead])
-def list_ticket_messages(ticket_id: int):
-    db = SessionLocal()
-    messages = db.query(Message).filter(Message.ticket_id == ticket_id).order_by(Message.timestamp).all()
-    db.close()
-    return [MessageRead.model_validate(m) for m in messages]
+async def list_ticket_messages(
+    ticket_id: int,
+    request: Request,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    version, last_modified = await ticket_messages_version(db, ticket_id)
+    not_modified = conditional(request, response, *version, last_modified=last_modified)
+    if not_modified:
+        return not_modified
+    stmt = select(Message).filter(Message.ticket_id == ticket_id)
+    return await message_history(db, stmt, response, before, after, limit, format)
 
 @router.get("/user/{user_id}", response_model=List[MessageRead])
-def list_user_messages(user_id: int):
-    db = SessionLocal()
-    messages = db.query(Message).filter(
-        ((Message.sender_id == user_id) | (Message.receiver_id == user_id))
-    ).order_by(Message.timestamp).all()
-    db.close()
-    return [MessageRead.model_validate(m) for m in messages]
+async def list_user_messages(
+    user_id: int,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    stmt = select(Message).filter((Message.sender_id == user_id) | (Message.receiver_id == user_id))
+    return await message_history(db, stmt, response, before, after, limit, format)
+
+@router.get("/search", response_model=List[MessageSearchHit])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    ticket_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Ranked search over the messages the caller can see.
+
+    Scope to one ticket with ``ticket_id`` or to the direct conversation with
+    ``user_id``; pass the ``X-Next-Cursor`` header back as ``cursor`` for more hits.
+    """
+    me = current_user.id
+    my_tickets = select(Ticket.id).filter((Ticket.creator_id == me) | (Ticket.assignee_id == me))
+    stmt = select(Message).filter(or_(Message.sender_id == me, Message.receiver_id == me, Message.ticket_id.in_(my_tickets)))
+    if ticket_id is not None:
+        stmt = stmt.filter(Message.ticket_id == ticket_id)
+    if user_id is not None:
+        stmt = stmt.filter(
+            Message.ticket_id.is_(None),
+            or_(and_(Message.sender_id == me, Message.receiver_id == user_id),
+                and_(Message.sender_id == user_id, Message.receiver_id == me)),
+        )
+    stmt, score = search_messages(stmt, db.bind.dialect.name, q)
+    if cursor:
+        stmt = stmt.filter(keyset_condition((score, Message.id), decode_cursor(cursor, float, int), descending=True))
+    stmt = stmt.add_columns(score).order_by(score.desc(), Message.id.desc()).limit(limit)
+    rows = (await db.execute(stmt)).all()
+    if len(rows) == limit:
+        last_message, last_score = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last_score, last_message.id)
+    return [MessageSearchHit(**MessageRead.model_validate(m).model_dump(), score=s) for m, s in rows]
 
 @router.post("/{message_id}/read")
-def mark_message_read(message_id: int):
-    db = SessionLocal()
-    message = db.query(Message).filter(Message.id == message_id).first()
+async def mark_message_read(message_id: int, db: AsyncSession = Depends(get_db)):
+    message = (await db.execute(select(Message).filter(Message.id == message_id))).scalars().first()
     if not message:
-        db.close()
         raise HTTPException(status_code=404, detail="Message not found")
+    affected = set()
+    if not message.read:
+        if message.ticket_id is not None:
+            affected = await record_read(db, message.ticket_id, {message.sender_id: 1})
+        elif message.receiver_id is not None:
+            await record_direct_read(db, message.receiver_id, message.sender_id, 1)
+            affected = {message.receiver_id}
     message.read = True
-    db.commit()
-    db.close()
-    return {"detail": "Message marked as read"} 
\ No newline at end of file
+    await record_read_changes(db, affected)
+    await db.commit()
+    invalidate_unread(affected)
+    return {"detail": "Message marked as read"}
+
+@router.post("/read")
+async def mark_read_up_to(body: MarkRead, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Mark every message from others up to ``up_to_id`` in a conversation as read with one UPDATE."""
+    me = current_user.id
+    if (body.ticket_id is None) == (body.user_id is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of ticket_id or user_id")
+    if body.ticket_id is not None:
+        ticket = await load_ticket(db, body.ticket_id)
+        if not ticket:
+            raise HTTPException(status_code=404, detail="Ticket not found")
+        if ticket.creator_id != me and ticket.assignee_id != me:
+            raise HTTPException(status_code=403, detail="Not authorized to view this ticket")
+        criteria = (Message.ticket_id == body.ticket_id, Message.sender_id != me, Message.id <= body.up_to_id, is_unread)
+        # Ticket counters are kept per participant, so they need the flipped rows per sender
+        read_by_sender = dict((await db.execute(
+            select(Message.sender_id, func.count(Message.id)).filter(*criteria).group_by(Message.sender_id)
+        )).all())
+    else:
+        criteria = (Message.ticket_id.is_(None), Message.sender_id == body.user_id, Message.receiver_id == me,
+                    Message.id <= body.up_to_id, is_unread)
+    result = await db.execute(
+        update(Message).filter(*criteria).values(read=True).execution_options(synchronize_session=False)
+    )
+    if body.ticket_id is not None:
+        affected = await record_read(db, body.ticket_id, read_by_sender)
+    else:
+        await record_direct_read(db, me, body.user_id, result.rowcount)
+        affected = {me}
+    await record_read_changes(db, affected)
+    await db.commit()
+    invalidate_unread(affected)
+    return {"detail": "Messages marked as read", "count": result.rowcount}
+
+@router.get("/unread", response_model=UnreadSummary)
+async def unread_summary(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Unread counts per ticket and per direct-message peer, from counters rather than ``messages``."""
+    tickets, users = await get_unread(db, current_user.id)
+    return UnreadSummary(total=sum(tickets.values()) + sum(users.values()), tickets=tickets, users=users)
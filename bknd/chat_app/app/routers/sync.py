@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.schemas.sync import SyncResponse
+from app.core.database import get_db
+from app.core.deps import get_current_user_id
+from app.core.sync import sync_changes
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+@router.get("", response_model=SyncResponse)
+async def sync(since: Optional[str] = None, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    """Changes to the caller's tickets, conversations and unread counts since ``since``.
+
+    Call without ``since`` to get a starting token before loading the listings,
+    then pass back the ``token`` of each response.
+    """
+    return await sync_changes(db, user_id, since)
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Header
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.models.ticket import Ticket
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+from datetime import datetime
+from app.models.ticket import Ticket, TicketStatus, TicketPriority
 from app.models.user import User
-from app.core.database import SessionLocal
-from app.core.security import decode_access_token
+from app.schemas.ticket import TicketUpdate
+from app.core.database import get_db
+from app.core.http_cache import conditional
+from app.core.pagination import encode_cursor, decode_cursor, keyset_condition
+from app.core.deps import get_current_user, get_read_db, invalidate_ticket
+from app.core.ticket_stats import refresh_ticket_stats
+from app.core.unread import invalidate_unread
+from app.core.sync import record_ticket_change
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/tickets", tags=["tickets"])
@@ -18,49 +26,122 @@ class TicketCreate(BaseModel):
 class TicketRead(BaseModel):
     id: int
     title: str
-    description: str
+    description: Optional[str] = None
     priority: str
     status: str
     creator_id: int
-    assignee_id: int = None
+    assignee_id: Optional[int] = None
 
     class Config:
         from_attributes = True
 
+async def tickets_version(db: AsyncSession, user_id: int):
+    """(count, max id, max updated_at) of the user's created and assigned tickets.
+
+    Each side is answered from its (user, updated_at) index without touching rows.
+    """
+    version = []
+    for column in (Ticket.creator_id, Ticket.assignee_id):
+        stmt = select(func.count(), func.max(Ticket.id), func.max(Ticket.updated_at)).filter(column == user_id)
+        version.append(tuple((await db.execute(stmt)).one()))
+    updated = [row[2] for row in version if row[2] is not None]
+    return version, max(updated) if updated else None
+
+MAX_PAGE_SIZE = 500
+SORTS = ("created_at", "-created_at", "priority", "-priority")
+PRIORITY_ORDER = list(TicketPriority)  # LOW .. CRITICAL
+
+def participant_scopes(user_id: int):
+    """The user's tickets as two disjoint predicates, one per participant index.
+
+    An OR across creator_id and assignee_id cannot be read in created_at order
+    from either index, so each side is queried on its own and the pages merged.
+    """
+    return (Ticket.creator_id == user_id, and_(Ticket.assignee_id == user_id, Ticket.creator_id != user_id))
+
+async def fetch_tickets(db: AsyncSession, user_id: int, filters: list, newest_first: bool, after: Optional[list], limit: Optional[int]):
+    keys = (Ticket.created_at, Ticket.id)
+    tickets = []
+    for scope in participant_scopes(user_id):
+        stmt = select(Ticket).filter(scope, *filters)
+        if after:
+            stmt = stmt.filter(keyset_condition(keys, after, descending=newest_first))
+        stmt = stmt.order_by(*(k.desc() if newest_first else k for k in keys))
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        tickets.extend((await db.execute(stmt)).scalars().all())
+    tickets.sort(key=lambda t: (t.created_at, t.id), reverse=newest_first)
+    return tickets[:limit]
+
 @router.get("/", response_model=List[TicketRead])
-def list_tickets(request: Request, authorization: Optional[str] = Header(None)):
-    db = SessionLocal()
-    user_id = None
-    token = None
-    if authorization and authorization.startswith("Bearer "):
-        token = authorization.split(" ", 1)[1]
-    if token:
-        payload = decode_access_token(token)
-        if payload and "sub" in payload:
-            user_id = int(payload["sub"])
-    if not user_id:
-        db.close()
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    tickets = db.query(Ticket).filter(
-        (Ticket.creator_id == user_id) | (Ticket.assignee_id == user_id)
-    ).all()
-    db.close()
+async def list_tickets(
+    request: Request,
+    response: Response,
+    status: Optional[List[TicketStatus]] = Query(None),
+    priority: Optional[List[TicketPriority]] = Query(None),
+    sort: str = Query("-created_at", pattern="^-?(created_at|priority)$"),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Tickets the user created or is assigned, optionally filtered by status and priority.
+
+    ``sort`` is ``created_at`` or ``priority``, prefixed with ``-`` for
+    descending; tickets of equal priority are listed newest first. With a
+    ``limit``, pass the ``X-Next-Cursor`` header back as ``cursor`` for the next page.
+    """
+    user_id = current_user.id
+    version, last_modified = await tickets_version(db, user_id)
+    not_modified = conditional(request, response, *version, last_modified=last_modified)
+    if not_modified:
+        return not_modified
+    filters = []
+    if status:
+        filters.append(Ticket.status.in_(status))
+    if sort.endswith("created_at"):
+        if priority:
+            filters.append(Ticket.priority.in_(priority))
+        after = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
+        tickets = await fetch_tickets(db, user_id, filters, sort.startswith("-"), after, limit)
+        next_cursor = encode_cursor(tickets[-1].created_at, tickets[-1].id) if limit and len(tickets) == limit else None
+    else:
+        # One index range per priority level, walked in sort order, so the enum's
+        # storage order (names on SQLite, declaration order on MySQL) does not matter
+        order = PRIORITY_ORDER[::-1] if sort.startswith("-") else PRIORITY_ORDER
+        start, after = 0, None
+        if cursor:
+            level, created_at, ticket_id = decode_cursor(cursor, TicketPriority, datetime.fromisoformat, int)
+            start, after = order.index(level), [created_at, ticket_id]
+        tickets = []
+        for level in order[start:]:
+            if priority and level not in priority:
+                after = None
+                continue
+            remaining = None if limit is None else limit - len(tickets)
+            tickets += await fetch_tickets(db, user_id, filters + [Ticket.priority == level], True, after, remaining)
+            after = None
+            if limit is not None and len(tickets) == limit:
+                break
+        last = tickets[-1] if tickets else None
+        next_cursor = encode_cursor(last.priority.value, last.created_at, last.id) if limit and len(tickets) == limit else None
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return tickets
 
+@router.get("/counts", response_model=Dict[str, int])
+async def ticket_counts(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    """Number of the user's tickets in each status, read from the (user, status) indexes alone."""
+    counts = {s.value: 0 for s in TicketStatus}
+    for scope in participant_scopes(current_user.id):
+        rows = await db.execute(select(Ticket.status, func.count()).filter(scope).group_by(Ticket.status))
+        for status, count in rows:
+            counts[status.value] += count
+    return counts
+
 @router.post("/", response_model=TicketRead)
-def create_ticket(ticket_in: TicketCreate, authorization: Optional[str] = Header(None)):
-    db = SessionLocal()
-    user_id = None
-    token = None
-    if authorization and authorization.startswith("Bearer "):
-        token = authorization.split(" ", 1)[1]
-    if token:
-        payload = decode_access_token(token)
-        if payload and "sub" in payload:
-            user_id = int(payload["sub"])
-    if not user_id:
-        db.close()
-        raise HTTPException(status_code=401, detail="Not authenticated")
+async def create_ticket(ticket_in: TicketCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    user_id = current_user.id
     ticket = Ticket(
         title=ticket_in.title,
         description=ticket_in.description,
@@ -69,31 +150,51 @@ def create_ticket(ticket_in: TicketCreate, authorization: Optional[str] = Header
         assignee_id=ticket_in.assignee_id
     )
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
-    db.close()
+    await db.flush()
+    await record_ticket_change(db, ticket)
+    await db.commit()
+    await db.refresh(ticket)
     return ticket
 
 @router.get("/{ticket_id}", response_model=TicketRead)
-def get_ticket(ticket_id: int, authorization: Optional[str] = Header(None)):
-    db = SessionLocal()
-    user_id = None
-    token = None
-    if authorization and authorization.startswith("Bearer "):
-        token = authorization.split(" ", 1)[1]
-    if token:
-        payload = decode_access_token(token)
-        if payload and "sub" in payload:
-            user_id = int(payload["sub"])
-    if not user_id:
-        db.close()
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+async def get_ticket(ticket_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    user_id = current_user.id
+    ticket = await db.get(Ticket, ticket_id)
     if not ticket:
-        db.close()
         raise HTTPException(status_code=404, detail="Ticket not found")
     if ticket.creator_id != user_id and ticket.assignee_id != user_id:
-        db.close()
         raise HTTPException(status_code=403, detail="Not authorized to view this ticket")
-    db.close()
-    return ticket 
\ No newline at end of file
+    return ticket
+
+@router.put("/{ticket_id}", response_model=TicketRead)
+async def update_ticket(ticket_id: int, ticket_in: TicketUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    user_id = current_user.id
+    ticket = await db.get(Ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    if ticket.creator_id != user_id and ticket.assignee_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this ticket")
+    changes = ticket_in.model_dump(exclude_unset=True)
+    try:
+        if "status" in changes:
+            changes["status"] = TicketStatus(changes["status"])
+        if "priority" in changes:
+            changes["priority"] = TicketPriority(changes["priority"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    reassigned = "assignee_id" in changes and changes["assignee_id"] != ticket.assignee_id
+    previous_assignee_id = ticket.assignee_id
+    for field, value in changes.items():
+        setattr(ticket, field, value)
+    if "status" in changes:
+        ticket.closed_at = datetime.now() if ticket.status == TicketStatus.CLOSED else None
+    if reassigned:
+        # Unread counters are kept per participant, so rebuild them for the new assignee
+        await db.flush()
+        await refresh_ticket_stats(db, ticket_id)
+    await record_ticket_change(db, ticket, previous_assignee_id)
+    await db.commit()
+    invalidate_ticket(ticket_id)
+    if reassigned:
+        invalidate_unread({ticket.creator_id, previous_assignee_id, ticket.assignee_id} - {None})
+    return ticket
@@ -1,57 +1,132 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, File, Query, Request, Response, UploadFile
+from fastapi.responses import RedirectResponse
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
 from app.models.user import User
-from app.schemas.user import UserRead
-from app.core.database import SessionLocal
-from app.core.security import decode_access_token
+from app.schemas.user import UserRead, UserUpdate, UserDirectoryEntry
+from app.core.database import get_db
+from app.core.config import settings
+from app.core.deps import get_current_user, get_current_user_id, get_read_db, invalidate_user, load_user, directory_cache
+from app.core.http_cache import conditional
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.avatars import store_avatar, avatar_url, InvalidImage
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+DIRECTORY_FIELDS = ("id", "name", "email", "role", "avatar", "created_at")
+MAX_PAGE_SIZE = 500
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-    user_id: str = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
-    return user
+def like_prefix(value: str) -> str:
+    # Escape LIKE wildcards so the search stays a plain, index-friendly prefix match
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_") + "%"
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return DIRECTORY_FIELDS
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(DIRECTORY_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # id is always returned, it is the paging key
+    return tuple(f for f in DIRECTORY_FIELDS if f == "id" or f in requested)
+
+@router.get("/", response_model=List[UserDirectoryEntry], response_model_exclude_unset=True)
+async def list_users(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, min_length=1, max_length=100),
+    role: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """List the user directory in id order.
 
-@router.get("/", response_model=List[UserRead])
-async def list_users():
-    db = SessionLocal()
-    users = db.query(User).all()
-    db.close()
-    return users
+    ``q`` matches a prefix of the name or email, ``role`` filters by role and
+    ``fields`` (comma separated) selects the columns returned. Without
+    ``limit`` every matching user is returned, as before paging existed; with
+    it, pass the ``X-Next-Cursor`` header back as ``cursor`` for the next page.
+    """
+    # Users are never deleted, so the newest id and latest edit version the whole directory
+    version = tuple((await db.execute(select(func.max(User.id), func.max(User.updated_at)))).one())
+    not_modified = conditional(request, response, *version, last_modified=version[1])
+    if not_modified:
+        return not_modified
+    columns = parse_fields(fields)
+    key = (version, q, role, columns, cursor, limit)
+    page = directory_cache.get(key)
+    if page is None:
+        stmt = select(*(getattr(User, c) for c in columns))
+        if q:
+            pattern = like_prefix(q)
+            stmt = stmt.filter(or_(User.name.like(pattern, escape="/"), User.email.like(pattern, escape="/")))
+        if role:
+            stmt = stmt.filter(User.role == role)
+        if cursor:
+            stmt = stmt.filter(User.id > decode_cursor(cursor, int)[0])
+        stmt = stmt.order_by(User.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        rows = (await db.execute(stmt)).all()
+        entries = []
+        for row in rows:
+            values = dict(row._mapping)
+            if "avatar" in values:
+                values["avatar_urls"] = None
+            entries.append(UserDirectoryEntry(**values))
+        next_cursor = encode_cursor(rows[-1].id) if limit and len(rows) == limit else None
+        page = (entries, next_cursor)
+        directory_cache.set(key, page)
+    entries, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return entries
 
 @router.get("/me", response_model=UserRead)
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+@router.patch("/me", response_model=UserRead)
+async def update_users_me(user_in: UserUpdate, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    for field, value in user_in.model_dump(exclude_unset=True).items():
+        setattr(user, field, value)
+    await db.commit()
+    invalidate_user(user_id)
+    return user
+
+@router.post("/me/avatar", response_model=UserRead)
+async def upload_avatar(file: UploadFile = File(...), user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    data = await file.read(settings.AVATAR_MAX_UPLOAD_BYTES + 1)
+    if len(data) > settings.AVATAR_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Avatar image is too large")
+    try:
+        key = await store_avatar(data)
+    except InvalidImage:
+        raise HTTPException(status_code=400, detail="Avatar must be an image")
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.avatar = key
+    await db.commit()
+    invalidate_user(user_id)
+    return user
+
+@router.get("/{user_id}/avatar")
+async def get_user_avatar(user_id: int, size: Optional[int] = Query(None, ge=1), db: AsyncSession = Depends(get_read_db)):
+    """Redirect to the smallest stored variant at least ``size`` px wide."""
+    user = await load_user(db, user_id)
+    if not user or not user.avatar:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    return RedirectResponse(avatar_url(user.avatar, size))
+
 @router.get("/{user_id}", response_model=UserRead)
-async def get_user(user_id: int):
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
-    db.close()
+async def get_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user 
\ No newline at end of file
@@ -1,16 +1,21 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from typing import Dict, List
 from app.core.security import decode_access_token
-from app.core.database import SessionLocal
-from app.models.user import User
-from app.models.ticket import Ticket
-from app.models.message import Message
-from sqlalchemy.orm import Session
-import json
+from app.core.database import AsyncSessionLocal
+from app.core.deps import load_user, load_ticket
+from app.core.message_writer import message_writer, PendingMessage
+from app.core.backplane import backplane
+from app.core import protocol
+from app.core.protocol import Broadcast, make_frame
+from app.core.connections import Connection, registry
+from app.core.metrics import metrics_registry, RateMeter
+from app.core.log import get_logger
+from app.core.replay import replay_buffer, replay_and_join, next_room_seq
+from typing import Optional
+import asyncio
+import time
 
 router = APIRouter()
-
-active_connections: Dict[int, List[WebSocket]] = {}
+log = get_logger(__name__)
 
 # In-memory call state
 user_call_state = {}  # user_id: {'state': 'idle'|'ringing'|'in_call', 'peer': int}
@@ -18,125 +23,203 @@ ticket_call_state = {}  # ticket_id: {'state': 'idle'|'ringing'|'in_call', 'user
 
 signal_connections = {}  # user_id: websocket
 
+ws_connects = metrics_registry.counter("ws_connections_total", "WebSocket connections accepted", ("endpoint",))
+ws_disconnects = metrics_registry.counter("ws_disconnections_total", "WebSocket connections closed", ("endpoint",))
+chat_messages = metrics_registry.counter("chat_messages_total", "Chat messages received", ("kind",))
+fanout_duration = metrics_registry.histogram(
+    "ws_fanout_duration_seconds", "Time to queue one broadcast for this worker's sockets", ("channel",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1),
+)
+message_rate = RateMeter()
+
+# Keeps references to fire-and-forget ack tasks so they are not garbage collected
+background_tasks = set()
+
 def get_user_id_from_token(token: str) -> int:
     payload = decode_access_token(token)
     if not payload or "sub" not in payload:
         return None
     return int(payload["sub"])
 
-async def connect_user(user_id: int, websocket: WebSocket):
-    if user_id not in active_connections:
-        active_connections[user_id] = []
-    active_connections[user_id].append(websocket)
-
-async def disconnect_user(user_id: int, websocket: WebSocket):
-    if user_id in active_connections:
-        active_connections[user_id].remove(websocket)
-        if not active_connections[user_id]:
-            del active_connections[user_id]
-
-async def send_notification_to_user(user_id: int, payload: str):
-    if user_id in active_connections:
-        for ws in active_connections[user_id]:
-            try:
-                await ws.send_text(payload)
-            except Exception:
-                pass
+async def send_durable_ack(connection: Connection, pending: PendingMessage):
+    if await pending.durable:
+        connection.send_frame(make_frame("ack", seq=pending.seq))
+
+def ack_when_durable(connection: Connection, pending: PendingMessage):
+    task = asyncio.create_task(send_durable_ack(connection, pending))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def wants_ack(connection: Connection, ack: bool) -> bool:
+    # Structured clients always get acks; legacy clients opt in with ?ack=true
+    return ack or connection.encoding != protocol.LEGACY
+
+async def lookup_sender_and_ticket(user_id: int, ticket_id: int):
+    # A pooled connection is borrowed only on a cache miss, and only for this call
+    async with AsyncSessionLocal() as db:
+        return await load_user(db, user_id), await load_ticket(db, ticket_id)
+
+def relay_frame(frame: dict, **fields) -> dict:
+    relayed = {key: frame[key] for key in protocol.RELAY_FIELDS.get(frame["type"], ()) if key in frame}
+    return make_frame(frame["type"], **fields, **relayed)
+
+def send_to_local(connections, broadcast: Broadcast):
+    # Enqueue only; each connection's writer task does the actual network send.
+    # Each encoding is produced once per broadcast and shared by all sockets using it.
+    for connection in connections:
+        connection.send(broadcast.encoded(connection.encoding))
+
+async def deliver(channel: str, payload: str):
+    """Backplane handler: push a payload to the sockets held by this worker."""
+    kind, _, key = channel.partition(":")
+    if kind in ("ticket", "user"):
+        start = time.perf_counter()
+        broadcast = Broadcast(payload)
+        if kind == "ticket":
+            connections = registry.room_connections(channel)
+            if broadcast.frame.get("type") == "message" and broadcast.frame.get("seq") is not None:
+                replay_buffer.record(channel, broadcast.frame["seq"], broadcast)
+        else:
+            connections = registry.user_connections(int(key))
+        send_to_local(connections, broadcast)
+        fanout_duration.labels(kind).observe(time.perf_counter() - start)
+    elif kind == "signal":
+        # Signaling payloads are relayed verbatim
+        peer_ws = signal_connections.get(int(key))
+        if peer_ws:
+            await peer_ws.send_text(payload)
+
+async def publish_frame(channel: str, frame: dict):
+    await backplane.publish(channel, Broadcast.from_frame(frame).payload)
+
+async def send_notification_to_user(user_id: int, frame: dict):
+    await publish_frame(f"user:{user_id}", frame)
 
 @router.websocket("/ws/chat/{other_user_id}")
-async def websocket_user_chat(websocket: WebSocket, other_user_id: int, token: str = Query(...)):
+async def websocket_user_chat(websocket: WebSocket, other_user_id: int, token: str = Query(...), ack: bool = Query(False)):
     user_id = get_user_id_from_token(token)
     if not user_id:
         await websocket.close(code=1008)
         return
-    await websocket.accept()
-    await connect_user(user_id, websocket)
-    db: Session = SessionLocal()
+    await protocol.accept(websocket)
+    ws_connects.labels("chat").inc()
+    connection = Connection(websocket, user_id)
+    registry.add_user(connection)
     try:
         while True:
-            data = await websocket.receive_text()
-            try:
-                msg = json.loads(data)
-            except Exception:
-                msg = None
-            if msg is not None:
+            frame = await protocol.receive_frame(websocket)
+            if frame is None:
+                continue
+            # The peer may be connected to another worker, so always go through the backplane
+            if frame["type"] != "message":
+                await publish_frame(f"user:{other_user_id}", relay_frame(frame, sender_id=user_id, receiver_id=other_user_id))
                 continue
-            db_message = Message(
+            content = frame.get("content")
+            if not isinstance(content, str) or not content:
+                continue
+            # Persisted by the write-behind queue; broadcast does not wait for the INSERT
+            pending = message_writer.submit(user_id, content, receiver_id=other_user_id)
+            chat_messages.labels("direct").inc()
+            message_rate.mark()
+            if wants_ack(connection, ack):
+                ack_when_durable(connection, pending)
+            await publish_frame(f"user:{other_user_id}", make_frame(
+                "message",
+                seq=pending.seq,
                 sender_id=user_id,
                 receiver_id=other_user_id,
-                content=data
-            )
-            db.add(db_message)
-            db.commit()
-            db.refresh(db_message)
-            if other_user_id in active_connections:
-                for ws in active_connections[other_user_id]:
-                    await ws.send_text(f"{user_id}: {data}")
+                content=content,
+                timestamp=pending.timestamp.isoformat(),
+            ))
     except WebSocketDisconnect:
-        await disconnect_user(user_id, websocket)
+        pass
     finally:
-        db.close()
+        registry.remove_user(connection)
+        await connection.close()
+        ws_disconnects.labels("chat").inc()
 
 @router.websocket("/ws/ticket/{ticket_id}")
-async def websocket_ticket_chat(websocket: WebSocket, ticket_id: int, token: str = Query(...)):
-    print(f"WebSocket connection attempt for ticket {ticket_id} with token: {token[:20]}...")
+async def websocket_ticket_chat(
+    websocket: WebSocket,
+    ticket_id: int,
+    token: str = Query(...),
+    ack: bool = Query(False),
+    last_seq: Optional[int] = Query(None, ge=0),
+):
     user_id = get_user_id_from_token(token)
     if not user_id:
-        print(f"Invalid token for ticket {ticket_id}")
+        log.warning("ws.auth_failed", ticket_id=ticket_id)
         await websocket.close(code=1008)
         return
-    print(f"User {user_id} connecting to ticket {ticket_id}")
-    await websocket.accept()
-    group = f"ticket_{ticket_id}"
-    if group not in active_connections:
-        active_connections[group] = []
-    active_connections[group].append(websocket)
-    print(f"User {user_id} connected to ticket {ticket_id}. Total connections: {len(active_connections[group])}")
-    # --- Robust ticket call state ---
-    if ticket_id not in ticket_call_state:
-        ticket_call_state[ticket_id] = {'state': 'idle', 'users': set()}
-    ticket_call_state[ticket_id]['users'].add(user_id)
-    db: Session = SessionLocal()
+    # Also warms the per-process caches so the message loop normally skips both SELECTs
+    sender, ticket = await lookup_sender_and_ticket(user_id, ticket_id)
+    if sender is None or ticket is None or user_id not in (ticket.creator_id, ticket.assignee_id):
+        log.warning("ws.ticket_forbidden", user_id=user_id, ticket_id=ticket_id)
+        await websocket.close(code=1008)
+        return
+    await protocol.accept(websocket)
+    ws_connects.labels("ticket").inc()
+    connection = Connection(websocket, user_id)
+    room = f"ticket:{ticket_id}"
+    # From here on the finally releases the connection, even if the replay fails
     try:
+        if last_seq is None:
+            registry.join(room, connection)
+        else:
+            # Reconnect: send what was broadcast since the client's last message first
+            await replay_and_join(connection, ticket_id, last_seq)
+        log.info("ws.connected", user_id=user_id, ticket_id=ticket_id, room_size=len(registry.room_connections(room)))
+        # --- Robust ticket call state ---
+        if ticket_id not in ticket_call_state:
+            ticket_call_state[ticket_id] = {'state': 'idle', 'users': set()}
+        ticket_call_state[ticket_id]['users'].add(user_id)
         while True:
-            data = await websocket.receive_text()
-            print(f"Received message from user {user_id} in ticket {ticket_id}: {data[:50]}...")
-            try:
-                msg = json.loads(data)
-            except Exception:
-                msg = None
-            if msg is not None:
+            frame = await protocol.receive_frame(websocket)
+            if frame is None:
                 continue
-            # Save message to DB
-            db_message = Message(
-                sender_id=user_id,
+            log.debug("ws.frame", user_id=user_id, ticket_id=ticket_id, type=frame["type"])
+            if frame["type"] == "call":
+                # Keep the shared call state in step with the events relayed to the group
+                call_state = {"ring": "ringing", "accept": "in_call", "end": "idle"}.get(frame.get("event"))
+                if call_state and ticket_id in ticket_call_state:
+                    ticket_call_state[ticket_id]['state'] = call_state
+            if frame["type"] != "message":
+                await publish_frame(room, relay_frame(frame, ticket_id=ticket_id, sender_id=user_id))
+                continue
+            data = frame.get("content")
+            if not isinstance(data, str) or not data:
+                continue
+            # Queue message for a batched INSERT and broadcast straight away
+            pending = message_writer.submit(user_id, data, ticket_id=ticket_id, seq=await next_room_seq(ticket_id))
+            chat_messages.labels("ticket").inc()
+            message_rate.mark()
+            if wants_ack(connection, ack):
+                ack_when_durable(connection, pending)
+            # Cache hits unless the user was renamed or the ticket reassigned since
+            sender, ticket = await lookup_sender_and_ticket(user_id, ticket_id)
+            message_to_send = make_frame(
+                "message",
+                seq=pending.seq,
                 ticket_id=ticket_id,
-                content=data
+                sender_id=user_id,
+                sender_name=sender.name if sender else '',
+                content=data,
+                timestamp=pending.timestamp.isoformat(),
             )
-            db.add(db_message)
-            db.commit()
-            db.refresh(db_message)
-            sender = db.query(User).filter(User.id == user_id).first()
-            ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-            timestamp = db_message.timestamp.strftime('%I:%M %p') if hasattr(db_message, 'timestamp') and db_message.timestamp else ""
-            message_to_send = f"{user_id}:{data}|{timestamp}|{sender.name if sender else ''}"
-            print(f"Broadcasting message to {len(active_connections[group])} connections: {message_to_send}")
-            for ws in list(active_connections[group]):
-                try:
-                    await ws.send_text(message_to_send)
-                except Exception as e:
-                    print(f"Error sending message to WebSocket: {e}")
+            log.debug("ws.broadcast", ticket_id=ticket_id, seq=pending.seq, local_recipients=len(registry.room_connections(room)))
+            await publish_frame(room, message_to_send)
             if ticket:
                 for notify_id in set([ticket.creator_id, ticket.assignee_id]):
                     if notify_id and notify_id != user_id:
-                        if notify_id not in active_connections.get(group, []):
-                            payload = f"NOTIFY:ticket:{ticket_id}:{ticket.title}:{data[:30]}"
-                            await send_notification_to_user(notify_id, payload)
+                        # Only notify participants who are not already watching this ticket
+                        if not registry.is_present(room, notify_id):
+                            await send_notification_to_user(notify_id, make_frame(
+                                "notify", ticket_id=ticket_id, title=ticket.title, preview=data[:30]
+                            ))
     except WebSocketDisconnect:
-        print(f"User {user_id} disconnected from ticket {ticket_id}")
-        active_connections[group].remove(websocket)
-        if not active_connections[group]:
-            del active_connections[group]
+        log.info("ws.disconnected", user_id=user_id, ticket_id=ticket_id)
+    finally:
+        registry.leave(room, connection)
         # Remove user from ticket call state
         if ticket_id in ticket_call_state:
             ticket_call_state[ticket_id]['users'].discard(user_id)
@@ -144,8 +227,8 @@ async def websocket_ticket_chat(websocket: WebSocket, ticket_id: int, token: str
                 del ticket_call_state[ticket_id]
             else:
                 ticket_call_state[ticket_id]['state'] = 'idle'
-    finally:
-        db.close()
+        await connection.close()
+        ws_disconnects.labels("ticket").inc()
 
 @router.websocket("/ws/signal/{peer_id}")
 async def websocket_signal(websocket: WebSocket, peer_id: int, token: str = Query(...)):
@@ -154,14 +237,15 @@ async def websocket_signal(websocket: WebSocket, peer_id: int, token: str = Quer
         await websocket.close(code=1008)
         return
     await websocket.accept()
+    ws_connects.labels("signal").inc()
     signal_connections[user_id] = websocket
     try:
         while True:
             data = await websocket.receive_text()
-            # Relay to peer if connected
-            peer_ws = signal_connections.get(peer_id)
-            if peer_ws:
-                await peer_ws.send_text(data)
+            # Relay to peer on whichever worker holds its signaling socket
+            await backplane.publish(f"signal:{peer_id}", data)
     except WebSocketDisconnect:
         if user_id in signal_connections:
-            del signal_connections[user_id] 
\ No newline at end of file
+            del signal_connections[user_id]
+    finally:
+        ws_disconnects.labels("signal").inc() 
\ No newline at end of file
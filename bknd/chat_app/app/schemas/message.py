@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 class MessageBase(BaseModel):
@@ -15,6 +15,21 @@ class MessageRead(MessageBase):
     sender_id: int
     timestamp: datetime
     read: bool
+    seq: Optional[int] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class MessageSearchHit(MessageRead):
+    score: float
+
+class MarkRead(BaseModel):
+    """Mark everything up to ``up_to_id`` read in one ticket or one direct conversation."""
+    up_to_id: int
+    ticket_id: Optional[int] = None
+    user_id: Optional[int] = None
+
+class UnreadSummary(BaseModel):
+    total: int
+    tickets: Dict[int, int]
+    users: Dict[int, int]
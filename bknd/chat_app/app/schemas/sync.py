@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from app.schemas.message import MessageRead, UnreadSummary
+from app.schemas.ticket import TicketRead
+
+class SyncResponse(BaseModel):
+    token: str
+    # More changes are waiting; sync again straight away with the new token
+    has_more: bool = False
+    tickets: List[TicketRead] = []
+    # Tickets the user no longer participates in
+    removed_tickets: List[int] = []
+    messages: List[MessageRead] = []
+    # Conversations ("ticket:<id>", "user:<id>") with more new messages than returned; page their history
+    truncated: List[str] = []
+    unread: Optional[UnreadSummary] = None
@@ -1,6 +1,14 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, model_validator
+from typing import Dict, Optional
 from datetime import datetime
+from app.core.avatars import is_avatar_key, avatar_url, avatar_urls
+
+def resolve_avatar_key(user):
+    # Processed uploads are stored as a content key; expose the variant URLs instead
+    if is_avatar_key(user.avatar):
+        user.avatar_urls = avatar_urls(user.avatar)
+        user.avatar = avatar_url(user.avatar)
+    return user
 
 class UserBase(BaseModel):
     name: str
@@ -11,9 +19,35 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class UserUpdate(BaseModel):
+    name: Optional[str] = None
+    avatar: Optional[str] = None
+
 class UserRead(UserBase):
     id: int
     created_at: Optional[datetime] = None
+    avatar_urls: Optional[Dict[int, str]] = None
+
+    @model_validator(mode="after")
+    def resolve_avatar(self):
+        return resolve_avatar_key(self)
+
+    class Config:
+        from_attributes = True
+
+class UserDirectoryEntry(BaseModel):
+    """A directory row; only the columns asked for with ``fields`` are set."""
+    id: int
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    role: Optional[str] = None
+    avatar: Optional[str] = None
+    created_at: Optional[datetime] = None
+    avatar_urls: Optional[Dict[int, str]] = None
+
+    @model_validator(mode="after")
+    def resolve_avatar(self):
+        return resolve_avatar_key(self)
 
     class Config:
         from_attributes = True
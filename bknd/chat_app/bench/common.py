@@ -0,0 +1,67 @@
+"""Shared setup for the benchmarks in this package.
+
+Run them from ``bknd/chat_app`` as modules, e.g. ``python -m bench.ws_fanout``.
+Every run gets an empty schema in a scratch SQLite file, created before
+anything under ``app`` is imported, and run from that scratch directory; the
+configured database and uploads are never touched.
+Numbers are for comparing the variants within one run, not absolute targets.
+"""
+import os
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="chat_app_bench_"), "bench.db")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["SQLALCHEMY_ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+os.environ.pop("BACKPLANE_URL", None)
+os.environ.pop("SQLALCHEMY_ASYNC_REPLICA_URLS", None)
+# app.main mounts these relative to the working directory, so run from the scratch dir
+os.chdir(os.path.dirname(DB_PATH))
+os.makedirs("uploads", exist_ok=True)
+os.makedirs(os.path.join("app", "static"), exist_ok=True)
+
+from typing import Dict, List, Sequence
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+from app.core.database import Base
+from app.models.user import User
+from app.models.ticket import Ticket
+from app.models import message, change_log  # noqa: F401  (register the tables)
+
+def create_schema() -> Engine:
+    engine = create_engine(os.environ["SQLALCHEMY_DATABASE_URL"])
+    Base.metadata.create_all(engine)
+    return engine
+
+def add_users(engine: Engine, count: int) -> List[int]:
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"user{i}", "email": f"user{i}@example.com", "role": "user", "password_hash": "x"}
+            for i in range(count)
+        ])
+    return list(range(1, count + 1))
+
+def add_ticket(engine: Engine, creator_id: int, assignee_id: int = None) -> int:
+    with engine.begin() as conn:
+        return conn.execute(insert(Ticket).values(title="bench", creator_id=creator_id, assignee_id=assignee_id)).inserted_primary_key[0]
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, str]:
+    """p50 / p99 / max of a latency sample, in milliseconds."""
+    return {
+        "samples": str(len(seconds)),
+        "p50 ms": f"{percentile(seconds, 50) * 1000:.2f}",
+        "p99 ms": f"{percentile(seconds, 99) * 1000:.2f}",
+        "max ms": f"{max(seconds) * 1000:.2f}" if seconds else "nan",
+    }
+
+def print_table(rows: List[Dict[str, str]]):
+    columns = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(w) for c, w in zip(columns, widths)))
@@ -0,0 +1,78 @@
+"""Latency of other endpoints during a login flood: shared threadpool vs the bounded bcrypt pool.
+
+``--flooders`` clients log in back to back while a probe calls ``GET /``, a
+plain sync endpoint that, like every sync endpoint, runs on FastAPI's shared
+threadpool. ``threadpool`` runs bcrypt the way the old sync login did: on that
+same threadpool, unbounded, so the probe queues behind password checks.
+``bounded`` is the current path: a pool of ``PASSWORD_HASH_WORKERS`` threads
+that answers 503 once ``PASSWORD_HASH_QUEUE_DEPTH`` logins are waiting.
+
+    python -m bench.login_flood --flooders 64 --seconds 5
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from bench.common import create_schema, latency_summary, print_table
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_password
+from app.main import app
+from app.models.user import User
+from app.routers import auth
+
+async def threadpool_verify(plain_password, hashed_password):
+    return await run_in_threadpool(verify_password, plain_password, hashed_password)
+
+async def run(mode: str, flooders: int, seconds: float):
+    statuses = {}
+    probe_latencies = []
+    deadline = time.perf_counter() + seconds
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def flood():
+            while time.perf_counter() < deadline:
+                response = await client.post("/api/auth/login", json={"email": "bench@example.com", "password": "secret"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 503:
+                    await asyncio.sleep(float(response.headers["retry-after"]))
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(probe(), *(flood() for _ in range(flooders)))
+    return {
+        "bcrypt on": mode,
+        **{f"GET / {k}": v for k, v in latency_summary(probe_latencies).items()},
+        "logins ok": str(statuses.get(200, 0)),
+        "503s": str(statuses.get(503, 0)),
+    }
+
+async def main(args):
+    engine = create_schema()
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(name="bench", email="bench@example.com", role="user",
+                                         password_hash=get_password_hash("secret")))
+    rows = []
+    async with app.router.lifespan_context(app):
+        bounded_verify = auth.verify_password_async
+        auth.verify_password_async = threadpool_verify
+        try:
+            rows.append(await run("threadpool", args.flooders, args.seconds))
+        finally:
+            auth.verify_password_async = bounded_verify
+        rows.append(await run("bounded", args.flooders, args.seconds))
+    print(f"{args.flooders} flooders, {args.seconds}s per run, bcrypt cost {settings.BCRYPT_ROUNDS}, "
+          f"{settings.PASSWORD_HASH_WORKERS} hash workers, queue depth {settings.PASSWORD_HASH_QUEUE_DEPTH}")
+    print_table(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flooders", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
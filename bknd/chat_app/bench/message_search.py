@@ -0,0 +1,102 @@
+"""Search latency over a large message corpus: FTS5 index vs a substring scan.
+
+Loads ``--messages`` synthetic messages (Zipf-distributed words, spread over
+tickets and direct conversations), letting the FTS5 triggers index them as
+they are inserted, then times ``GET /api/messages/search`` for common, rare
+and multi-word queries, across everything the caller can see and scoped to
+one ticket. ``scan`` runs the same requests through the ``ILIKE`` fallback
+other dialects use.
+
+    python -m bench.message_search --messages 1000000
+"""
+import argparse
+import asyncio
+import random
+import time
+from itertools import accumulate
+import httpx
+from sqlalchemy import insert
+from bench.common import create_schema, add_users, latency_summary, print_table
+from app.core.search import search_messages
+from app.core.security import create_access_token
+from app.main import app
+from app.models.message import Message
+from app.models.ticket import Ticket
+from app.routers import message as message_router
+
+VOCABULARY = [f"word{rank}" for rank in range(1, 5001)]
+CUM_WEIGHTS = list(accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+QUERIES = {
+    "common": "word3",
+    "rare": "word1000",
+    "two words": "word20 word300",
+}
+
+def load_corpus(engine, messages: int, users, tickets: int, chunk: int = 20000):
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(Ticket), [
+            {"title": f"ticket {i}", "creator_id": users[i % len(users)], "assignee_id": users[(i + 1) % len(users)]}
+            for i in range(tickets)
+        ])
+    for offset in range(0, messages, chunk):
+        rows = []
+        for _ in range(min(chunk, messages - offset)):
+            sender = rng.choice(users)
+            direct = rng.random() < 0.2
+            rows.append({
+                "sender_id": sender,
+                "receiver_id": rng.choice(users) if direct else None,
+                "ticket_id": None if direct else rng.randint(1, tickets),
+                "content": " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=rng.randint(4, 20))),
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(Message), rows)
+
+def scan_search(stmt, dialect: str, q: str):
+    # Any dialect without an index takes the ILIKE branch
+    return search_messages(stmt, "scan", q)
+
+async def run(mode: str, client: httpx.AsyncClient, headers: dict, ticket_id: int, repeats: int):
+    rows = []
+    for scope, extra in (("visible", {}), ("one ticket", {"ticket_id": ticket_id})):
+        for label, q in QUERIES.items():
+            latencies = []
+            hits = 0
+            for _ in range(repeats):
+                start = time.perf_counter()
+                response = await client.get("/api/messages/search", params={"q": q, "limit": 20, **extra}, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+                hits = len(response.json())
+            rows.append({"index": mode, "scope": scope, "query": label, "hits": str(hits), **latency_summary(latencies)})
+    return rows
+
+async def main(args):
+    engine = create_schema()
+    users = add_users(engine, args.users)
+    start = time.perf_counter()
+    load_corpus(engine, args.messages, users, args.tickets)
+    loaded = time.perf_counter() - start
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(users[0])})}"}
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        rows += await run("fts5", client, headers, 1, args.repeats)
+        message_router.search_messages = scan_search
+        try:
+            rows += await run("scan", client, headers, 1, max(1, args.repeats // 10))
+        finally:
+            message_router.search_messages = search_messages
+    print(f"{args.messages} messages from {args.users} users in {args.tickets} tickets, "
+          f"loaded and indexed in {loaded:.1f}s ({args.messages / loaded:.0f} rows/s)")
+    print_table(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""Chat messages persisted per second by one worker: per-message commits vs the write-behind queue.
+
+``per-message`` is what the socket handlers used to do: one INSERT and
+COMMIT for every frame. ``write-behind`` submits every message to a
+``MessageWriter`` and waits until all of them are durable, so the rows go
+out as multi-row INSERTs of up to ``--batch-size``. Both variants also
+maintain the ticket counters and change log, like the real paths.
+
+    python -m bench.message_writer --messages 2000 --senders 20
+"""
+import argparse
+import asyncio
+import time
+from bench.common import create_schema, add_users, add_ticket, print_table
+from app.core.database import AsyncSessionLocal, async_engine
+from app.core.message_writer import MessageWriter
+from app.core.sync import record_message_changes
+from app.core.ticket_stats import record_messages
+from app.models.message import Message
+
+async def per_message(senders, ticket_id: int, messages: int):
+    # SQLite takes one writer at a time and fails concurrent write upgrades
+    # with "database is locked", so the senders take turns at the database
+    turn = asyncio.Lock()
+
+    async def send(sender_id: int, count: int):
+        for i in range(count):
+            async with turn, AsyncSessionLocal() as db:
+                message = Message(sender_id=sender_id, ticket_id=ticket_id, content=f"message {i}")
+                db.add(message)
+                await db.flush()
+                rows = [{"ticket_id": ticket_id, "sender_id": sender_id, "receiver_id": None, "timestamp": message.timestamp}]
+                await record_messages(db, rows)
+                await record_message_changes(db, rows)
+                await db.commit()
+    await asyncio.gather(*(send(s, messages // len(senders)) for s in senders))
+
+async def write_behind(senders, ticket_id: int, messages: int, batch_size: int, flush_ms: int):
+    writer = MessageWriter(batch_size=batch_size, flush_interval=flush_ms / 1000)
+    await writer.start()
+    pending = []
+
+    async def send(sender_id: int, count: int):
+        for i in range(count):
+            pending.append(writer.submit(sender_id, f"message {i}", ticket_id=ticket_id, seq=len(pending) + 1))
+            # A socket handler yields to the loop between frames
+            await asyncio.sleep(0)
+    await asyncio.gather(*(send(s, messages // len(senders)) for s in senders))
+    assert all(await asyncio.gather(*(p.durable for p in pending)))
+    await writer.stop()
+
+async def main(args):
+    engine = create_schema()
+    senders = add_users(engine, args.senders)
+    ticket_id = add_ticket(engine, senders[0], senders[1] if len(senders) > 1 else None)
+    total = args.messages // args.senders * args.senders
+    rows = []
+    for name, run in (
+        ("per-message", lambda: per_message(senders, ticket_id, total)),
+        ("write-behind", lambda: write_behind(senders, ticket_id, total, args.batch_size, args.flush_ms)),
+    ):
+        start = time.perf_counter()
+        await run()
+        elapsed = time.perf_counter() - start
+        rows.append({"pipeline": name, "messages": str(total), "seconds": f"{elapsed:.2f}", "messages/s": f"{total / elapsed:.0f}"})
+    await async_engine.dispose()
+    print(f"{args.senders} concurrent senders, batch size {args.batch_size}, flush {args.flush_ms} ms")
+    print_table(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--flush-ms", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
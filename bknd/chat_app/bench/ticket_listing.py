@@ -0,0 +1,93 @@
+"""Ticket listing cost for an agent with a large backlog: full list vs filtered, sorted pages.
+
+Gives one agent ``--tickets`` tickets (mostly assigned to them, some created
+by them, a few both) among as many tickets of other users, then times
+``GET /api/tickets/`` unpaged, which is all a client could do before paging
+and filters existed, against ``--page-size`` pages by date, by status, by
+priority and deep in the listing via the cursor, plus ``/counts`` and a 304
+revalidation.
+
+    python -m bench.ticket_listing --tickets 50000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+import httpx
+from sqlalchemy import insert
+from bench.common import create_schema, add_users, latency_summary, print_table
+from app.core.security import create_access_token
+from app.main import app
+from app.models.ticket import Ticket, TicketPriority, TicketStatus
+
+def load_tickets(engine, agent: int, others, tickets: int):
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(tickets * 2):
+        other = rng.choice(others)
+        if i % 2:
+            # Somebody else's ticket
+            creator, assignee = other, rng.choice(others)
+        else:
+            roll = rng.random()
+            creator, assignee = (agent, other) if roll < 0.2 else (agent, agent) if roll < 0.25 else (other, agent)
+        created_at = start + timedelta(seconds=i * 30)
+        rows.append({
+            "title": f"ticket {i}", "description": "", "creator_id": creator, "assignee_id": assignee,
+            "status": rng.choice(list(TicketStatus)), "priority": rng.choice(list(TicketPriority)),
+            "created_at": created_at, "updated_at": created_at,
+        })
+    with engine.begin() as conn:
+        for offset in range(0, len(rows), 10000):
+            conn.execute(insert(Ticket), rows[offset:offset + 10000])
+
+async def timed(client, path: str, repeats: int, **kwargs):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = await client.get(path, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code in (200, 304), response.text
+    return latencies, response
+
+async def main(args):
+    engine = create_schema()
+    agent, *others = add_users(engine, 201)
+    load_tickets(engine, agent, others, args.tickets)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(agent)})}"}
+    page = {"limit": args.page_size}
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies, full = await timed(client, "/api/tickets/", max(1, args.repeats // 10), headers=headers)
+        rows.append({"request": "full list (before)", "rows": str(len(full.json())), **latency_summary(latencies)})
+        etag = full.headers["etag"]
+        # A cursor some way into the listing, to show deep pages cost the same
+        cursor = None
+        for _ in range(20):
+            params = {**page, **({"cursor": cursor} if cursor else {})}
+            cursor = (await client.get("/api/tickets/", params=params, headers=headers)).headers["x-next-cursor"]
+        for label, params in (
+            ("page, newest first", page),
+            ("page, 20 pages deep", {**page, "cursor": cursor}),
+            ("page, status=OPEN", {**page, "status": "OPEN"}),
+            ("page, -priority", {**page, "sort": "-priority"}),
+            ("page, CRITICAL, oldest first", {**page, "priority": "CRITICAL", "sort": "created_at"}),
+        ):
+            latencies, response = await timed(client, "/api/tickets/", args.repeats, params=params, headers=headers)
+            rows.append({"request": label, "rows": str(len(response.json())), **latency_summary(latencies)})
+        latencies, response = await timed(client, "/api/tickets/counts", args.repeats, headers=headers)
+        rows.append({"request": "counts", "rows": str(sum(response.json().values())), **latency_summary(latencies)})
+        latencies, _ = await timed(client, "/api/tickets/", args.repeats, headers={**headers, "If-None-Match": etag})
+        rows.append({"request": "304 revalidation", "rows": "0", **latency_summary(latencies)})
+    print(f"agent with {len(full.json())} tickets among {args.tickets * 2}, page size {args.page_size}")
+    print_table(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
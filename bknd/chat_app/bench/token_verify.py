@@ -0,0 +1,40 @@
+"""Bearer token verification cost: full JWT decode (cold) vs the digest-keyed claims cache (warm).
+
+``cold`` clears ``token_cache`` before every call, so each one pays for the
+HMAC check and claims parsing in ``jwt.decode``; ``warm`` verifies the same
+``--tokens`` tokens again once they are cached, which is what every request
+after a user's first one does.
+
+    python -m bench.token_verify --tokens 1000 --rounds 20
+"""
+import argparse
+import time
+from bench.common import print_table
+from app.core.security import create_access_token, decode_access_token, token_cache
+
+def run(mode: str, tokens, rounds: int):
+    calls = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            if mode == "cold":
+                token_cache.clear()
+            decode_access_token(token)
+            calls += 1
+    elapsed = time.perf_counter() - start
+    return {"cache": mode, "verifications": str(calls), "us/verify": f"{elapsed / calls * 1e6:.2f}", "verifies/s": f"{calls / elapsed:.0f}"}
+
+def main(args):
+    tokens = [create_access_token({"sub": str(i)}) for i in range(args.tokens)]
+    rows = [run("cold", tokens, args.rounds)]
+    for token in tokens:
+        decode_access_token(token)
+    rows.append(run("warm", tokens, args.rounds))
+    print(f"{args.tokens} distinct tokens, {args.rounds} rounds")
+    print_table(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""Fan-out latency while chat messages are being written: sync vs async sessions.
+
+Stands in for a worker holding ``--receivers`` sockets: a broadcaster puts a
+timestamp on every receiver's queue each millisecond while ``--writers`` tasks
+INSERT and COMMIT messages in a loop. With the synchronous ``SessionLocal``
+every commit blocks the event loop, so delivery waits for it; with
+``AsyncSessionLocal`` the loop keeps delivering while the driver works.
+
+    python -m bench.ws_fanout --receivers 200 --seconds 3
+"""
+import argparse
+import asyncio
+import time
+from bench.common import create_schema, add_users, add_ticket, latency_summary, print_table
+from app.core.database import SessionLocal, AsyncSessionLocal, async_engine
+from app.models.message import Message
+
+async def run(mode: str, receivers: int, writers: int, seconds: float, sender_id: int, ticket_id: int):
+    queues = [asyncio.Queue() for _ in range(receivers)]
+    latencies = []
+    written = 0
+
+    async def receive(queue: asyncio.Queue):
+        while True:
+            sent = await queue.get()
+            latencies.append(time.perf_counter() - sent)
+
+    async def broadcast():
+        while True:
+            now = time.perf_counter()
+            for queue in queues:
+                queue.put_nowait(now)
+            await asyncio.sleep(0.001)
+
+    async def write_sync():
+        nonlocal written
+        while True:
+            with SessionLocal() as db:
+                db.add(Message(sender_id=sender_id, ticket_id=ticket_id, content="benchmark message"))
+                db.commit()
+            written += 1
+            await asyncio.sleep(0)
+
+    async def write_async():
+        nonlocal written
+        while True:
+            async with AsyncSessionLocal() as db:
+                db.add(Message(sender_id=sender_id, ticket_id=ticket_id, content="benchmark message"))
+                await db.commit()
+            written += 1
+
+    writer = write_sync if mode == "sync" else write_async
+    tasks = [asyncio.create_task(receive(q)) for q in queues]
+    tasks.append(asyncio.create_task(broadcast()))
+    tasks += [asyncio.create_task(writer()) for _ in range(writers)]
+    await asyncio.sleep(seconds)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {"session": mode, **latency_summary(latencies), "commits/s": f"{written / seconds:.0f}"}
+
+async def main(args):
+    engine = create_schema()
+    user_id = add_users(engine, 1)[0]
+    ticket_id = add_ticket(engine, user_id)
+    rows = [await run(mode, args.receivers, args.writers, args.seconds, user_id, ticket_id) for mode in ("sync", "async")]
+    await async_engine.dispose()
+    print(f"{args.receivers} receivers, {args.writers} writers, {args.seconds}s per run")
+    print_table(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receivers", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""Chat message throughput with the old per-message prints vs the structured, sampled, queued logger.
+
+Replays the per-message work of ``websocket_ticket_chat``: render the frame,
+log that it was received, log the broadcast. ``print`` is the old code, two
+f-string prints per message, the second with the full rendered message.
+The ``structured`` variants log the same events through ``get_logger`` at
+INFO (the default, debug events skipped), at DEBUG with the default 1%
+sampling, and at DEBUG unsampled. Every variant writes to a pipe drained by
+a child process, line buffered, like stdout in a container.
+
+    python -m bench.ws_logging --messages 200000
+"""
+import argparse
+import contextlib
+import logging
+import subprocess
+import sys
+import time
+from datetime import datetime
+from bench.common import print_table
+from app.core import log as log_module
+from app.core.config import settings
+from app.core.protocol import make_frame, render_legacy
+
+log = log_module.get_logger("app.routers.ws_chat")
+
+def frames(messages: int):
+    timestamp = datetime.now().isoformat()
+    for seq in range(1, messages + 1):
+        yield make_frame("message", seq=seq, ticket_id=7, sender_id=3, sender_name="alice",
+                         content=f"message number {seq} with a few more words in it", timestamp=timestamp)
+
+def with_prints(messages: int, room_size: int):
+    for frame in frames(messages):
+        print(f"Received {frame['type']} frame from user {frame['sender_id']} in ticket {frame['ticket_id']}")
+        message_to_send = render_legacy(frame)
+        print(f"Broadcasting message to {room_size} local connections: {message_to_send}")
+
+def with_logger(messages: int, room_size: int):
+    for frame in frames(messages):
+        log.debug("ws.frame", user_id=frame["sender_id"], ticket_id=frame["ticket_id"], type=frame["type"])
+        render_legacy(frame)
+        log.debug("ws.broadcast", ticket_id=frame["ticket_id"], seq=frame["seq"], local_recipients=room_size)
+
+@contextlib.contextmanager
+def piped_output():
+    drain = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    pipe = open(drain.stdin.fileno(), "w", buffering=1, closefd=False)
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = pipe
+    try:
+        yield
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        pipe.close()
+        drain.stdin.close()
+        drain.wait()
+
+def main(args):
+    variants = [
+        ("print", "-", None, with_prints),
+        ("structured", "INFO", settings.LOG_SAMPLE_RATES, with_logger),
+        ("structured", "DEBUG", settings.LOG_SAMPLE_RATES, with_logger),
+        ("structured", "DEBUG", {}, with_logger),
+    ]
+    rows = []
+    for name, level, rates, run in variants:
+        with piped_output():
+            if run is with_logger:
+                settings.LOG_SAMPLE_RATES = rates
+                log_module.start_logging()
+                logging.getLogger("app").setLevel(level)
+            start = time.perf_counter()
+            run(args.messages, args.room_size)
+            elapsed = time.perf_counter() - start
+            dropped = "-"
+            if run is with_logger:
+                dropped = str(log_module.queue_handler.dropped)
+                log_module.stop_logging()
+        sampling = "-" if rates is None else ("none" if not rates else ", ".join(f"{k} {v:g}" for k, v in rates.items()))
+        rows.append({"logging": name, "level": level, "sampling": sampling,
+                     "messages/s": f"{args.messages / elapsed:.0f}", "records dropped": dropped})
+    print(f"{args.messages} messages per run, queue size {settings.LOG_QUEUE_SIZE}")
+    print_table(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--room-size", type=int, default=50)
+    main(parser.parse_args())
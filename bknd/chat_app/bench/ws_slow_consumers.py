@@ -0,0 +1,92 @@
+"""Group delivery latency with a few stalled sockets: sequential sends vs per-connection queues.
+
+``--sockets`` fake sockets sit in one room, ``--stalled`` of which take
+``--stall-ms`` to accept each frame, like a mobile client on a bad link.
+``sequential`` is the old broadcast loop awaiting ``send_text`` one socket at
+a time; the queued variants go through ``send_to_local`` and each
+connection's writer task under both slow-consumer policies. Latency is
+measured from broadcast to the healthy sockets receiving the frame.
+
+    python -m bench.ws_slow_consumers --sockets 1000 --stalled 5
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from bench.common import latency_summary, print_table
+from app.core.connections import Connection, DISCONNECT, DROP_OLDEST
+from app.core.protocol import LEGACY, Broadcast, make_frame
+from app.routers.ws_chat import send_to_local
+
+class FakeSocket:
+    def __init__(self, delay: float, latencies: list):
+        self.state = SimpleNamespace(encoding=LEGACY)
+        self.delay = delay
+        self.latencies = latencies
+
+    async def send_text(self, data: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        elif self.latencies is not None:
+            self.latencies.append(time.perf_counter() - float(data.split("|")[0].split(":", 1)[1]))
+
+    async def close(self, code: int = 1000):
+        pass
+
+def frame(seq: int) -> Broadcast:
+    # The send time travels as the content so receivers can measure latency
+    return Broadcast.from_frame(make_frame(
+        "message", seq=seq, ticket_id=1, sender_id=1, sender_name="bench",
+        content=repr(time.perf_counter()), timestamp="2024-01-01T12:00:00",
+    ))
+
+def make_sockets(count: int, stalled: int, stall: float, latencies: list):
+    return [FakeSocket(stall if i < stalled else 0, latencies) for i in range(count)]
+
+async def sequential(sockets, messages: int, interval: float):
+    for seq in range(1, messages + 1):
+        broadcast = frame(seq)
+        for ws in sockets:
+            await ws.send_text(broadcast.encoded(LEGACY))
+        await asyncio.sleep(interval)
+
+async def queued(sockets, messages: int, interval: float, policy: str, queue_size: int):
+    connections = [Connection(ws, user_id=i, queue_size=queue_size, policy=policy) for i, ws in enumerate(sockets)]
+    for seq in range(1, messages + 1):
+        send_to_local(connections, frame(seq))
+        await asyncio.sleep(interval)
+    # Let the healthy writers drain before stopping
+    await asyncio.sleep(interval)
+    evicted = sum(c.closed for c in connections)
+    for connection in connections:
+        await connection.close()
+    return evicted
+
+async def main(args):
+    stall = args.stall_ms / 1000
+    interval = args.interval_ms / 1000
+    rows = []
+    for name in ("sequential", DISCONNECT, DROP_OLDEST):
+        latencies = []
+        sockets = make_sockets(args.sockets, args.stalled, stall, latencies)
+        start = time.perf_counter()
+        if name == "sequential":
+            await sequential(sockets, args.messages, interval)
+            evicted = 0
+        else:
+            evicted = await queued(sockets, args.messages, interval, name, args.queue_size)
+        elapsed = time.perf_counter() - start
+        rows.append({"delivery": name, **latency_summary(latencies), "evicted": str(evicted), "seconds": f"{elapsed:.2f}"})
+    print(f"{args.sockets} sockets, {args.stalled} stalled at {args.stall_ms} ms per frame, "
+          f"{args.messages} messages every {args.interval_ms} ms, queue size {args.queue_size}")
+    print_table(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--stalled", type=int, default=5)
+    parser.add_argument("--stall-ms", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=30)
+    parser.add_argument("--interval-ms", type=int, default=20)
+    parser.add_argument("--queue-size", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
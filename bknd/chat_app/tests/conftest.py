@@ -0,0 +1,98 @@
+"""Shared fixtures. Tests run against a throwaway SQLite file, so the settings
+must point at it before anything under ``app`` is imported."""
+import os
+import tempfile
+
+_db_path = os.path.join(tempfile.mkdtemp(prefix="chat_app_tests_"), "test.db")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ["SQLALCHEMY_ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_path}"
+os.environ.pop("BACKPLANE_URL", None)
+os.environ.pop("SQLALCHEMY_ASYNC_REPLICA_URLS", None)
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from app.core.backplane import backplane
+from app.core.database import Base, async_engine
+from app.core.deps import user_cache, ticket_cache, directory_cache
+from app.core.security import token_cache
+from app.core.unread import unread_cache
+from app.core.replay import replay_buffer
+from app.models.user import User
+from app.models.ticket import Ticket
+from app.models import message, change_log  # noqa: F401  (register the tables)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def engine():
+    """A fresh schema for each test, and a sync engine to seed and inspect it.
+
+    The file is recreated rather than dropped because SQLite's FTS table is not
+    part of the metadata. Async tests must dispose ``async_engine`` when done
+    (the ``db`` fixture does); TestClient tests get that from the app lifespan.
+    """
+    if os.path.exists(_db_path):
+        os.remove(_db_path)
+    sync_engine = create_engine(os.environ["SQLALCHEMY_DATABASE_URL"])
+    Base.metadata.create_all(sync_engine)
+    for cache in (user_cache, ticket_cache, directory_cache, token_cache, unread_cache):
+        cache.clear()
+    # Room sequences and the recent broadcasts restart with the database
+    backplane._sequences.clear()
+    replay_buffer._rooms.clear()
+    yield sync_engine
+    sync_engine.dispose()
+
+@pytest.fixture
+async def db(engine):
+    """``engine`` for async tests: pooled aiosqlite connections are closed on this test's loop."""
+    yield engine
+    await async_engine.dispose()
+
+@pytest.fixture
+def foreign_keys():
+    """Enforce foreign keys on the app's SQLite connections, as MySQL does."""
+    def enable(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+    event.listen(async_engine.sync_engine, "connect", enable)
+    yield
+    event.remove(async_engine.sync_engine, "connect", enable)
+
+def add_user(engine, name: str, role: str = "user") -> int:
+    with Session(engine) as session:
+        user = User(name=name, email=f"{name}@example.com", role=role, password_hash="x")
+        session.add(user)
+        session.commit()
+        return user.id
+
+def add_ticket(engine, creator_id: int, assignee_id: int = None, **fields) -> int:
+    with Session(engine) as session:
+        ticket = Ticket(title=fields.pop("title", "ticket"), creator_id=creator_id, assignee_id=assignee_id, **fields)
+        session.add(ticket)
+        session.commit()
+        return ticket.id
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    # The app mounts ./uploads and ./app/static relative to the working directory
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "app" / "static").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def client(engine, app_dir):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+def token_for(user_id: int) -> str:
+    from app.core.security import create_access_token
+    return create_access_token({"sub": str(user_id)})
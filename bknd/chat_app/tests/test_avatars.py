@@ -0,0 +1,49 @@
+import io
+from fastapi.testclient import TestClient
+from PIL import Image
+from tests.conftest import add_user, token_for
+
+def png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def upload(client, user_id: int, data: bytes, filename: str = "me.png"):
+    return client.post(
+        "/api/users/me/avatar",
+        files={"file": (filename, data, "application/octet-stream")},
+        headers={"Authorization": f"Bearer {token_for(user_id)}"},
+    )
+
+def test_upload_writes_square_webp_variants(client, engine):
+    alice = add_user(engine, "alice")
+    response = upload(client, alice, png(600, 400))
+    assert response.status_code == 200, response.text
+    urls = response.json()["avatar_urls"]
+    assert sorted(int(size) for size in urls) == [64, 128, 256]
+    assert response.json()["avatar"] == urls["128"]
+    for size, url in urls.items():
+        with Image.open(url.lstrip("/")) as variant:
+            assert (variant.format, variant.size) == ("WEBP", (int(size), int(size)))
+
+def test_non_image_upload_is_rejected(client, engine):
+    alice = add_user(engine, "alice")
+    response = upload(client, alice, b"not an image at all", filename="notes.txt")
+    assert response.status_code == 400
+
+def test_avatar_redirects_to_smallest_fitting_variant(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    urls = upload(client, alice, png(64, 64)).json()["avatar_urls"]
+    response = client.get(f"/api/users/{alice}/avatar", params={"size": 100}, follow_redirects=False)
+    assert (response.status_code, response.headers["location"]) == (307, urls["128"])
+    response = client.get(f"/api/users/{alice}/avatar", params={"size": 1000}, follow_redirects=False)
+    assert response.headers["location"] == urls["256"]
+    assert client.get(f"/api/users/{bob}/avatar", follow_redirects=False).status_code == 404
+
+def test_upload_works_after_an_app_restart(engine, app_dir):
+    alice = add_user(engine, "alice")
+    from app.main import app
+    # Each lifespan stops the resize pool on the way out; the next one must start a new one
+    for side in (80, 90):
+        with TestClient(app) as client:
+            assert upload(client, alice, png(side, side)).status_code == 200
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+import fakeredis
+from fakeredis import FakeAsyncRedis
+from app.core.backplane import RedisBackplane
+
+pytestmark = pytest.mark.anyio
+
+class Inbox:
+    """A deliver handler that records what reached one worker."""
+
+    def __init__(self):
+        self.received = []
+        self._arrived = asyncio.Event()
+
+    async def __call__(self, channel: str, payload: str):
+        self.received.append((channel, payload))
+        self._arrived.set()
+
+    async def wait_for(self, count: int):
+        while len(self.received) < count:
+            self._arrived.clear()
+            await asyncio.wait_for(self._arrived.wait(), 2)
+
+def make_backplane(server):
+    return RedisBackplane(client=FakeAsyncRedis(server=server), reconnect_delay=0.01, max_reconnect_delay=0.05)
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+async def test_publish_reaches_every_worker(server):
+    workers = [make_backplane(server), make_backplane(server)]
+    inboxes = [Inbox(), Inbox()]
+    for worker, inbox in zip(workers, inboxes):
+        await worker.start(inbox)
+    try:
+        await workers[0].publish("ticket:7", "hello")
+        for inbox in inboxes:
+            await inbox.wait_for(1)
+            assert inbox.received == [("ticket:7", "hello")]
+    finally:
+        for worker in workers:
+            await worker.stop()
+
+async def test_listener_resubscribes_after_connection_error(server):
+    worker, inbox = make_backplane(server), Inbox()
+    await worker.start(inbox)
+    try:
+        server.connected = False
+        await asyncio.sleep(0.1)
+        server.connected = True
+        # Publish until the new subscription is in place
+        for attempt in range(50):
+            await worker.publish("user:3", f"after {attempt}")
+            if inbox.received:
+                break
+            await asyncio.sleep(0.02)
+        await inbox.wait_for(1)
+        assert inbox.received[0][0] == "user:3"
+    finally:
+        await worker.stop()
+
+async def test_sequences_are_shared_and_start_after_seed(server):
+    workers = [make_backplane(server), make_backplane(server)]
+
+    async def seed():
+        return 10
+
+    assert await workers[0].next_sequence("ticket:1", seed) == 11
+    assert await workers[1].next_sequence("ticket:1", seed) == 12
+    assert await workers[0].current_sequence("ticket:1") == 12
+
+async def test_lost_counter_is_seeded_again(server):
+    worker = make_backplane(server)
+    stored = 0
+
+    async def seed():
+        return stored
+
+    for _ in range(3):
+        stored = await worker.next_sequence("ticket:1", seed)
+    # Redis restarted without persistence, or evicted the key
+    await FakeAsyncRedis(server=server).flushall()
+    assert await worker.next_sequence("ticket:1", seed) == 4
@@ -0,0 +1,20 @@
+import inspect
+from app.core.deps import get_current_user_id, get_optional_user_id
+from app.core.security import token_cache
+from tests.conftest import add_user, token_for
+
+def test_token_dependencies_run_on_the_event_loop():
+    # Sync dependencies run in the threadpool, where token_cache must not be touched
+    assert inspect.iscoroutinefunction(get_current_user_id)
+    assert inspect.iscoroutinefunction(get_optional_user_id)
+
+def test_verified_token_is_served_from_cache(client, engine):
+    headers = {"Authorization": f"Bearer {token_for(add_user(engine, 'alice'))}"}
+    assert client.get("/api/sync", headers=headers).status_code == 200
+    hits = token_cache.hits
+    assert client.get("/api/sync", headers=headers).status_code == 200
+    assert token_cache.hits == hits + 1
+
+def test_bad_token_is_rejected(client, engine):
+    response = client.get("/api/sync", headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
@@ -0,0 +1,73 @@
+from app.core.http_cache import etag_matches, make_etag
+from tests.conftest import add_user, add_ticket, token_for
+
+def auth(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {token_for(user_id)}"}
+
+def send(client, ticket_id: int) -> int:
+    # POST /api/messages/ always sends as user 1
+    response = client.post("/api/messages/", json={"ticket_id": ticket_id, "content": "hi"})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def revalidate(client, path: str, etag: str, headers: dict = None):
+    return client.get(path, headers={**(headers or {}), "If-None-Match": etag})
+
+def test_etag_comparison_is_weak_and_accepts_lists():
+    etag = make_etag("a", 1)
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag.removeprefix("W/"), etag)
+    assert etag_matches(f'W/"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag("a", 2), etag)
+
+def test_ticket_history_etag_follows_messages_and_reads(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    ticket_id = add_ticket(engine, alice, bob)
+    path = f"/api/messages/ticket/{ticket_id}"
+    message_id = send(client, ticket_id)
+    etag = client.get(path).headers["etag"]
+    assert revalidate(client, path, etag).status_code == 304
+
+    send(client, ticket_id)
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    assert client.post(f"/api/messages/{message_id}/read").status_code == 200
+    assert revalidate(client, path, etag).status_code == 200
+
+def test_read_that_moves_no_unread_counter_still_changes_the_etag(client, engine):
+    # With no assignee the sender is the only participant: their own messages are never
+    # unread for anyone, so only the read count can tell the history changed
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    path = f"/api/messages/ticket/{ticket_id}"
+    message_id = send(client, ticket_id)
+    etag = client.get(path).headers["etag"]
+    assert client.post(f"/api/messages/{message_id}/read").status_code == 200
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.json()[0]["read"] is True
+
+def test_ticket_listing_revalidates_until_a_ticket_changes(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    response = client.get("/api/tickets/", headers=auth(alice))
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert revalidate(client, "/api/tickets/", etag, auth(alice)).status_code == 304
+    # Another caller never shares the validator
+    bob = add_user(engine, "bob")
+    assert revalidate(client, "/api/tickets/", etag, auth(bob)).status_code == 200
+    assert client.put(f"/api/tickets/{ticket_id}", json={"status": "CLOSED"}, headers=auth(alice)).status_code == 200
+    assert revalidate(client, "/api/tickets/", etag, auth(alice)).status_code == 200
+
+def test_reassign_changes_both_assignees_listings(client, engine):
+    alice, bob, carol = add_user(engine, "alice"), add_user(engine, "bob"), add_user(engine, "carol")
+    ticket_id = add_ticket(engine, alice, bob)
+    etags = {user: client.get("/api/tickets/", headers=auth(user)).headers["etag"] for user in (alice, bob, carol)}
+    assert client.put(f"/api/tickets/{ticket_id}", json={"assignee_id": carol}, headers=auth(alice)).status_code == 200
+    for user, etag in etags.items():
+        assert revalidate(client, "/api/tickets/", etag, auth(user)).status_code == 200, user
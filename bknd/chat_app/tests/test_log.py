@@ -0,0 +1,40 @@
+import logging
+import queue
+import threading
+import time
+from app.core.log import DrainingQueueListener, DroppingQueueHandler, start_logging, stop_logging
+
+def record(message: str) -> logging.LogRecord:
+    return logging.makeLogRecord({"msg": message})
+
+def test_stop_waits_for_room_in_a_full_queue():
+    release = threading.Event()
+    handled = []
+
+    class BlockingHandler(logging.Handler):
+        def emit(self, record):
+            release.wait()
+            handled.append(record.getMessage())
+
+    log_queue = queue.Queue(maxsize=1)
+    listener = DrainingQueueListener(log_queue, BlockingHandler())
+    listener.start()
+    log_queue.put(record("first"))
+    while not log_queue.empty():
+        time.sleep(0.001)
+    # The listener is stuck writing "first", so this fills the queue
+    log_queue.put(record("second"))
+    threading.Timer(0.05, release.set).start()
+    listener.stop()
+    assert handled == ["first", "second"]
+
+def test_restarting_keeps_one_queue_handler():
+    for _ in range(2):
+        start_logging()
+        stop_logging()
+    start_logging()
+    try:
+        handlers = logging.getLogger("app").handlers
+        assert sum(isinstance(h, DroppingQueueHandler) for h in handlers) == 1
+    finally:
+        stop_logging()
@@ -0,0 +1,32 @@
+from tests.conftest import add_user, add_ticket
+
+def send(client, ticket_id: int, content: str) -> int:
+    response = client.post("/api/messages/", json={"ticket_id": ticket_id, "content": content})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def page(client, ticket_id: int, **params):
+    response = client.get(f"/api/messages/ticket/{ticket_id}", params=params)
+    assert response.status_code == 200, response.text
+    return [m["id"] for m in response.json()], response.headers
+
+def test_cursors_page_through_messages_sent_in_one_second(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    ids = [send(client, ticket_id, f"message {i}") for i in range(4)]
+
+    latest, headers = page(client, ticket_id, limit=2)
+    assert latest == ids[2:]
+    older, headers = page(client, ticket_id, limit=2, before=headers["x-before-cursor"])
+    assert older == ids[:2]
+    assert page(client, ticket_id, limit=2, before=headers["x-before-cursor"])[0] == []
+    assert page(client, ticket_id, limit=2, after=headers["x-after-cursor"])[0] == ids[2:]
+
+def test_ndjson_streams_full_history(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    for i in range(3):
+        send(client, ticket_id, f"message {i}")
+    response = client.get(f"/api/messages/ticket/{ticket_id}", params={"format": "ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(response.text.splitlines()) == 3
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from sqlalchemy import text
+from app.core import message_writer
+from app.core.message_writer import MessageWriter
+from app.core.sync import record_message_changes
+from tests.conftest import add_user, add_ticket
+
+pytestmark = pytest.mark.anyio
+
+def stored_contents(engine):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT content FROM messages ORDER BY id"))]
+
+async def test_flush_writes_batch_and_resolves_durable(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    ticket_id = add_ticket(db, alice, bob)
+    writer = MessageWriter(batch_size=10, flush_interval=60)
+    pending = [
+        writer.submit(alice, "one", ticket_id=ticket_id, seq=1),
+        writer.submit(bob, "two", receiver_id=alice),
+    ]
+    await writer.flush()
+    assert [await p.durable for p in pending] == [True, True]
+    assert stored_contents(db) == ["one", "two"]
+
+async def test_bad_row_only_drops_itself(db, foreign_keys):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    ticket_id = add_ticket(db, alice, bob)
+    writer = MessageWriter(batch_size=10, flush_interval=60)
+    good = writer.submit(alice, "kept", ticket_id=ticket_id, seq=1)
+    bad = writer.submit(alice, "orphan", ticket_id=999999, seq=1)
+    also_good = writer.submit(bob, "also kept", receiver_id=alice)
+    await writer.flush()
+    assert (await good.durable, await bad.durable, await also_good.durable) == (True, False, True)
+    assert stored_contents(db) == ["kept", "also kept"]
+
+async def test_stop_finishes_in_flight_flush(db, monkeypatch):
+    alice = add_user(db, "alice")
+    ticket_id = add_ticket(db, alice)
+    writer = MessageWriter(batch_size=1, flush_interval=60)
+    entered, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_record_message_changes(session, rows):
+        entered.set()
+        await release.wait()
+        await record_message_changes(session, rows)
+
+    monkeypatch.setattr(message_writer, "record_message_changes", slow_record_message_changes)
+    await writer.start()
+    pending = writer.submit(alice, "in flight", ticket_id=ticket_id, seq=1)
+    await entered.wait()
+    stopping = asyncio.create_task(writer.stop())
+    await asyncio.sleep(0)
+    release.set()
+    await stopping
+    assert pending.durable.done() and pending.durable.result() is True
+    assert stored_contents(db) == ["in flight"]
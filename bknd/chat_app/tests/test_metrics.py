@@ -0,0 +1,41 @@
+import asyncio
+import re
+from tests.conftest import add_user, add_ticket, token_for
+
+def samples(text: str) -> dict:
+    """Map ``name{labels}`` to its value for every sample line."""
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if line and not line.startswith("#"))
+
+def families(text: str) -> dict:
+    return dict(re.findall(r"^# TYPE (\S+) (\S+)$", text, re.MULTILINE))
+
+def test_metrics_renders_key_families(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    client.get("/")
+    with client.websocket_connect(f"/ws/ticket/{ticket_id}?token={token_for(alice)}"):
+        pass
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    kinds = families(response.text)
+    for name, kind in {
+        "http_request_duration_seconds": "histogram",
+        "ws_connections_total": "counter",
+        "ws_open_connections": "gauge",
+        "ws_room_churn_per_second": "gauge",
+        "cache_hits_total": "counter",
+        "db_pool_in_use": "gauge",
+        "db_query_duration_seconds": "histogram",
+        "chat_messages_per_second": "gauge",
+    }.items():
+        assert kinds.get(name) == kind, name
+    values = samples(response.text)
+    assert float(values["ws_room_churn_per_second"]) > 0
+    assert int(values['http_request_duration_seconds_count{method="GET",route="/",status="200"}']) >= 1
+
+def test_metrics_runs_on_the_event_loop(client):
+    # A threadpool scrape would race the socket handlers that mutate the same state
+    from app import main
+    assert asyncio.iscoroutinefunction(main.metrics)
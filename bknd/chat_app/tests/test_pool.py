@@ -0,0 +1,69 @@
+import json
+import os
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core.config import settings
+from app.core.database import TimedAsyncQueuePool, async_engine, pool_options, pool_stats, pool_histogram
+from tests.conftest import add_user, add_ticket, token_for
+from tests.test_metrics import samples
+
+def test_pool_options_follow_the_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 3)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 2)
+    url = os.environ["SQLALCHEMY_ASYNC_DATABASE_URL"]
+    assert pool_options(url) == {
+        "pool_size": 3, "max_overflow": 2, "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT, "poolclass": TimedAsyncQueuePool,
+    }
+    assert "poolclass" not in pool_options(os.environ["SQLALCHEMY_DATABASE_URL"], async_=False)
+    # In-memory SQLite keeps the pool SQLAlchemy picks for it
+    assert pool_options("sqlite+aiosqlite://") == pool_options("sqlite+aiosqlite:///:memory:") == {}
+
+@pytest.mark.anyio
+async def test_pool_stats_track_checkouts_and_timeouts(db, monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(settings, "DB_POOL_TIMEOUT", 0.05)
+    url = os.environ["SQLALCHEMY_ASYNC_DATABASE_URL"]
+    engine = create_async_engine(url, **pool_options(url))
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            stats = pool_stats(engine)
+            assert (stats["size"], stats["in_use"], stats["idle"], stats["overflow"]) == (1, 1, 0, 0)
+            with pytest.raises(PoolTimeoutError):
+                async with engine.connect():
+                    pass
+        stats = pool_stats(engine)
+        assert (stats["in_use"], stats["idle"], stats["timeouts"]) == (0, 1, 1)
+        assert stats["checkout_wait_seconds"]["count"] == 2
+        assert stats["checkout_wait_seconds"]["sum"] >= 0.05
+        assert pool_histogram(engine) is engine.pool.checkout_wait
+    finally:
+        await engine.dispose()
+
+@pytest.mark.anyio
+async def test_pool_stats_skip_untimed_pools(db):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        assert pool_stats(engine) == {}
+        assert pool_histogram(engine) is None
+    finally:
+        await engine.dispose()
+
+def test_ticket_socket_does_not_hold_a_connection(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    with client.websocket_connect(f"/ws/ticket/{ticket_id}?token={token_for(alice)}", subprotocols=["chat.v1.json"]) as ws:
+        ws.send_text(json.dumps({"type": "message", "content": "hello"}))
+        while json.loads(ws.receive_text())["type"] != "ack":
+            pass
+        assert client.portal.call(pool_stats, async_engine)["in_use"] == 0
+
+    values = samples(client.get("/metrics").text)
+    assert float(values['db_pool_size{engine="primary"}']) == settings.DB_POOL_SIZE
+    assert float(values['db_pool_in_use{engine="primary"}']) == 0
+    assert float(values['db_pool_timeouts_total{engine="primary"}']) == 0
+    assert int(values['db_pool_checkout_wait_seconds_count{engine="primary"}']) >= 1
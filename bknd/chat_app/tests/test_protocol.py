@@ -0,0 +1,45 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from app.core import protocol
+from app.core.protocol import make_frame, encode, receive_frame
+
+class FakeSocket:
+    """Just enough of a WebSocket for receive_frame."""
+
+    def __init__(self, encoding: str, **message):
+        self.state = SimpleNamespace(encoding=encoding)
+        self._message = {"type": "websocket.receive", **message}
+
+    async def receive(self):
+        return self._message
+
+def direct_message(**fields):
+    return make_frame("message", seq=17, sender_id=3, receiver_id=4, content="hi | there", **fields)
+
+def test_legacy_direct_message_keeps_original_format():
+    assert encode(direct_message(), protocol.LEGACY) == "3: hi | there"
+
+def test_structured_direct_message_carries_seq():
+    assert json.loads(encode(direct_message(), protocol.JSON))["seq"] == 17
+
+def test_legacy_ticket_message_keeps_leading_fields():
+    frame = make_frame("message", seq=5, ticket_id=1, sender_id=3, sender_name="alice", content="hi",
+                       timestamp=datetime(2026, 1, 1, 14, 5).isoformat())
+    assert encode(frame, protocol.LEGACY).split("|")[:3] == ["3:hi", "02:05 PM", "alice"]
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("text", ["hello", "42", '{"a":1}', '{"type":"unknown","content":"x"}', "[1, 2]"])
+async def test_legacy_text_that_is_not_a_frame_is_a_chat_message(text):
+    frame = await receive_frame(FakeSocket(protocol.LEGACY, text=text))
+    assert frame == make_frame("message", content=text)
+
+@pytest.mark.anyio
+async def test_legacy_json_frame_is_parsed():
+    frame = await receive_frame(FakeSocket(protocol.LEGACY, text='{"type":"typing","active":true}'))
+    assert frame == {"type": "typing", "active": True}
+
+@pytest.mark.anyio
+async def test_structured_socket_ignores_unknown_frames():
+    assert await receive_frame(FakeSocket(protocol.JSON, text='{"a":1}')) is None
@@ -0,0 +1,75 @@
+"""The hot read paths stay on their indexes (SQLite EXPLAIN QUERY PLAN).
+
+A plan that falls back to a full table SCAN, or sorts in a temporary
+B-tree, means an index was dropped or a query no longer matches it.
+"""
+from datetime import datetime
+from sqlalchemy import event, select, update
+from app.core.pagination import encode_cursor
+from app.models.message import Message, DirectUnread
+from app.models.ticket import Ticket, TicketStatus, TicketUnread
+from app.routers.message import paginate_history, is_unread
+from app.routers.ticket import participant_scopes
+
+def query_plan(engine, stmt) -> str:
+    """The plan SQLite picks for ``stmt``, one step per line."""
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        return f"EXPLAIN QUERY PLAN {statement}", parameters
+    event.listen(engine, "before_cursor_execute", explain, retval=True)
+    try:
+        with engine.connect() as conn:
+            return "\n".join(row[-1] for row in conn.execute(stmt).all())
+    finally:
+        event.remove(engine, "before_cursor_execute", explain)
+
+def assert_no_full_scan(plan: str, table: str):
+    assert not any(line.startswith(f"SCAN {table}") for line in plan.splitlines()), plan
+
+def assert_indexed(plan: str, index: str):
+    """Read through ``index`` in the order the query asks for, with no extra sort."""
+    assert f"INDEX {index}" in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
+
+def test_ticket_history_pages_on_ticket_timestamp_index(engine):
+    cursor = encode_cursor(datetime(2026, 1, 1, 12), 40)
+    for before, after in ((None, None), (cursor, None), (None, cursor)):
+        stmt, _ = paginate_history(select(Message).filter(Message.ticket_id == 1), before, after, 50)
+        assert_indexed(query_plan(engine, stmt), "ix_messages_ticket_id_timestamp_id")
+
+def test_direct_history_reads_both_sides_from_indexes(engine):
+    stmt, _ = paginate_history(select(Message).filter((Message.sender_id == 1) | (Message.receiver_id == 1)), None, None, 50)
+    plan = query_plan(engine, stmt)
+    assert "INDEX ix_messages_sender_id_" in plan, plan
+    assert "INDEX ix_messages_receiver_id_" in plan, plan
+    assert_no_full_scan(plan, "messages")
+
+def test_ticket_listing_reads_each_participant_index_in_order(engine):
+    for scope, index in zip(participant_scopes(1), ("ix_tickets_creator_id_created_at", "ix_tickets_assignee_id_created_at")):
+        stmt = select(Ticket).filter(scope).order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(50)
+        assert_indexed(query_plan(engine, stmt), index)
+
+def test_ticket_listing_by_status_stays_on_participant_indexes(engine):
+    for scope, side in zip(participant_scopes(1), ("creator_id", "assignee_id")):
+        stmt = (
+            select(Ticket).filter(scope, Ticket.status == TicketStatus.OPEN)
+            .order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(50)
+        )
+        plan = query_plan(engine, stmt)
+        assert f"INDEX ix_tickets_{side}_" in plan, plan
+        assert_no_full_scan(plan, "tickets")
+
+def test_unread_summary_reads_counter_tables_by_user(engine):
+    ticket_plan = query_plan(engine, select(TicketUnread.ticket_id, TicketUnread.unread_count)
+                             .filter(TicketUnread.user_id == 1, TicketUnread.unread_count > 0))
+    assert "INDEX ix_ticket_unread_user_id" in ticket_plan, ticket_plan
+    direct_plan = query_plan(engine, select(DirectUnread.peer_id, DirectUnread.unread_count)
+                             .filter(DirectUnread.user_id == 1, DirectUnread.unread_count > 0))
+    assert "INDEX sqlite_autoindex_direct_unread_1" in direct_plan, direct_plan
+
+def test_mark_direct_messages_read_uses_receiver_index(engine):
+    stmt = update(Message).filter(
+        Message.ticket_id.is_(None), Message.sender_id == 2, Message.receiver_id == 1, Message.id <= 100, is_unread
+    ).values(read=True)
+    plan = query_plan(engine, stmt)
+    assert "INDEX ix_messages_receiver_id_" in plan or "INDEX ix_messages_sender_id_" in plan, plan
+    assert_no_full_scan(plan, "messages")
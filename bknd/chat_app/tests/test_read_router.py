@@ -0,0 +1,86 @@
+import json
+import os
+import pytest
+from app.core import database, deps, message_writer
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, ReadRouter
+from tests.conftest import add_user, add_ticket, token_for
+
+def auth(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {token_for(user_id)}"}
+
+@pytest.fixture
+def replica_router(monkeypatch):
+    """A ReadRouter whose one replica is the test database itself (SQLite reports no lag)."""
+    router = ReadRouter([os.environ["SQLALCHEMY_ASYNC_DATABASE_URL"]])
+    for module in (database, deps, message_writer):
+        monkeypatch.setattr(module, "read_router", router)
+    return router
+
+@pytest.mark.anyio
+async def test_without_replicas_reads_use_the_primary(db):
+    router = ReadRouter([])
+    router.note_write(1)
+    assert await router.sessionmaker(1) is AsyncSessionLocal
+    assert await router.sessionmaker() is AsyncSessionLocal
+    assert router.stats() == {"replica": 0, "primary": 2, "primary_recent_write": 0, "primary_replica_lag": 0, "replica_lag_seconds": []}
+
+@pytest.mark.anyio
+async def test_recent_writer_stays_on_the_primary(db, replica_router):
+    replica = replica_router.replicas[0]
+    try:
+        assert await replica_router.sessionmaker(1) is replica.sessionmaker
+        replica_router.note_write(1)
+        assert await replica_router.sessionmaker(1) is AsyncSessionLocal
+        # Anonymous readers and other users are not affected by user 1's write
+        assert await replica_router.sessionmaker(2) is replica.sessionmaker
+        assert await replica_router.sessionmaker() is replica.sessionmaker
+        stats = replica_router.stats()
+        assert (stats["replica"], stats["primary_recent_write"], stats["replica_lag_seconds"]) == (3, 1, [0.0])
+    finally:
+        await replica_router.dispose()
+
+@pytest.mark.anyio
+async def test_lagging_or_unreachable_replica_falls_back_to_the_primary(db, replica_router, monkeypatch):
+    replica = replica_router.replicas[0]
+    try:
+        monkeypatch.setattr(settings, "REPLICA_MAX_LAG_SECONDS", -1)
+        assert await replica_router.sessionmaker() is AsyncSessionLocal
+
+        async def unreachable():
+            raise OSError("connection refused")
+
+        monkeypatch.setattr(settings, "REPLICA_MAX_LAG_SECONDS", 5)
+        monkeypatch.setattr(settings, "REPLICA_LAG_CHECK_SECONDS", 0)
+        monkeypatch.setattr(replica, "_measure_lag", unreachable)
+        assert await replica_router.sessionmaker() is AsyncSessionLocal
+        assert replica.lag is None
+        assert replica_router.stats()["primary_replica_lag"] == 2
+    finally:
+        await replica_router.dispose()
+
+def test_committed_requests_and_sent_messages_pin_reads_to_the_primary(client, engine, replica_router):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    ticket_id = add_ticket(engine, alice, bob)
+    try:
+        assert client.get("/api/tickets/", headers=auth(alice)).status_code == 200
+        assert replica_router.counts["replica"] == 1
+
+        response = client.put(f"/api/tickets/{ticket_id}", json={"title": "renamed"}, headers=auth(alice))
+        assert response.status_code == 200
+        listing = client.get("/api/tickets/", headers=auth(alice))
+        assert listing.json()[0]["title"] == "renamed"
+        assert replica_router.counts["primary_recent_write"] == 1
+
+        # A read-only request commits nothing, so bob keeps reading from the replica
+        client.get(f"/api/messages/ticket/{ticket_id}", headers=auth(bob))
+        assert replica_router.counts["replica"] == 2
+        with client.websocket_connect(f"/ws/ticket/{ticket_id}?token={token_for(bob)}", subprotocols=["chat.v1.json"]) as ws:
+            ws.send_text(json.dumps({"type": "message", "content": "hello"}))
+            # The sender is noted as a writer once the batch commits, just before the ack
+            while json.loads(ws.receive_text())["type"] != "ack":
+                pass
+        client.get(f"/api/messages/ticket/{ticket_id}", headers=auth(bob))
+        assert replica_router.counts["primary_recent_write"] == 2
+    finally:
+        client.portal.call(replica_router.dispose)
@@ -0,0 +1,107 @@
+import json
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.orm import Session
+from app.core import protocol
+from app.core.backplane import backplane
+from app.core.config import settings
+from app.core.connections import registry
+from app.core.protocol import Broadcast, make_frame
+from app.core.replay import ReplayBuffer, replay_and_join, replay_buffer, replays
+from app.models.message import Message
+from tests.conftest import add_user, add_ticket, token_for
+
+ROOM = "ticket:1"
+
+def broadcast(seq: int) -> Broadcast:
+    return Broadcast.from_frame(make_frame("message", seq=seq, ticket_id=1, content=f"m{seq}"))
+
+def test_gap_needs_every_seq_up_to_head():
+    buffer = ReplayBuffer(size=10, rooms=10)
+    for seq in (1, 2, 3):
+        buffer.record(ROOM, seq, broadcast(seq))
+    assert [b.frame["seq"] for b in buffer.gap(ROOM, 1, 3)] == [2, 3]
+    assert buffer.gap(ROOM, 3, 3) == []
+    # The head is past the buffer, or unknown
+    assert buffer.gap(ROOM, 1, 4) is None
+    assert buffer.gap(ROOM, 1, None) is None
+    # A seq missing from the middle
+    buffer.record(ROOM, 5, broadcast(5))
+    assert buffer.gap(ROOM, 2, 5) is None
+
+def test_buffer_keeps_the_latest_rooms_and_messages():
+    buffer = ReplayBuffer(size=2, rooms=2)
+    for seq in (1, 2, 3):
+        buffer.record(ROOM, seq, broadcast(seq))
+    buffer.record("ticket:2", 1, broadcast(1))
+    buffer.record("ticket:3", 1, broadcast(1))
+    assert len(buffer) == 2
+    assert buffer.after(ROOM, 0) == []
+    assert [seq for seq, _ in buffer.after("ticket:2", 0)] == [1]
+
+class FakeConnection:
+    user_id = 1
+    encoding = protocol.JSON
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(json.loads(data))
+        return True
+
+    def send_frame(self, frame):
+        return self.send(protocol.encode(frame, self.encoding))
+
+def store(engine, ticket_id: int, sender_id: int, *seqs):
+    with Session(engine) as session:
+        session.add_all(Message(sender_id=sender_id, ticket_id=ticket_id, content=f"m{seq}", seq=seq) for seq in seqs)
+        session.commit()
+
+async def replay(ticket_id: int, last_seq: int, head: int):
+    backplane._sequences[f"ticket:{ticket_id}"] = head
+    connection = FakeConnection()
+    sources = {source: replays.labels(source).value for source in ("buffer", "db", "resync")}
+    await replay_and_join(connection, ticket_id, last_seq)
+    room = f"ticket:{ticket_id}"
+    assert connection in registry.room_connections(room)
+    registry.leave(room, connection)
+    used = [source for source, before in sources.items() if replays.labels(source).value > before]
+    return connection.sent, used
+
+@pytest.mark.anyio
+async def test_reconnect_replays_from_buffer(db):
+    alice = add_user(db, "alice")
+    ticket_id = add_ticket(db, alice)
+    for seq in (1, 2, 3):
+        replay_buffer.record(f"ticket:{ticket_id}", seq, broadcast(seq))
+    sent, used = await replay(ticket_id, 1, head=3)
+    assert ([f["seq"] for f in sent], used) == ([2, 3], ["buffer"])
+
+@pytest.mark.anyio
+async def test_reconnect_falls_back_to_stored_messages(db):
+    alice = add_user(db, "alice")
+    ticket_id = add_ticket(db, alice)
+    # Seq 3 was never stored (a dropped row); the replay carries on past the hole
+    store(db, ticket_id, alice, 1, 2, 4)
+    sent, used = await replay(ticket_id, 1, head=4)
+    assert ([f["seq"] for f in sent], used) == ([2, 4], ["db"])
+    assert sent[0]["sender_name"] == "alice"
+
+@pytest.mark.anyio
+async def test_reconnect_too_far_behind_is_told_to_resync(db, monkeypatch):
+    monkeypatch.setattr(settings, "WS_REPLAY_MAX_MESSAGES", 2)
+    alice = add_user(db, "alice")
+    ticket_id = add_ticket(db, alice)
+    store(db, ticket_id, alice, 1, 2, 3, 4)
+    sent, used = await replay(ticket_id, 0, head=4)
+    assert (sent, used) == ([make_frame("resync", ticket_id=ticket_id)], ["resync"])
+
+def test_rest_message_is_broadcast_to_the_room(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    with client.websocket_connect(f"/ws/ticket/{ticket_id}?token={token_for(alice)}", subprotocols=["chat.v1.json"]) as ws:
+        response = client.post("/api/messages/", json={"ticket_id": ticket_id, "content": "from rest"})
+        frame = json.loads(ws.receive_text())
+    assert (frame["type"], frame["content"], frame["seq"]) == ("message", "from rest", response.json()["seq"])
+    assert [seq for seq, _ in replay_buffer.after(f"ticket:{ticket_id}", 0)] == [frame["seq"]]
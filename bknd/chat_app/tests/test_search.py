@@ -0,0 +1,64 @@
+from sqlalchemy.orm import Session
+from app.models.message import Message
+from tests.conftest import add_user, add_ticket, token_for
+
+def add_messages(engine, *rows) -> list:
+    with Session(engine) as session:
+        messages = [Message(**row) for row in rows]
+        session.add_all(messages)
+        session.commit()
+        return [m.id for m in messages]
+
+def search(client, user_id: int, **params):
+    response = client.get("/api/messages/search", params=params, headers={"Authorization": f"Bearer {token_for(user_id)}"})
+    assert response.status_code == 200, response.text
+    return response.json(), response.headers
+
+def test_query_without_words_finds_nothing(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    add_messages(engine, {"sender_id": alice, "ticket_id": ticket_id, "content": "!!! wow !!!"})
+    assert search(client, alice, q="!!!")[0] == []
+
+def test_hits_are_ranked_by_relevance(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    weak, strong = add_messages(
+        engine,
+        {"sender_id": alice, "ticket_id": ticket_id, "content": "the printer is broken and the screen flickers again today"},
+        {"sender_id": alice, "ticket_id": ticket_id, "content": "printer printer printer"},
+    )
+    hits, _ = search(client, alice, q="printer")
+    assert [h["id"] for h in hits] == [strong, weak]
+    assert hits[0]["score"] > hits[1]["score"]
+
+def test_cursor_pages_through_every_hit_once(client, engine):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+    # Equal scores as well as different ones, so paging relies on the id tiebreak
+    ids = add_messages(engine, *(
+        {"sender_id": alice, "ticket_id": ticket_id, "content": "invoice " * (1 + i % 2) + "attached"} for i in range(5)
+    ))
+    seen, cursor = [], None
+    while True:
+        params = {"q": "invoice", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        hits, headers = search(client, alice, **params)
+        seen += [h["id"] for h in hits]
+        cursor = headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(ids)
+
+def test_only_visible_messages_are_searched(client, engine):
+    alice, bob, carol = (add_user(engine, name) for name in ("alice", "bob", "carol"))
+    shared = add_ticket(engine, alice, bob)
+    private = add_ticket(engine, carol)
+    visible, _ = add_messages(
+        engine,
+        {"sender_id": bob, "ticket_id": shared, "content": "refund approved"},
+        {"sender_id": carol, "ticket_id": private, "content": "refund pending"},
+    )
+    assert [h["id"] for h in search(client, alice, q="refund")[0]] == [visible]
@@ -0,0 +1,58 @@
+import hashlib
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+import pytest
+from app.core import security
+from app.core.config import settings
+from app.core.security import PasswordHasherBusy, create_access_token, decode_access_token, token_cache
+from app.routers import auth
+from tests.conftest import add_user
+
+def cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+def test_verified_token_is_served_from_cache(engine, monkeypatch):
+    token = create_access_token({"sub": "7"})
+    assert decode_access_token(token)["sub"] == "7"
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("cached token was decoded again")
+    monkeypatch.setattr(security.jwt, "decode", no_decode)
+    hits = token_cache.hits
+    assert decode_access_token(token)["sub"] == "7"
+    assert token_cache.hits == hits + 1
+
+def test_cached_token_expires_at_exp(engine, monkeypatch):
+    token = create_access_token({"sub": "7"}, expires_delta=timedelta(seconds=60))
+    decode_access_token(token)
+    now = time.monotonic()
+    monkeypatch.setattr("app.core.cache.time", SimpleNamespace(monotonic=lambda: now + 55))
+    assert token_cache.get(cache_key(token)) is not None
+    monkeypatch.setattr("app.core.cache.time", SimpleNamespace(monotonic=lambda: now + 61))
+    assert token_cache.get(cache_key(token)) is None
+
+def test_invalid_token_is_not_cached(engine):
+    assert decode_access_token("not-a-jwt") is None
+    assert len(token_cache) == 0
+
+@pytest.mark.anyio
+async def test_hasher_refuses_work_beyond_its_queue(monkeypatch):
+    monkeypatch.setattr(security, "_password_hash_inflight", settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_DEPTH)
+    with pytest.raises(PasswordHasherBusy):
+        await security.verify_password_async("secret", "x")
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/auth/login", {"email": "alice@example.com", "password": "secret"}),
+    ("/api/auth/register", {"name": "bob", "email": "bob@example.com", "password": "secret"}),
+])
+def test_busy_hasher_answers_503_with_retry_after(client, engine, monkeypatch, path, body):
+    add_user(engine, "alice")
+
+    async def busy(*args):
+        raise PasswordHasherBusy()
+    monkeypatch.setattr(auth, "verify_password_async", busy)
+    monkeypatch.setattr(auth, "get_password_hash_async", busy)
+    response = client.post(path, json=body)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(settings.PASSWORD_HASH_RETRY_AFTER)
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from app.core.database import AsyncSessionLocal
+from app.core.sync import sync_changes, prune, decode_token, TICKET
+from app.models.change_log import ChangeLog
+from tests.conftest import add_user, add_ticket
+
+pytestmark = pytest.mark.anyio
+
+def add_changes(engine, user_id: int, entity_id: int, created_at: datetime, count: int = 1):
+    with engine.begin() as conn:
+        conn.execute(insert(ChangeLog), [
+            {"user_id": user_id, "kind": TICKET, "entity_id": entity_id, "created_at": created_at}
+        ] * count)
+
+async def sync(user_id: int, token: str = None):
+    async with AsyncSessionLocal() as session:
+        return await sync_changes(session, user_id, token)
+
+async def test_sync_returns_changed_tickets(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    token = (await sync(bob)).token
+    ticket_id = add_ticket(db, alice, bob)
+    add_changes(db, bob, ticket_id, datetime.now() - timedelta(minutes=1))
+    response = await sync(bob, token)
+    assert [t.id for t in response.tickets] == [ticket_id]
+    assert (await sync(bob, response.token)).tickets == []
+
+async def test_quiet_user_token_survives_prune(db):
+    alice, bob, carol = add_user(db, "alice"), add_user(db, "bob"), add_user(db, "carol")
+    ticket_id = add_ticket(db, alice, bob)
+    add_changes(db, bob, ticket_id, datetime.now() - timedelta(days=40), count=3)
+    # Carol never has changes of her own, but her token still moves with the log
+    token = (await sync(carol)).token
+    assert decode_token(token)[0] == 3
+    add_changes(db, bob, ticket_id, datetime.now() - timedelta(minutes=1))
+    async with AsyncSessionLocal() as session:
+        assert await prune(session, 30) == 3
+    response = await sync(carol, token)
+    assert decode_token(response.token)[0] == 4
+    assert (await sync(carol, response.token)).tickets == []
+
+async def test_token_older_than_pruned_rows_expires_once(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    ticket_id = add_ticket(db, alice, bob)
+    stale = (await sync(bob)).token
+    add_changes(db, bob, ticket_id, datetime.now() - timedelta(days=40), count=3)
+    add_changes(db, bob, ticket_id, datetime.now() - timedelta(minutes=1))
+    async with AsyncSessionLocal() as session:
+        await prune(session, 30)
+    with pytest.raises(HTTPException) as expired:
+        await sync(bob, stale)
+    assert expired.value.status_code == 410
+    # A fresh bootstrap is accepted again
+    fresh = (await sync(bob)).token
+    assert (await sync(bob, fresh)).tickets == []
@@ -0,0 +1,76 @@
+import pytest
+from app.core.database import AsyncSessionLocal
+from app.models.ticket import TicketPriority, TicketStatus
+from app.routers.ticket import fetch_tickets
+from tests.conftest import add_user, add_ticket, token_for
+
+def listing(client, user_id: int, **params):
+    response = client.get("/api/tickets/", params=params, headers={"Authorization": f"Bearer {token_for(user_id)}"})
+    assert response.status_code == 200, response.text
+    return [t["id"] for t in response.json()], response.headers.get("x-next-cursor")
+
+def all_pages(client, user_id: int, **params) -> list:
+    ids, cursor = listing(client, user_id, **params)
+    while cursor:
+        page, cursor = listing(client, user_id, cursor=cursor, **params)
+        ids += page
+    return ids
+
+@pytest.mark.anyio
+async def test_fetch_tickets_merges_created_and_assigned(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    created = add_ticket(db, alice, bob)
+    assigned = add_ticket(db, bob, alice)
+    both = add_ticket(db, alice, alice)
+    add_ticket(db, bob, bob)
+    async with AsyncSessionLocal() as session:
+        newest = [t.id for t in await fetch_tickets(session, alice, [], True, None, None)]
+        oldest_two = [t.id for t in await fetch_tickets(session, alice, [], False, None, 2)]
+    # A ticket the user both created and is assigned appears once
+    assert newest == [both, assigned, created]
+    assert oldest_two == [created, assigned]
+
+@pytest.mark.anyio
+async def test_fetch_tickets_continues_after_cursor_in_both_scopes(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    ids = [add_ticket(db, alice) if i % 2 else add_ticket(db, bob, alice) for i in range(5)]
+    async with AsyncSessionLocal() as session:
+        first = await fetch_tickets(session, alice, [], True, None, 2)
+        rest = await fetch_tickets(session, alice, [], True, [first[-1].created_at, first[-1].id], None)
+    assert [t.id for t in first + rest] == ids[::-1]
+
+def test_priority_sort_pages_across_levels(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    by_level = {}
+    for i, level in enumerate([TicketPriority.LOW, TicketPriority.CRITICAL, TicketPriority.NORMAL] * 3):
+        creator, assignee = (alice, None) if i % 2 else (bob, alice)
+        by_level.setdefault(level, []).append(add_ticket(engine, creator, assignee, priority=level))
+    expected = [i for level in (TicketPriority.CRITICAL, TicketPriority.NORMAL, TicketPriority.LOW) for i in by_level[level][::-1]]
+    # Page size 2 puts cursors both inside a level and on its boundary
+    assert all_pages(client, alice, sort="-priority", limit=2) == expected
+    assert all_pages(client, alice, sort="priority", limit=2) == [
+        i for level in (TicketPriority.LOW, TicketPriority.NORMAL, TicketPriority.CRITICAL) for i in by_level[level][::-1]
+    ]
+    assert all_pages(client, alice, sort="-priority", limit=2, priority=["LOW", "CRITICAL"]) == (
+        by_level[TicketPriority.CRITICAL][::-1] + by_level[TicketPriority.LOW][::-1]
+    )
+
+def test_created_at_pages_with_status_filter(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    open_ids = []
+    for i in range(6):
+        status = TicketStatus.OPEN if i % 3 else TicketStatus.CLOSED
+        ticket_id = add_ticket(engine, alice if i % 2 else bob, None if i % 2 else alice, status=status)
+        if status == TicketStatus.OPEN:
+            open_ids.append(ticket_id)
+    assert all_pages(client, alice, status="OPEN", limit=3) == open_ids[::-1]
+    assert all_pages(client, alice, status="OPEN", sort="created_at", limit=3) == open_ids
+
+def test_counts_cover_both_scopes_once(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    add_ticket(engine, alice, bob)
+    add_ticket(engine, bob, alice, status=TicketStatus.CLOSED)
+    add_ticket(engine, alice, alice)
+    add_ticket(engine, bob, bob)
+    response = client.get("/api/tickets/counts", headers={"Authorization": f"Bearer {token_for(alice)}"})
+    assert response.json() == {"OPEN": 2, "IN_PROGRESS": 0, "WAITING_USER": 0, "CLOSED": 1}
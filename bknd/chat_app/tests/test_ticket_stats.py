@@ -0,0 +1,99 @@
+import json
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.core import ticket_stats
+from app.core.database import AsyncSessionLocal
+from app.core.ticket_stats import check_ticket_stats
+from app.models.message import Message
+from app.models.ticket import TicketStats, TicketUnread
+from tests.conftest import add_user, add_ticket, token_for
+
+def auth(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {token_for(user_id)}"}
+
+def recount_mismatches(client) -> int:
+    """check_ticket_stats on the app's loop, which owns the pooled connections."""
+    async def check():
+        async with AsyncSessionLocal() as db:
+            return await check_ticket_stats(db)
+    return client.portal.call(check)
+
+def send_rest(client, ticket_id: int) -> int:
+    # POST /api/messages/ always sends as user 1
+    response = client.post("/api/messages/", json={"ticket_id": ticket_id, "content": "rest"})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def send_socket(client, user_id: int, ticket_id: int, count: int):
+    with client.websocket_connect(f"/ws/ticket/{ticket_id}?token={token_for(user_id)}", subprotocols=["chat.v1.json"]) as ws:
+        for i in range(count):
+            ws.send_text(json.dumps({"type": "message", "content": f"socket {i}"}))
+        # Acks arrive once the write-behind queue has committed the rows
+        acks = 0
+        while acks < count:
+            acks += json.loads(ws.receive_text())["type"] == "ack"
+
+def unread(engine, ticket_id: int) -> dict:
+    with engine.connect() as conn:
+        return dict(conn.execute(
+            select(TicketUnread.user_id, TicketUnread.unread_count).filter(TicketUnread.ticket_id == ticket_id)
+        ).all())
+
+def test_counters_match_a_recount_after_sends_reads_and_reassign(client, engine):
+    alice, bob, carol = add_user(engine, "alice"), add_user(engine, "bob"), add_user(engine, "carol")
+    ticket_id = add_ticket(engine, alice, bob)
+    first = send_rest(client, ticket_id)
+    send_rest(client, ticket_id)
+    send_socket(client, bob, ticket_id, 3)
+    with Session(engine) as session:
+        stats = session.get(TicketStats, ticket_id)
+        assert (stats.message_count, stats.last_sender_id) == (5, bob)
+    assert unread(engine, ticket_id) == {alice: 3, bob: 2}
+    assert recount_mismatches(client) == 0
+
+    assert client.post(f"/api/messages/{first}/read").status_code == 200
+    newest = client.get(f"/api/messages/ticket/{ticket_id}").json()[-1]["id"]
+    response = client.post("/api/messages/read", json={"ticket_id": ticket_id, "up_to_id": newest}, headers=auth(alice))
+    assert response.json()["count"] == 3
+    assert unread(engine, ticket_id) == {alice: 0, bob: 1}
+    assert recount_mismatches(client) == 0
+
+    # Reassigning rebuilds the counters: carol inherits what bob had not read
+    assert client.put(f"/api/tickets/{ticket_id}", json={"assignee_id": carol}, headers=auth(alice)).status_code == 200
+    assert unread(engine, ticket_id) == {alice: 0, carol: 1}
+    assert recount_mismatches(client) == 0
+
+@pytest.mark.anyio
+async def test_check_reports_drift_and_backfill_repairs_it(db, capsys):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    counted = add_ticket(db, alice, bob)
+    uncounted = add_ticket(db, alice, bob)
+    add_ticket(db, bob)
+    with Session(db) as session:
+        # Rows written behind the counters' back, e.g. before they existed
+        session.add_all(Message(sender_id=alice, ticket_id=uncounted, content=f"m{i}", read=i == 0) for i in range(3))
+        session.add(TicketStats(ticket_id=counted, message_count=7))
+        session.commit()
+
+    assert await ticket_stats.main("check") == 2
+    assert f"ticket {uncounted}: message_count: stored=0 expected=3" in capsys.readouterr().out
+    assert await ticket_stats.main("backfill") == 2
+    assert await ticket_stats.main("check") == 0
+    with Session(db) as session:
+        stats = session.get(TicketStats, uncounted)
+        assert (stats.message_count, stats.read_count, stats.last_sender_id) == (3, 1, alice)
+        assert session.get(TicketStats, counted).message_count == 0
+    assert unread(db, uncounted) == {alice: 0, bob: 2}
+
+@pytest.mark.anyio
+async def test_check_ignores_zero_unread_rows(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    ticket_id = add_ticket(db, alice, bob)
+    with Session(db) as session:
+        session.add(TicketUnread(ticket_id=ticket_id, user_id=bob, unread_count=0))
+        session.commit()
+    assert await ticket_stats.main("check") == 0
+    with db.begin() as conn:
+        conn.execute(update(TicketUnread).values(unread_count=4))
+    assert await ticket_stats.main("check") == 1
@@ -0,0 +1,83 @@
+from sqlalchemy import select, update
+from app.models.message import DirectUnread
+from app.models.ticket import TicketUnread
+from tests.conftest import add_user, add_ticket, token_for
+
+def auth(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {token_for(user_id)}"}
+
+def send(client, **body) -> int:
+    # POST /api/messages/ always sends as user 1
+    response = client.post("/api/messages/", json={"content": "hi", **body})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def unread(client, user_id: int) -> dict:
+    response = client.get("/api/messages/unread", headers=auth(user_id))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def mark_read(client, reader_id: int, **body) -> int:
+    response = client.post("/api/messages/read", json=body, headers=auth(reader_id))
+    assert response.status_code == 200, response.text
+    return response.json()["count"]
+
+def test_sends_count_as_unread_for_the_other_side(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    ticket_id = add_ticket(engine, alice, bob)
+    for _ in range(3):
+        send(client, ticket_id=ticket_id)
+    send(client, receiver_id=bob)
+    assert unread(client, bob) == {"total": 4, "tickets": {str(ticket_id): 3}, "users": {str(alice): 1}}
+    # The sender's own messages are never unread for them
+    assert unread(client, alice)["total"] == 0
+
+def test_single_read_counts_down_once(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    ticket_id = add_ticket(engine, alice, bob)
+    first = send(client, ticket_id=ticket_id)
+    send(client, ticket_id=ticket_id)
+    direct = send(client, receiver_id=bob)
+    unread(client, bob)  # cached now; the reads must invalidate it
+    for message_id in (first, first, direct):
+        assert client.post(f"/api/messages/{message_id}/read").status_code == 200
+    assert unread(client, bob) == {"total": 1, "tickets": {str(ticket_id): 1}, "users": {}}
+
+def test_bulk_read_clears_a_conversation(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    ticket_id = add_ticket(engine, alice, bob)
+    ids = [send(client, ticket_id=ticket_id) for _ in range(3)]
+    direct = [send(client, receiver_id=bob) for _ in range(2)]
+    assert mark_read(client, bob, ticket_id=ticket_id, up_to_id=ids[1]) == 2
+    assert unread(client, bob)["tickets"] == {str(ticket_id): 1}
+    assert mark_read(client, bob, ticket_id=ticket_id, up_to_id=ids[-1]) == 1
+    assert mark_read(client, bob, user_id=alice, up_to_id=direct[-1]) == 2
+    assert unread(client, bob)["total"] == 0
+    # Nothing left to flip
+    assert mark_read(client, bob, user_id=alice, up_to_id=direct[-1]) == 0
+
+def test_counters_never_go_below_zero(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    ticket_id = add_ticket(engine, alice, bob)
+    ticket_message = send(client, ticket_id=ticket_id)
+    direct = [send(client, receiver_id=bob) for _ in range(2)]
+    # Counters that drifted low, e.g. rows inserted before the counters existed
+    with engine.begin() as conn:
+        conn.execute(update(TicketUnread).values(unread_count=0))
+        conn.execute(update(DirectUnread).values(unread_count=1))
+    assert client.post(f"/api/messages/{ticket_message}/read").status_code == 200
+    assert mark_read(client, bob, user_id=alice, up_to_id=direct[-1]) == 2
+    with engine.connect() as conn:
+        counts = conn.execute(select(TicketUnread.unread_count)).scalars().all()
+        counts += conn.execute(select(DirectUnread.unread_count)).scalars().all()
+    assert counts and min(counts) == 0
+    assert unread(client, bob)["total"] == 0
+
+def test_bulk_read_is_limited_to_participants(client, engine):
+    alice, bob, eve = add_user(engine, "alice"), add_user(engine, "bob"), add_user(engine, "eve")
+    ticket_id = add_ticket(engine, alice, bob)
+    message_id = send(client, ticket_id=ticket_id)
+    response = client.post("/api/messages/read", json={"ticket_id": ticket_id, "up_to_id": message_id}, headers=auth(eve))
+    assert response.status_code == 403
+    response = client.post("/api/messages/read", json={"up_to_id": message_id}, headers=auth(bob))
+    assert response.status_code == 400
@@ -0,0 +1,61 @@
+from sqlalchemy import insert
+from app.models.user import User
+from tests.conftest import add_user, token_for
+
+def directory(client, **params):
+    response = client.get("/api/users/", params=params)
+    assert response.status_code == 200, response.text
+    return response.json(), response.headers
+
+def names(entries) -> list:
+    return [e["name"] for e in entries]
+
+def test_without_limit_every_user_is_listed(client, engine):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"user{i:03}", "email": f"user{i}@example.com", "role": "user", "password_hash": "x"} for i in range(150)
+        ])
+    entries, headers = directory(client)
+    assert len(entries) == 150
+    assert "x-next-cursor" not in headers
+
+def test_limit_pages_with_cursor(client, engine):
+    ids = [add_user(engine, f"user{i}") for i in range(5)]
+    first, headers = directory(client, limit=3)
+    second, last_headers = directory(client, limit=3, cursor=headers["x-next-cursor"])
+    assert [e["id"] for e in first + second] == ids
+    assert "x-next-cursor" not in last_headers
+
+def test_prefix_search_matches_name_or_email(client, engine):
+    add_user(engine, "alice")
+    add_user(engine, "alan")
+    add_user(engine, "bob")
+    add_user(engine, "a_b")
+    assert names(directory(client, q="al")[0]) == ["alice", "alan"]
+    # Matches the email prefix too
+    assert names(directory(client, q="bob@")[0]) == ["bob"]
+    # LIKE wildcards in the query are literal
+    assert names(directory(client, q="a_")[0]) == ["a_b"]
+    assert directory(client, q="lic")[0] == []
+
+def test_fields_select_the_projection(client, engine):
+    alice = add_user(engine, "alice", role="agent")
+    add_user(engine, "bob")
+    entries, _ = directory(client, fields="name", role="agent")
+    assert entries == [{"id": alice, "name": "alice"}]
+    assert client.get("/api/users/", params={"fields": "name,password_hash"}).status_code == 400
+
+def test_cached_pages_follow_the_directory_version(client, engine):
+    alice = add_user(engine, "alice")
+    assert names(directory(client)[0]) == ["alice"]
+    # Written behind the app's back: the new max id alone must change the page
+    add_user(engine, "bob")
+    assert names(directory(client)[0]) == ["alice", "bob"]
+    response = client.patch("/api/users/me", json={"name": "alicia"}, headers={"Authorization": f"Bearer {token_for(alice)}"})
+    assert response.status_code == 200
+    assert names(directory(client)[0]) == ["alicia", "bob"]
+
+def test_unchanged_directory_answers_304(client, engine):
+    add_user(engine, "alice")
+    _, headers = directory(client)
+    assert client.get("/api/users/", headers={"If-None-Match": headers["etag"]}).status_code == 304
@@ -0,0 +1,45 @@
+import json
+import pytest
+from starlette.websockets import WebSocketDisconnect
+from app.core.connections import registry
+from app.routers import ws_chat
+from tests.conftest import add_user, add_ticket, token_for
+
+def test_ticket_socket_rejects_unknown_ticket(client, engine):
+    alice = add_user(engine, "alice")
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(f"/ws/ticket/999999?token={token_for(alice)}"):
+            pass
+    assert closed.value.code == 1008
+
+def test_ticket_socket_rejects_non_participant(client, engine):
+    alice, bob, eve = add_user(engine, "alice"), add_user(engine, "bob"), add_user(engine, "eve")
+    ticket_id = add_ticket(engine, alice, bob)
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(f"/ws/ticket/{ticket_id}?token={token_for(eve)}"):
+            pass
+    assert closed.value.code == 1008
+
+def test_ticket_socket_broadcasts_to_participants(client, engine):
+    alice, bob = add_user(engine, "alice"), add_user(engine, "bob")
+    ticket_id = add_ticket(engine, alice, bob)
+    with client.websocket_connect(f"/ws/ticket/{ticket_id}?token={token_for(alice)}", subprotocols=["chat.v1.json"]) as ws:
+        ws.send_text(json.dumps({"type": "message", "content": "hello"}))
+        frames = [json.loads(ws.receive_text()) for _ in range(2)]
+    message = next(f for f in frames if f["type"] == "message")
+    assert (message["content"], message["sender_name"], message["seq"]) == ("hello", "alice", 1)
+
+def test_failed_replay_releases_connection(client, engine, monkeypatch):
+    alice = add_user(engine, "alice")
+    ticket_id = add_ticket(engine, alice)
+
+    async def failing_replay(connection, ticket_id, last_seq):
+        registry.join(f"ticket:{ticket_id}", connection)
+        raise RuntimeError("replay read failed")
+
+    monkeypatch.setattr(ws_chat, "replay_and_join", failing_replay)
+    with pytest.raises(RuntimeError):
+        with client.websocket_connect(f"/ws/ticket/{ticket_id}?token={token_for(alice)}&last_seq=0") as ws:
+            ws.receive_text()
+    assert registry.room_connections(f"ticket:{ticket_id}") == set()
+    assert ticket_id not in ws_chat.ticket_call_state